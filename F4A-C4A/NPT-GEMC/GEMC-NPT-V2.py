@@ -378,32 +378,50 @@ def part_3c_output_gomc_production_run_started(job):
 # check if GOMC simulation are completed properly (start)
 # ******************************************************
 # ******************************************************
-# function for checking if GOMC simulations are completed properly
-def gomc_sim_completed_properly(job, control_filename_str):
-    """General check to see if the gomc simulation was completed properly."""
-    job_run_properly_bool = False
+# function for checking the GOMC simulation status from the end of the console file only.
+# The finished ("completed" or "failed") status is saved in the job document with the console
+# file size and modification time, so the console file is only read again if it changes.
+gomc_console_tail_bytes = 16384
+gomc_console_failed_str_list = ["ERROR", "Error:", "Fatal error"]
+
+def gomc_sim_console_status(job, control_filename_str):
+    """Get the gomc simulation status ("not_started", "started", "completed", or "failed") from the console file."""
     output_log_file = "out_{}.dat".format(control_filename_str)
-    if job.isfile(output_log_file):
-        # with open(f"workspace/{job.id}/{output_log_file}", "r") as fp:
-        #print(f"job.id = {job.id}")
-        with open(job.fn(output_log_file), "r") as fp:
-            out_gomc = fp.readlines()
-            for i, line in enumerate(out_gomc):
-                if "Completed" in line:
-                    job_run_properly_bool = True
-              #  if "Move" in line:
-              #      split_move_line = line.split()
-              #      if (
-              #          split_move_line[0] == "Move"
-              #          and split_move_line[1] == "Type"
-              #          and split_move_line[2] == "Mol."
-              #          and split_move_line[3] == "Kind"
-              #      ):
-              #          job_run_properly_bool = True
+    try:
+        output_log_stat = os.stat(job.fn(output_log_file))
+    except FileNotFoundError:
+        return "not_started"
+
+    output_log_size_mtime = [output_log_stat.st_size, output_log_stat.st_mtime_ns]
+    console_status_dict = job.doc.get("gomc_console_status", {})
+    if control_filename_str in console_status_dict \
+            and console_status_dict[control_filename_str]["size_mtime"] == output_log_size_mtime:
+        return console_status_dict[control_filename_str]["status"]
+
+    with open(job.fn(output_log_file), "rb") as fp:
+        fp.seek(max(output_log_stat.st_size - gomc_console_tail_bytes, 0))
+        output_log_tail = fp.read().decode("utf-8", errors="replace")
+
+    if "Completed" in output_log_tail:
+        output_log_status = "completed"
+    elif any(failed_str in output_log_tail for failed_str in gomc_console_failed_str_list):
+        output_log_status = "failed"
     else:
-        job_run_properly_bool = False
+        output_log_status = "started"
 
-    return job_run_properly_bool
+    # a running simulation changes the console file at every output, so only the finished status is saved
+    if output_log_status in ["completed", "failed"]:
+        job.doc.setdefault("gomc_console_status", {})[control_filename_str] = {
+            "size_mtime": output_log_size_mtime,
+            "status": output_log_status,
+        }
+
+    return output_log_status
+
+# function for checking if GOMC simulations are completed properly
+def gomc_sim_completed_properly(job, control_filename_str):
+    """General check to see if the gomc simulation was completed properly."""
+    return gomc_sim_console_status(job, control_filename_str) == "completed"
 
 # check if equilb selected ensemble GOMC run completed by checking the end of the GOMC consol file
 # check if equilb selected ensemble GOMC run completed by checking the end of the GOMC consol file
@@ -1,8 +1,19 @@
 """GOMC's setup for signac, signac-flow, signac-dashboard for this study."""
 # project.py
 
+import atexit
+import hashlib
+import importlib.metadata
+import io
+import json
 import os
+import re
+import shutil
+import signal
 import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import flow
 
@@ -25,6 +36,21 @@ class Project(FlowProject):
     def __init__(self):
         super().__init__()
 
+def add_job_array_args(parser):
+    """Add the SLURM job array submit arguments, used by the grid.sh and potoff.sh templates."""
+    parser.add_argument(
+        "--job-array",
+        action="store_true",
+        help="Submit each bundle (e.g., submit -o run_production_run_gomc_command --bundle 250 --job-array) "
+        "as one SLURM job array, with one array task per operation, from the bundle's manifest. "
+        "The operations should have the same directives, as the tasks use the largest np, ngpu, memory and walltime.",
+    )
+    parser.add_argument(
+        "--job-array-max-running",
+        type=int,
+        help="The maximum number of array tasks running at once (i.e., --array=0-N%%max).",
+    )
+
 class Grid(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
     """Subclass of DefaultSlurmEnvironment for WSU's Grid cluster."""
     
@@ -33,12 +59,24 @@ class Grid(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
     template = "grid.sh"
     #template = "local.sh"
 
+    @classmethod
+    def add_args(cls, parser):
+        """Add the SLURM and job array submit arguments."""
+        super().add_args(parser)
+        add_job_array_args(parser)
+
 class Potoff(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
     """Subclass of DefaultSlurmEnvironment for WSU's Grid cluster."""
 
     hostname_pattern = r".*reslab32ai8111"
     template = "../../template/potoff.sh"
 
+    @classmethod
+    def add_args(cls, parser):
+        """Add the SLURM and job array submit arguments."""
+        super().add_args(parser)
+        add_job_array_args(parser)
+
 
 # ******************************************************
 # users typical variables, but not all (start)
@@ -77,6 +115,51 @@ gomc_ff_filename_str = "SPCE_FF"
 mosdef_structure_box_0_name_str = "initial_box_0"
 mosdef_structure_box_1_name_str = "initial_box_1"
 
+# initial GEMC box sizes and molecule counts (seeded from the NPT workflow):
+# The liquid box (box 0) density is interpolated in temperature from the sibling NPT project's
+# replica averages, and the vapor box (box 1) density from the vapor density estimates
+# (saturated vapor densities, interpolated as ln(density) vs 1/T).
+# Above the NPT temperatures, the liquid density is extended to the critical point estimate
+# with the (rho_liq - rho_c) ~ (T_c - T)**0.325 scaling law.
+# The molecules are split so both boxes have about the same volume, with at least
+# gemc_box_1_min_molecules in the vapor box.
+# Only the NPT replica averages at npt_production_pressure_bar are used (the NPT init.py production_pressures).
+# If the NPT replica averages do not exist, the hand set values in build_charmm are used.
+npt_project_relative_path = "../NPT"
+npt_avg_std_of_replicates_txt_file_name_liq = "averages_box_liq_replicates.txt"
+npt_production_pressure_bar = 1
+gemc_total_molecules = 1000
+gemc_box_1_min_molecules = 30
+molecule_A_molar_mass_g_per_mol = 18.01528
+critical_temp_estimate_K = 640
+critical_density_estimate_kg_per_m_cubed = 310
+vapor_density_estimate_temp_K_to_kg_per_m_cubed_dict = {300: 0.0256,
+                                                        350: 0.2602,
+                                                        400: 1.3694,
+                                                        450: 4.8120,
+                                                        500: 13.199,
+                                                        550: 31.474,
+                                                        600: 72.842,
+                                                        625: 115.0,
+                                                        }
+
+# Warm-start continuation along the temperature:
+# If True, each job, except the first (lowest temperature) in its statepoint_without_temperature group,
+# waits for a completed production run within warm_start_max_temperature_difference_K, and starts its
+# equilibration (Restart=True) from the nearest one's final configuration, with the boxes rescaled
+# to the target densities (see the initial GEMC box sizes above).
+# The equilibration is then warm_start_gomc_steps_equilibration steps.
+warm_start_from_neighbor_state_point = False
+warm_start_max_temperature_difference_K = 50
+warm_start_gomc_steps_equilibration = 20000000
+warm_start_restart_name_str = "warm_start"
+
+# Equilibrate once per replica group:
+# If True, only the lowest replica_number_int job (the parent) in each statepoint_without_replica group
+# runs the equilibration.  The other replicas branch from the parent's equilibration restart files,
+# and run only the production, with their own PRNG seeds (the replica_number_int).
+equilibrate_once_per_replica_group = False
+
 # The equilb using the ensemble used for the simulation design, which
 # includes the simulation runs GOMC control file input and simulation outputs
 # Note: do not add extensions
@@ -120,6 +203,165 @@ output_critical_data_avg_std_of_replicates_txt_file_name = "critical_point_avg_o
 output_boiling_data_replicate_txt_file_name = "boiling_point_all_replicates.txt"
 output_boiling_data_avg_std_of_replicates_txt_file_name = "boiling_point_avg_over_replicates.txt"
 
+# Analysis (automatic equilibration detection):
+# The production start step for each box is picked from these Blk file columns in the
+# analysis of each replicate, using the "mser" or "max_neff" method, and is written to the job document.
+# Set to None to use all the production data (e.g., equilibration_detection_method = "mser").
+# The properties with fewer Blk file rows than equilibration_detection_min_no_samples are not used
+# (with a warning), as the start picked from a few noisy rows can drop up to half the production data.
+equilibration_detection_method = None
+equilibration_detection_blk_column_title_list = ["TOT_EN", "TOT_MOL", "TOT_DENS"]
+equilibration_detection_min_no_samples = 50
+
+# Production run convergence (the production run length):
+# The production run is stopped at its next restart point once the block-averaged relative
+# standard errors of these Blk file columns, for each box, are below these tolerances.
+# Otherwise, it runs to gomc_steps_production, and is then extended by up to
+# production_convergence_max_no_extensions segments (gomc_steps_production / gomc_run_no_segments steps each),
+# from its restart and checkpoint files, until they are met.  The extended runs are run as checkpoint-segmented
+# runs, so the convergence is checked after each segment.  Set to None to always run gomc_steps_production.
+# Note: the Blk file needs at least production_convergence_no_blocks * 2 rows after the equilibration
+# detection cut, so block_ave_output_freq must be much smaller than gomc_steps_production
+# (i.e., gomc_steps_production = 100000000 and block_ave_output_freq = 1000000 gives 100 rows).
+# e.g., production_convergence_relative_tolerance_dict = {
+#     0: {"TOT_DENS": 0.002},
+#     1: {"TOT_DENS": 0.01, "PRESSURE": 0.02, "HEAT_VAP": 0.005},
+# }
+production_convergence_relative_tolerance_dict = None
+production_convergence_no_blocks = 5
+production_convergence_max_no_extensions = 0
+production_convergence_check_interval_s = 600
+production_convergence_restart_write_wait_s = 60
+
+# The bulk individual simulation averages (part_5a) analysis, for all the ready jobs in one process pool:
+# If True, part_5a_bulk_analysis_individual_simulation_averages is used, and the per-job part_5a
+# operation is not (so the same job is not analyzed by both), with this number of processes.
+use_bulk_analysis = False
+bulk_analysis_no_processes = 8
+
+# The bulk build of the psf, pdb, FF and control files, for all the ready jobs in one process pool:
+# If True, bulk_build_psf_pdb_ff_gomc_conf is used, and the per-job build_psf_pdb_ff_gomc_conf
+# operation is not (so the same job is not built by both), with this number of processes (one per core).
+use_bulk_build = False
+bulk_build_no_processes = 8
+
+# Electrostatics schemes (see init_electrostatics_benchmark.py):
+# The jobs with an "electrostatics_scheme" state point use Ewald only for "EWALD", and have these
+# GOMC control file keywords added after the mosdef writer, as in the SPCE/*_DSF workflows.
+# The jobs without an "electrostatics_scheme" state point are "EWALD".
+electrostatics_scheme_control_keywords_dict = {
+    "EWALD": {},
+    "RAHBARI_DSF": {
+        "Wolf": "True", "DSF": "True", "IntraDSF": "False", "SimpleSelf": "False",
+        "WolfAlpha 0": "0.12", "WolfAlpha 1": "0.12",
+    },
+    "WAIBEL2018_DSF": {
+        "Wolf": "True", "DSF": "True", "IntraDSF": "False", "SimpleSelf": "True",
+        "WolfAlpha 0": "0.12", "WolfAlpha 1": "0.12",
+    },
+    "WAIBEL2019_DSF": {
+        "Wolf": "True", "DSF": "True", "IntraDSF": "True", "SimpleSelf": "False",
+        "WolfAlpha 0": "0.12", "WolfAlpha 1": "0.12",
+    },
+}
+
+# Analysis (electrostatics scheme benchmark):
+# The schemes are acceptable at a temperature, if their liquid box energy per molecule and their liquid
+# and vapor densities are within these relative deviations of the EWALD job.
+electrostatics_benchmark_max_relative_energy_deviation = 0.01
+electrostatics_benchmark_max_relative_density_deviation = 0.02
+output_electrostatics_benchmark_txt_file_name = "electrostatics_benchmark_pareto.txt"
+# The benchmark jobs' short runs (benchmark_gomc_steps) write their Blk file and console output
+# electrostatics_benchmark_no_output_blocks times, and their restart files at the end of the run.
+electrostatics_benchmark_no_output_blocks = 100
+
+# Electrostatics autotuning (the RcutCoulomb of each box, and the Ewald tolerance or the Wolf alpha):
+# If True, short GOMC probes are run from each job's equilb starting configuration, before the equilb run,
+# for all the combinations of these candidates and the hand set values.  The fastest combination, where
+# the starting total energy of each box is within the deviation of the reference probe (Ewald, with the
+# largest cutoffs and the smallest tolerance), is written to the job document and used in the control files.
+# The liquid box (0) uses a relative energy deviation, but the vapor box (1) total energy is near zero,
+# so it uses an absolute energy deviation per molecule (K/molecule).
+# Each probe's speed is from its wall time, minus the wall time of the same probe with
+# autotune_startup_probe_gomc_steps, so the GOMC startup (reading the files, and the Ewald setup) is not counted.
+# The replicas reuse the autotuned values of the same state point.
+# Note: the cutoffs over half of the smallest box length are not probed.
+autotune_electrostatics = False
+autotune_rcutcoulomb_box_0_candidates_ang = [10, 12, 14]
+autotune_rcutcoulomb_box_1_candidates_ang = [10, 14, 20, 30, 50, 100]
+autotune_ewald_tol_candidates = [0.0001, 0.00001, 0.000001]
+autotune_wolf_alpha_candidates = [0.08, 0.12, 0.16, 0.20]
+autotune_max_relative_energy_deviation_box_0 = 0.0005
+autotune_max_energy_deviation_box_1_K_per_molecule = 2.5
+autotune_probe_gomc_steps = 5000
+autotune_startup_probe_gomc_steps = 0
+autotune_directory_name = "electrostatics_autotune"
+
+# Move mix and CBMC trial autotuning (the production move frequencies, CBMC_First and CBMC_Nth):
+# If True, short GOMC pilot runs are run from each job's equilb restart files, before the production run.
+# The baseline pilot uses the hand set values, and measures each move's acceptance and CPU time.
+# The candidate move mixes reweight the tunable moves by their acceptance per CPU second (with these
+# exponents), or scale the SwapFreq, and the best move mix is then run with the CBMC trial candidates.
+# The pilot with the most effective (decorrelated) samples per CPU second, of its slowest
+# decorrelating Blk file column below, is written to the job document and used in the production
+# control file.  The replicas reuse the autotuned values of the same state point.
+autotune_move_mix = False
+move_mix_autotune_tunable_freq_list = ["DisFreq", "RotFreq", "RegrowthFreq", "SwapFreq"]
+move_mix_autotune_min_freq = 0.01
+move_mix_autotune_efficiency_weight_exponents = [0.5, 1.0]
+move_mix_autotune_swap_freq_scale_factors = [0.5, 2.0]
+move_mix_autotune_cbmc_first_nth_candidates = [[8, 6], [12, 10], [16, 12]]
+move_mix_autotune_blk_column_title_dict = {0: ["TOT_MOL", "TOT_DENS"], 1: ["TOT_DENS"]}
+move_mix_autotune_pilot_gomc_steps = 200000
+move_mix_autotune_pilot_blk_output_freq = 1000
+move_mix_autotune_directory_name = "move_mix_autotune"
+
+# GOMC launch autotuning (the gomc_ncpu, and the CPU or GPU binary of each job):
+# If True, the available GOMC_CPU_*/GOMC_GPU_* binaries (GPU only if nvidia-smi finds a GPU) are
+# benchmarked at these +p values, with a short run of the job's equilb control file, before the equilb run.
+# After launch_autotune_benchmark_no_jobs jobs are benchmarked, the other jobs use a cost model fit to the
+# benchmarks (log steps/s versus log cores, log cores squared, log molecules, log cores times log molecules,
+# and log largest RcutCoulomb), instead of a benchmark.  The log cores squared term lets the speed saturate
+# (or drop) at the larger +p values, and the log cores times log molecules term lets the best +p value grow
+# with the molecules.  The cost model is only fit, once the benchmarks determine all its coefficients
+# (at least 3 +p values, and 2 molecule counts), so until then the jobs are benchmarked.  The features with the same value
+# in all the benchmarks (e.g., the molecules or RcutCoulomb) are not fit, and the jobs with other values
+# of them are benchmarked.
+# The largest +p value with the parallel efficiency (over the smallest +p value) is selected for each binary,
+# and the GPU binary is only selected if it is launch_autotune_gpu_min_speedup times faster than the CPU binary.
+autotune_gomc_launch = False
+launch_autotune_ncpu_candidates = [1, 2, 4, 8, 16]
+launch_autotune_min_parallel_efficiency = 0.7
+launch_autotune_gpu_min_speedup = 1.5
+launch_autotune_benchmark_no_jobs = 4
+launch_autotune_probe_gomc_steps = 20000
+launch_autotune_directory_name = "gomc_launch_autotune"
+
+# Node bundling (see bundle_gomc_runs_on_node, e.g., submit -o bundle_gomc_runs_on_node):
+# If use_node_bundle is True, the ready GOMC runs are run concurrently in one node allocation, and the
+# per-job run_equilb_ensemble_gomc_command and run_production_run_gomc_command operations are not
+# eligible (so the same GOMC run is not run by both).  Each run is pinned to its own
+# gomc_ncpu cores (taskset) and, for the GPU runs, its own GPU (CUDA_VISIBLE_DEVICES).  The runs
+# which become eligible (i.e., the production after the equilb) are started in the same allocation.
+# The runs which need more cores or GPUs than the allocation has (i.e., gomc_ngpu = 1 and node_bundle_no_gpus = 0)
+# fail the bundle.  If node_bundle_memory_gb is None, the memory is the GOMC run memory times the
+# most runs which fit in the cores at the same time.
+use_node_bundle = False
+node_bundle_no_cores = 64
+node_bundle_no_gpus = 0
+node_bundle_memory_gb = None
+node_bundle_gomc_run_operation_list = ["run_equilb_ensemble_gomc_command", "run_production_run_gomc_command"]
+node_bundle_check_interval_s = 30
+output_node_bundle_utilization_txt_file_name = "node_bundle_utilization.txt"
+
+# Checkpoint-segmented GOMC runs (for short walltime backfill scheduling):
+# If gomc_run_no_segments > 1, each equilb and production run is split into this number of
+# equal segments, which each run in one operation execution (with the walltime_gomc_segment_hr walltime).
+# Each segment continues from the last segment's restart and checkpoint files, and a failed or timed out
+# segment is run again from them when the operation is resubmitted.  After the last segment, the
+# segment Blk and console files are stitched into the run's usual files, for the analysis.
+gomc_run_no_segments = 1
+walltime_gomc_segment_hr = 12
 
 walltime_mosdef_hr = 24
 walltime_gomc_equilbrium_hr = 168
@@ -127,6 +369,27 @@ walltime_gomc_production_hr = 168
 walltime_gomc_analysis_hr = 4
 memory_needed = 1
 
+# Runtime cost model (the walltime and memory directives of the GOMC equilb and production runs):
+# If True, once enough GOMC runs are logged (the equilb and production run timing), the run walltimes are
+# predicted from a cost model fit to them (log steps/s versus log cores, molecules, largest RcutCoulomb,
+# and the CPU or GPU binary), times the safety factor and the model's scatter
+# (exp(runtime_cost_model_no_residual_std * residual standard deviation)), between runtime_cost_model_min_walltime_hr
+# and the fixed walltime above.  The memory is the peak memory fit to the molecules, times the safety factor.
+# The model is fit, if there are at least runtime_cost_model_min_no_runs logged runs, and
+# runtime_cost_model_min_no_runs_per_feature runs per fit feature, and runtime_cost_model_min_no_molecule_counts
+# different molecule counts, and the features determine all the coefficients.  The residual standard deviation
+# is corrected for the fit degrees of freedom.  The features with the same value in all the runs (e.g., the
+# cores, if all the runs used the same +p) are not fit, and the jobs with other values use the fixed walltime.
+# Otherwise, the fixed walltime and memory_needed are used.  The np directive is the job's gomc_ncpu (see part_2e).
+use_runtime_cost_model = False
+runtime_cost_model_min_no_runs = 10
+runtime_cost_model_min_no_runs_per_feature = 2
+runtime_cost_model_min_no_molecule_counts = 3
+runtime_cost_model_walltime_safety_factor = 1.5
+runtime_cost_model_no_residual_std = 2
+runtime_cost_model_min_walltime_hr = 1
+runtime_cost_model_memory_safety_factor = 1.5
+
 # ******************************************************
 # users typical variables, but not all (end)
 # ******************************************************
@@ -152,11 +415,7 @@ print("project_directory_path = " +str(project_directory_path))
 @Project.label
 def part_1a_initial_data_input_to_json(job):
     """Check that the initial job data is written to the json files."""
-    data_written_bool = False
-    if job.isfile(f"{'signac_job_document.json'}"):
-        data_written_bool = True
-
-    return data_written_bool
+    return bool(job_status_bits(job) & status_bit_job_doc_written)
 
 
 @Project.post(part_1a_initial_data_input_to_json)
@@ -250,12 +509,297 @@ def statepoint_without_temperature(job):
     keys = sorted(tuple(i for i in job.sp.keys() if i not in {"production_temperature_K"}))
     return [(key, job.sp[key]) for key in keys]
 
+def replica_group_key(job):
+    """Get the statepoint_without_replica group of the job as a hash string, for the project analysis registry.
+
+    The hash is used, as the signac document keys can not contain the dots in the state point values.
+    """
+    return hashlib.md5(json.dumps(statepoint_without_replica(job)).encode()).hexdigest()
+
+def production_analysis_job(job):
+    """Check if the job is in the production analysis (part_5b, part_5c and part_5d), as it is not a benchmark job."""
+    return "benchmark_gomc_steps" not in job.sp
+
+def all_jobs_if_any(jobs):
+    """Aggregate all the jobs, or give no aggregate for an empty project (an empty aggregate breaks the project status)."""
+    if len(jobs) > 0:
+        yield tuple(jobs)
+
+# the project's jobs grouped by statepoint_without_replica or statepoint_without_temperature, built once
+# per python process (i.e., once per status or submit), as the labels and preconditions look up the
+# group of every job, and a project.find_jobs for each job reads the whole project each time.
+# cache dict = {(project path, grouping function name): {group key: [job, ...]}}
+statepoint_group_jobs_cache_dict = {}
+
+def get_statepoint_group_jobs(job, statepoint_group_function):
+    """Get the jobs with the same statepoint_group_function (e.g., statepoint_without_replica) group as the job."""
+    cache_key = (job.project.path, statepoint_group_function.__name__)
+    if cache_key not in statepoint_group_jobs_cache_dict:
+        group_jobs_dict = {}
+        for project_job in job.project:
+            group_jobs_dict.setdefault(json.dumps(statepoint_group_function(project_job)), []).append(project_job)
+        statepoint_group_jobs_cache_dict[cache_key] = group_jobs_dict
+
+    return list(statepoint_group_jobs_cache_dict[cache_key].get(json.dumps(statepoint_group_function(job)), [job]))
+
 # ******************************************************
 # ******************************************************
 # functions for selecting/grouping/aggregating in different ways (end)
 # ******************************************************
 # ******************************************************
 
+# ******************************************************
+# ******************************************************
+# project status index, from one os.scandir pass per job directory (start)
+# Note: the labels, pre and post conditions below read the job stage bits from this index,
+# and a job directory is only re-scanned when its modification time changes.
+# ******************************************************
+# ******************************************************
+
+# the job stage bits in the status index
+status_bit_job_doc_written = 1 << 0
+status_bit_mosdef_input_written = 1 << 1
+status_bit_equilb_control_file_written = 1 << 2
+status_bit_production_control_file_written = 1 << 3
+status_bit_equilb_started = 1 << 4
+status_bit_production_started = 1 << 5
+status_bit_equilb_completed = 1 << 6
+status_bit_production_completed = 1 << 7
+status_bit_individual_averages_written = 1 << 8
+
+# the project analysis stage bits in the status index
+status_bit_replica_averages_written = 1 << 0
+status_bit_critical_and_boiling_replicate_written = 1 << 1
+status_bit_critical_and_boiling_avg_std_written = 1 << 2
+
+control_file_name_to_written_status_bit_dict = {
+    gomc_equilb_control_file_name_str: status_bit_equilb_control_file_written,
+    gomc_production_control_file_name_str: status_bit_production_control_file_written,
+}
+control_file_name_to_started_status_bit_dict = {
+    gomc_equilb_control_file_name_str: status_bit_equilb_started,
+    gomc_production_control_file_name_str: status_bit_production_started,
+}
+control_file_name_to_completed_status_bit_dict = {
+    gomc_equilb_control_file_name_str: status_bit_equilb_completed,
+    gomc_production_control_file_name_str: status_bit_production_completed,
+}
+
+# the status index file (in the project directory), and the time in seconds a directory
+# modification time must be older than its scan to be trusted.  A file added in the same
+# timestamp tick (i.e., the coarse timestamps on NFS) does not change the directory modification time.
+status_index_file_name = "status_index.json"
+status_index_racy_time_s = 2
+
+# status_index = {"jobs": {job.id: [dir_mtime_ns, scan_time_ns, stage_bits, console_size_mtime_dict,
+#                                    control_file_mtime_ns_list]}, "analysis": [...]}
+# where console_size_mtime_dict = {control_filename_str: [console_size, console_mtime_ns, completed_bool]}
+# and control_file_mtime_ns_list has the mtime of each control file (0 if it is not written), as the control
+# files are read by the scan and can be rewritten in place, which does not change the directory mtime.
+status_index = None
+status_index_changed = False
+
+
+def load_status_index():
+    """Load the project status index, or start a new one if it is not readable."""
+    global status_index
+    if status_index is None:
+        try:
+            with open(os.path.join(project_directory_path, status_index_file_name), "r") as fp:
+                status_index = json.load(fp)
+        except (OSError, ValueError):
+            status_index = {"jobs": {}, "analysis": None}
+
+    return status_index
+
+
+@atexit.register
+def save_status_index():
+    """Write the project status index, if it changed, so the next status check can reuse it."""
+    if status_index is None or not status_index_changed:
+        return
+
+    status_index_file_path = os.path.join(project_directory_path, status_index_file_name)
+    status_index_tmp_file_path = f"{status_index_file_path}.{os.getpid()}.tmp"
+    try:
+        with open(status_index_tmp_file_path, "w") as fp:
+            json.dump(status_index, fp, separators=(",", ":"))
+        os.replace(status_index_tmp_file_path, status_index_file_path)
+    except OSError:
+        # the index is only a cache, so it is rebuilt next time if it can not be written
+        if os.path.isfile(status_index_tmp_file_path):
+            os.remove(status_index_tmp_file_path)
+
+
+def gomc_control_file_has_output_name(control_file_path):
+    """Check that the gomc control file has the OutputName line, which shows it was fully written."""
+    with open(control_file_path, "r") as fp:
+        for line in fp:
+            split_line = line.split()
+            if len(split_line) > 0 and split_line[0] == "OutputName":
+                return True
+
+    return False
+
+
+def scan_job_status_bits(job):
+    """Get the job stage bits from a single os.scandir pass of the job directory."""
+    with os.scandir(job.path) as job_dir_entries:
+        job_file_names = {entry.name for entry in job_dir_entries}
+
+    stage_bits = 0
+    if "signac_job_document.json" in job_file_names:
+        stage_bits |= status_bit_job_doc_written
+
+    if {
+        f"{gomc_ff_filename_str}.inp",
+        f"{mosdef_structure_box_0_name_str}.psf",
+        f"{mosdef_structure_box_0_name_str}.pdb",
+    } <= job_file_names:
+        stage_bits |= status_bit_mosdef_input_written
+
+    for control_filename_str, written_status_bit in control_file_name_to_written_status_bit_dict.items():
+        if f"{control_filename_str}.conf" in job_file_names \
+                and gomc_control_file_has_output_name(job.fn(f"{control_filename_str}.conf")):
+            stage_bits |= written_status_bit
+
+    for control_filename_str, started_status_bit in control_file_name_to_started_status_bit_dict.items():
+        if f"out_{control_filename_str}.dat" in job_file_names:
+            stage_bits |= started_status_bit
+
+    if {output_replicate_txt_file_name_liq, output_replicate_txt_file_name_vap} <= job_file_names:
+        stage_bits |= status_bit_individual_averages_written
+
+    return stage_bits
+
+
+def update_completed_status_bits(job, stage_bits, console_size_mtime_dict):
+    """Add the completed bits for the started gomc simulations, keyed on each console file's size and mtime."""
+    for control_filename_str, completed_status_bit in control_file_name_to_completed_status_bit_dict.items():
+        started_status_bit = control_file_name_to_started_status_bit_dict[control_filename_str]
+        if not stage_bits & started_status_bit:
+            console_size_mtime_dict.pop(control_filename_str, None)
+            continue
+
+        try:
+            output_log_stat = os.stat(job.fn(f"out_{control_filename_str}.dat"))
+        except FileNotFoundError:
+            console_size_mtime_dict.pop(control_filename_str, None)
+            continue
+
+        # the console file can be rewritten in place (i.e., a rerun), which does not change the directory mtime
+        output_log_size_mtime = [output_log_stat.st_size, output_log_stat.st_mtime_ns]
+        console_entry = console_size_mtime_dict.get(control_filename_str)
+        if console_entry is None or console_entry[:2] != output_log_size_mtime:
+            console_entry = output_log_size_mtime + [
+                gomc_sim_console_status(job, control_filename_str) == "completed"
+            ]
+            console_size_mtime_dict[control_filename_str] = console_entry
+
+        if console_entry[2]:
+            stage_bits |= completed_status_bit
+
+    return stage_bits
+
+
+def get_control_file_mtime_ns_list(job):
+    """Get the mtime of each control file read by the job directory scan, or 0 if it is not written."""
+    control_file_mtime_ns_list = []
+    for control_filename_str in control_file_name_to_written_status_bit_dict:
+        try:
+            control_file_mtime_ns_list.append(os.stat(job.fn(f"{control_filename_str}.conf")).st_mtime_ns)
+        except FileNotFoundError:
+            control_file_mtime_ns_list.append(0)
+
+    return control_file_mtime_ns_list
+
+
+def job_status_bits(job):
+    """Get the job stage bits from the status index, only re-scanning the job directory if it or its control files changed."""
+    global status_index_changed
+    job_status_index = load_status_index()["jobs"]
+
+    try:
+        dir_mtime_ns = os.stat(job.path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+    control_file_mtime_ns_list = get_control_file_mtime_ns_list(job)
+    index_entry = job_status_index.get(job.id)
+    if index_entry is not None \
+            and len(index_entry) == 5 \
+            and index_entry[0] == dir_mtime_ns \
+            and index_entry[4] == control_file_mtime_ns_list \
+            and index_entry[1] - max([dir_mtime_ns] + control_file_mtime_ns_list) > status_index_racy_time_s * 10 ** 9:
+        stage_bits = index_entry[2]
+        console_size_mtime_dict = dict(index_entry[3])
+    else:
+        scan_time_ns = time.time_ns()
+        stage_bits = scan_job_status_bits(job)
+        console_size_mtime_dict = {} if index_entry is None or len(index_entry) != 5 else dict(index_entry[3])
+        index_entry = [dir_mtime_ns, scan_time_ns, stage_bits, {}, control_file_mtime_ns_list]
+
+    # the completed bits are not saved in the directory stage bits, as they come from the console files
+    completed_stage_bits = update_completed_status_bits(job, stage_bits, console_size_mtime_dict)
+    new_index_entry = [index_entry[0], index_entry[1], stage_bits, console_size_mtime_dict, control_file_mtime_ns_list]
+    if job_status_index.get(job.id) != new_index_entry:
+        job_status_index[job.id] = new_index_entry
+        status_index_changed = True
+
+    return completed_stage_bits
+
+
+def analysis_status_bits():
+    """Get the project analysis stage bits from the status index, only re-scanning the analysis directory if it changed."""
+    global status_index_changed
+    project_status_index = load_status_index()
+    analysis_dir_path = os.path.join(project_directory_path, "analysis")
+
+    try:
+        dir_mtime_ns = os.stat(analysis_dir_path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+    index_entry = project_status_index["analysis"]
+    if index_entry is not None \
+            and index_entry[0] == dir_mtime_ns \
+            and index_entry[1] - dir_mtime_ns > status_index_racy_time_s * 10 ** 9:
+        return index_entry[2]
+
+    scan_time_ns = time.time_ns()
+    with os.scandir(analysis_dir_path) as analysis_dir_entries:
+        analysis_file_names = {entry.name for entry in analysis_dir_entries}
+
+    stage_bits = 0
+    if {
+        output_avg_std_of_replicates_txt_file_name_liq,
+        output_avg_std_of_replicates_txt_file_name_vap,
+    } <= analysis_file_names:
+        stage_bits |= status_bit_replica_averages_written
+
+    if {
+        output_critical_data_replicate_txt_file_name,
+        output_boiling_data_replicate_txt_file_name,
+    } <= analysis_file_names:
+        stage_bits |= status_bit_critical_and_boiling_replicate_written
+
+    if {
+        output_critical_data_avg_std_of_replicates_txt_file_name,
+        output_boiling_data_avg_std_of_replicates_txt_file_name,
+    } <= analysis_file_names:
+        stage_bits |= status_bit_critical_and_boiling_avg_std_written
+
+    project_status_index["analysis"] = [dir_mtime_ns, scan_time_ns, stage_bits]
+    status_index_changed = True
+
+    return stage_bits
+
+# ******************************************************
+# ******************************************************
+# project status index, from one os.scandir pass per job directory (end)
+# ******************************************************
+# ******************************************************
+
 # ******************************************************
 # ******************************************************
 # check if GOMC psf, pdb, and force field (FF) files were written (start)
@@ -266,19 +810,7 @@ def statepoint_without_temperature(job):
 @Project.label
 def mosdef_input_written(job):
     """Check that the mosdef files (psf, pdb, and force field (FF) files) are written ."""
-    file_written_bool = False
-    if (
-        job.isfile(f"{gomc_ff_filename_str}.inp")
-        and job.isfile(
-            f"{mosdef_structure_box_0_name_str}.psf"
-        )
-        and job.isfile(
-            f"{mosdef_structure_box_0_name_str}.pdb"
-        )
-    ):
-        file_written_bool = True
-
-    return file_written_bool
+    return bool(job_status_bits(job) & status_bit_mosdef_input_written)
 
 
 # ******************************************************
@@ -295,19 +827,7 @@ def mosdef_input_written(job):
 # function for checking if the GOMC control file is written
 def gomc_control_file_written(job, control_filename_str):
     """General check that the gomc control files are written."""
-    file_written_bool = False
-    control_file = f"{control_filename_str}.conf"
-
-    if job.isfile(control_file):
-        with open(job.fn(control_file), "r") as fp:
-            out_gomc = fp.readlines()
-            for i, line in enumerate(out_gomc):
-                if "OutputName" in line:
-                    split_move_line = line.split()
-                    if split_move_line[0] == "OutputName":
-                        file_written_bool = True
-
-    return file_written_bool
+    return bool(job_status_bits(job) & control_file_name_to_written_status_bit_dict[control_filename_str])
 
 # checking if the GOMC control file is written for the equilb run with the selected ensemble
 @Project.label
@@ -336,11 +856,7 @@ def part_2b_gomc_production_control_file_written(job):
 # function for checking if GOMC simulations are started
 def gomc_simulation_started(job, control_filename_str):
     """General check to see if the gomc simulation is started."""
-    output_started_bool = False
-    if job.isfile("out_{}.dat".format(control_filename_str)):
-        output_started_bool = True
-
-    return output_started_bool
+    return bool(job_status_bits(job) & control_file_name_to_started_status_bit_dict[control_filename_str])
 
 # check if equilb_with design ensemble GOMC run is started by seeing if the GOMC consol file and the merged psf exist
 @Project.label
@@ -364,32 +880,50 @@ def part_3b_output_gomc_production_run_started(job):
 # check if GOMC simulation are completed properly (start)
 # ******************************************************
 # ******************************************************
-# function for checking if GOMC simulations are completed properly
-def gomc_sim_completed_properly(job, control_filename_str):
-    """General check to see if the gomc simulation was completed properly."""
-    job_run_properly_bool = False
+# function for checking the GOMC simulation status from the end of the console file only.
+# The finished ("completed" or "failed") status is saved in the job document with the console
+# file size and modification time, so the console file is only read again if it changes.
+gomc_console_tail_bytes = 16384
+gomc_console_failed_str_list = ["ERROR", "Error:", "Fatal error"]
+
+def gomc_sim_console_status(job, control_filename_str):
+    """Get the gomc simulation status ("not_started", "started", "completed", or "failed") from the console file."""
     output_log_file = "out_{}.dat".format(control_filename_str)
-    if job.isfile(output_log_file):
-        # with open(f"workspace/{job.id}/{output_log_file}", "r") as fp:
-        #print(f"job.id = {job.id}")
-        with open(job.fn(output_log_file), "r") as fp:
-            out_gomc = fp.readlines()
-            for i, line in enumerate(out_gomc):
-                if "Completed" in line:
-                    job_run_properly_bool = True
-              #  if "Move" in line:
-              #      split_move_line = line.split()
-              #      if (
-              #          split_move_line[0] == "Move"
-              #          and split_move_line[1] == "Type"
-              #          and split_move_line[2] == "Mol."
-              #          and split_move_line[3] == "Kind"
-              #      ):
-              #          job_run_properly_bool = True
+    try:
+        output_log_stat = os.stat(job.fn(output_log_file))
+    except FileNotFoundError:
+        return "not_started"
+
+    output_log_size_mtime = [output_log_stat.st_size, output_log_stat.st_mtime_ns]
+    console_status_dict = job.doc.get("gomc_console_status", {})
+    if control_filename_str in console_status_dict \
+            and console_status_dict[control_filename_str]["size_mtime"] == output_log_size_mtime:
+        return console_status_dict[control_filename_str]["status"]
+
+    with open(job.fn(output_log_file), "rb") as fp:
+        fp.seek(max(output_log_stat.st_size - gomc_console_tail_bytes, 0))
+        output_log_tail = fp.read().decode("utf-8", errors="replace")
+
+    if "Completed" in output_log_tail:
+        output_log_status = "completed"
+    elif any(failed_str in output_log_tail for failed_str in gomc_console_failed_str_list):
+        output_log_status = "failed"
     else:
-        job_run_properly_bool = False
+        output_log_status = "started"
+
+    # a running simulation changes the console file at every output, so only the finished status is saved
+    if output_log_status in ["completed", "failed"]:
+        job.doc.setdefault("gomc_console_status", {})[control_filename_str] = {
+            "size_mtime": output_log_size_mtime,
+            "status": output_log_status,
+        }
 
-    return job_run_properly_bool
+    return output_log_status
+
+# function for checking if GOMC simulations are completed properly
+def gomc_sim_completed_properly(job, control_filename_str):
+    """General check to see if the gomc simulation was completed properly."""
+    return bool(job_status_bits(job) & control_file_name_to_completed_status_bit_dict[control_filename_str])
 
 # check if equilb selected ensemble GOMC run completed by checking the end of the GOMC consol file
 @Project.label
@@ -400,8 +934,13 @@ def part_4a_job_gomc_equilb_design_ensemble_completed_properly(job):
 # check if production GOMC run completed by checking the end of the GOMC consol file
 @Project.label
 def part_4b_job_production_run_completed_properly(job):
-    """Check to see if the gomc production run (set temperature) simulation was completed properly."""
-    return gomc_sim_completed_properly(job, gomc_production_control_file_name_str)
+    """Check to see if the gomc production run (set temperature) simulation was completed properly, or stopped once converged."""
+    if gomc_sim_completed_properly(job, gomc_production_control_file_name_str):
+        return True
+
+    # the convergence stop is only in the job document, as gomc did not write its completed line
+    return part_3b_output_gomc_production_run_started(job) \
+        and job.doc.get("production_convergence", {}).get("stopped_early", False)
 
 
 
@@ -409,46 +948,47 @@ def part_4b_job_production_run_completed_properly(job):
 @Project.label
 def part_5a_analysis_individual_simulation_averages_completed(job):
     """Check that the individual simulation averages files are written ."""
-    file_written_bool = False
-    if (
-        job.isfile(
-            f"{output_replicate_txt_file_name_liq}"
-        )
-        and job.isfile(
-            f"{output_replicate_txt_file_name_vap}"
-        )
-    ):
-        file_written_bool = True
+    return bool(job_status_bits(job) & status_bit_individual_averages_written)
+
+
+# check if analysis for averages of all the replicates is completed
+# project analysis registry, stored in the project document as
+# {"individual_averages": {replica_group_key: [job.id, ...]}, "replica_averages": [replica_group_key, ...]}.
+# The part_5a and part_5b operations add their jobs and replica groups as they finish,
+# so the replica group checks do not need to look at the rest of the project.
+def get_analysis_registry(project):
+    """Get the project analysis registry (a copy), or an empty registry if it is not written yet."""
+    analysis_registry = project.doc.get("analysis_registry", {})
+    return {
+        "individual_averages": dict(analysis_registry.get("individual_averages", {})),
+        "replica_averages": list(analysis_registry.get("replica_averages", [])),
+    }
+
+
+# check if the individual simulation averages are done for all the jobs in the replica group
+def part_5a_analysis_replica_group_completed(*jobs):
+    """Check that the individual simulation averages files are written for all the jobs in the replica group."""
+    group_job_id_list = get_analysis_registry(jobs[0].project)["individual_averages"].get(
+        replica_group_key(jobs[0]), []
+    )
+    if {job.id for job in jobs} <= set(group_job_id_list):
+        return True
 
-    return file_written_bool
+    # the registry may be missing a job (i.e., analysis done before the registry existed),
+    # so fall back to checking the replica group's jobs from the status index
+    return all(part_5a_analysis_individual_simulation_averages_completed(job) for job in jobs)
 
 
 # check if analysis for averages of all the replicates is completed
 #@Project.pre(part_5a_analysis_individual_simulation_averages_completed)
 @Project.label
 def part_5b_analysis_replica_averages_completed(*jobs):
-    """Check that the individual simulation averages files are written ."""
-    file_written_bool_list = []
-    all_file_written_bool_pass = False
-    for job in jobs:
-        file_written_bool = False
-
-        if (
-            job.isfile(
-                f"../../analysis/{output_avg_std_of_replicates_txt_file_name_liq}"
-            )
-            and job.isfile(
-                f"../../analysis/{output_avg_std_of_replicates_txt_file_name_vap}"
-            )
-        ):
-            file_written_bool = True
-
-        file_written_bool_list.append(file_written_bool)
-
-    if False not in file_written_bool_list:
-        all_file_written_bool_pass = True
+    """Check that the replica averages are written for the replica groups of all the jobs."""
+    if not analysis_status_bits() & status_bit_replica_averages_written:
+        return False
 
-    return all_file_written_bool_pass
+    replica_averages_group_key_list = get_analysis_registry(jobs[0].project)["replica_averages"]
+    return all(replica_group_key(job) in replica_averages_group_key_list for job in jobs)
 
 # check if analysis for critical points is completed
 #@Project.pre(part_5a_analysis_individual_simulation_averages_completed)
@@ -457,28 +997,7 @@ def part_5b_analysis_replica_averages_completed(*jobs):
 @Project.label
 def part_5c_analysis_critical_and_boiling_points_replicate_data_completed(*jobs):
     """Check that the critical and boiling point replicate file is written ."""
-    file_written_bool_list = []
-    all_file_written_bool_pass = False
-    for job in jobs:
-        file_written_bool = False
-
-        if (
-            job.isfile(
-                f"../../analysis/{output_critical_data_replicate_txt_file_name}"
-            ) \
-                and
-            job.isfile(
-                f"../../analysis/{output_boiling_data_replicate_txt_file_name}"
-            )
-        ):
-            file_written_bool = True
-
-        file_written_bool_list.append(file_written_bool)
-
-    if False not in file_written_bool_list:
-        all_file_written_bool_pass = True
-
-    return file_written_bool
+    return bool(analysis_status_bits() & status_bit_critical_and_boiling_replicate_written)
 
 # check if analysis for critical points is completed
 #@Project.pre(part_5a_analysis_individual_simulation_averages_completed)
@@ -487,35 +1006,724 @@ def part_5c_analysis_critical_and_boiling_points_replicate_data_completed(*jobs)
 @Project.label
 def part_5d_analysis_critical_and_boiling_points_avg_std_data_completed(*jobs):
     """Check that the avg and std dev critical and boiling point data file is written ."""
-    file_written_bool_list = []
-    all_file_written_bool_pass = False
-    for job in jobs:
-        file_written_bool = False
-
-        if (
-            job.isfile(
-                f"../../analysis/{output_critical_data_avg_std_of_replicates_txt_file_name}"
-            ) \
-                and
-                job.isfile(
-                    f"../../analysis/{output_boiling_data_avg_std_of_replicates_txt_file_name}"
-                )
-        ):
-            file_written_bool = True
+    return bool(analysis_status_bits() & status_bit_critical_and_boiling_avg_std_written)
+
+
+# ******************************************************
+# ******************************************************
+# check if GOMC simulation are completed properly (end)
+# ******************************************************
+# ******************************************************
+
+# ******************************************************
+# ******************************************************
+# content-addressed cache of the parameterized molecule templates (start)
+# ******************************************************
+# ******************************************************
+template_cache_directory_name = "template_cache"
+template_cache_version = 1
+
+# the in process loaded molecules, by their mol2 file hash, so they are only parsed once
+loaded_molecule_template_dict = {}
+
+
+def get_file_sha256(file_path):
+    """Get the sha256 hex hash of the file contents."""
+    with open(file_path, "rb") as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+def get_molecule_template_cache_key(
+        forcefield_file, mol2_file_list, residues_list, bead_to_atom_name_dict, fixed_bonds_angles_list
+):
+    """Get the template cache key, as the hash of the force field (FF) and mol2 files, and the residue options."""
+    try:
+        mosdef_gomc_version = importlib.metadata.version("mosdef_gomc")
+    except importlib.metadata.PackageNotFoundError:
+        mosdef_gomc_version = "unknown"
+
+    template_key_dict = {
+        "template_cache_version": template_cache_version,
+        "mosdef_gomc_version": mosdef_gomc_version,
+        "forcefield_file_sha256": get_file_sha256(forcefield_file),
+        "mol2_file_sha256_list": [get_file_sha256(mol2_file) for mol2_file in mol2_file_list],
+        "residues_list": residues_list,
+        "bead_to_atom_name_dict": bead_to_atom_name_dict,
+        "fixed_bonds_angles_list": fixed_bonds_angles_list,
+    }
 
-        file_written_bool_list.append(file_written_bool)
+    return hashlib.sha256(json.dumps(template_key_dict, sort_keys=True).encode("utf-8")).hexdigest()
 
-    if False not in file_written_bool_list:
-        all_file_written_bool_pass = True
 
-    return file_written_bool
+def load_molecule_template(mol2_file):
+    """Load the mol2 molecule once per process, returning a copy of it."""
+    mol2_file_sha256 = get_file_sha256(mol2_file)
+    if mol2_file_sha256 not in loaded_molecule_template_dict:
+        loaded_molecule_template_dict[mol2_file_sha256] = mb.load(mol2_file)
 
+    return mb.clone(loaded_molecule_template_dict[mol2_file_sha256])
+
+
+def get_template_cache_ff_file(template_cache_key):
+    """Get the cached force field (FF) file path for the template cache key."""
+    return os.path.join(
+        project_directory_path, template_cache_directory_name, template_cache_key, f"{gomc_ff_filename_str}.inp"
+    )
+
+
+def add_ff_file_to_template_cache(template_cache_key, ff_file):
+    """Add the written force field (FF) file to the template cache, atomically so other jobs never read part of it."""
+    template_cache_ff_file = get_template_cache_ff_file(template_cache_key)
+    os.makedirs(os.path.dirname(template_cache_ff_file), exist_ok=True)
+    template_cache_ff_file_tmp = f"{template_cache_ff_file}.{os.getpid()}.tmp"
+    shutil.copyfile(ff_file, template_cache_ff_file_tmp)
+    os.replace(template_cache_ff_file_tmp, template_cache_ff_file)
 
 # ******************************************************
 # ******************************************************
-# check if GOMC simulation are completed properly (end)
+# content-addressed cache of the parameterized molecule templates (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# lattice box packer, for the rigid molecules (start)
+# ******************************************************
+# ******************************************************
+# The box packing method: "lattice" (the molecules on a jittered cubic lattice with random orientations,
+# checked for overlaps with NumPy cell lists), or "packmol" (mb.fill_box).
+# If the lattice packing can not remove all the overlaps, packmol is used.
+box_packing_method = "lattice"
+box_packing_overlap_nm = 0.2
+box_packing_lattice_max_tries = 200
+box_packing_atom_chunk_size = 100000
+
+
+def get_random_orientation_matrices(no_rotations, rng):
+    """Get uniformly distributed random rotation matrices, from random unit quaternions."""
+    quaternions = rng.normal(size=(no_rotations, 4))
+    quaternions /= np.linalg.norm(quaternions, axis=1)[:, np.newaxis]
+    w, x, y, z = quaternions.T
+
+    return np.stack([
+        np.stack([1 - 2 * (y ** 2 + z ** 2), 2 * (x * y - z * w), 2 * (x * z + y * w)], axis=1),
+        np.stack([2 * (x * y + z * w), 1 - 2 * (x ** 2 + z ** 2), 2 * (y * z - x * w)], axis=1),
+        np.stack([2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x ** 2 + y ** 2)], axis=1),
+    ], axis=1)
+
+
+def get_overlapping_molecules(coordinates, atom_molecule_index_array, box_length, overlap_distance,
+                              query_molecules=None):
+    """Get the query molecules with an atom closer than the overlap distance to another molecule's atom.
+
+    The atoms are put in a periodic cell list, and each query atom is only compared to the atoms in its
+    own and the neighboring cells.  If two query molecules overlap, only the higher index one is returned.
+    All the molecules are the query molecules, if query_molecules is None.
+    """
+    coordinates = np.mod(coordinates, box_length)
+    no_molecules = atom_molecule_index_array.max() + 1
+    query_molecule_bool_array = np.ones(no_molecules, dtype=bool)
+    if query_molecules is not None:
+        query_molecule_bool_array[:] = False
+        query_molecule_bool_array[query_molecules] = True
+
+    no_cells_per_side = max(int(box_length // overlap_distance), 1)
+    cell_length = box_length / no_cells_per_side
+    cell_xyz_index_array = np.minimum((coordinates // cell_length).astype(np.int64), no_cells_per_side - 1)
+    cell_index_array = np.ravel_multi_index(cell_xyz_index_array.T, (no_cells_per_side,) * 3)
+
+    # the atoms in each cell, padded with -1 to the max atoms in a cell
+    atom_sort_order = np.argsort(cell_index_array, kind="stable")
+    sorted_cell_index_array = cell_index_array[atom_sort_order]
+    cell_atom_counts = np.bincount(sorted_cell_index_array, minlength=no_cells_per_side ** 3)
+    cell_atom_starts = np.concatenate([[0], np.cumsum(cell_atom_counts)[:-1]])
+    position_in_cell = np.arange(len(sorted_cell_index_array)) - cell_atom_starts[sorted_cell_index_array]
+    cell_atoms = np.full((no_cells_per_side ** 3, cell_atom_counts.max()), -1, dtype=np.int64)
+    cell_atoms[sorted_cell_index_array, position_in_cell] = atom_sort_order
+
+    query_atom_array = np.nonzero(query_molecule_bool_array[atom_molecule_index_array])[0]
+    overlapping_molecule_bool_array = np.zeros(no_molecules, dtype=bool)
+    neighbor_offset_array = np.array(
+        [(dx, dy, dz) for dx in [-1, 0, 1] for dy in [-1, 0, 1] for dz in [-1, 0, 1]]
+    )
+    for chunk_start in range(0, len(query_atom_array), box_packing_atom_chunk_size):
+        atoms_i = query_atom_array[chunk_start: chunk_start + box_packing_atom_chunk_size]
+        molecules_i = atom_molecule_index_array[atoms_i]
+        for neighbor_offset in neighbor_offset_array:
+            neighbor_cells = np.ravel_multi_index(
+                np.mod(cell_xyz_index_array[atoms_i] + neighbor_offset, no_cells_per_side).T,
+                (no_cells_per_side,) * 3
+            )
+            atoms_j = cell_atoms[neighbor_cells]
+            molecules_j = atom_molecule_index_array[atoms_j]
+
+            # the other molecule's atoms, which are not query molecules with a higher index
+            valid_pairs = (atoms_j >= 0) & (molecules_j != molecules_i[:, np.newaxis]) & (
+                ~query_molecule_bool_array[molecules_j] | (molecules_j < molecules_i[:, np.newaxis])
+            )
+            separations = coordinates[atoms_i][:, np.newaxis, :] - coordinates[atoms_j]
+            separations -= box_length * np.round(separations / box_length)
+            overlapping_pairs = valid_pairs & (np.einsum("ijk,ijk->ij", separations, separations) < overlap_distance ** 2)
+            overlapping_molecule_bool_array[molecules_i[overlapping_pairs.any(axis=1)]] = True
+
+    return np.nonzero(overlapping_molecule_bool_array)[0]
+
+
+# the cubic lattices the packer can use: the unit cell sites, and the nearest site distance per unit cell length
+box_packing_lattice_basis_dict = {
+    "fcc": (np.array([[0, 0, 0], [0.5, 0.5, 0], [0.5, 0, 0.5], [0, 0.5, 0.5]]), 1 / np.sqrt(2)),
+    "bcc": (np.array([[0, 0, 0], [0.5, 0.5, 0.5]]), np.sqrt(3) / 2),
+    "sc": (np.array([[0, 0, 0]]), 1),
+}
+
+
+def get_box_packing_lattice(no_molecules, box_length):
+    """Get the lattice basis and unit cells per side, with the largest nearest site distance for the molecules.
+
+    The unit cells per side are rounded up to fit all the molecules, so the best lattice depends on the
+    number of molecules (e.g., 50 molecules only need 54 BCC sites, but 108 FCC sites).
+    """
+    lattice_list = []
+    for lattice_basis, nearest_site_distance_per_length in box_packing_lattice_basis_dict.values():
+        no_unit_cells_per_side = int(np.ceil((no_molecules / len(lattice_basis)) ** (1 / 3) - 1e-9))
+        nearest_site_distance = box_length / no_unit_cells_per_side * nearest_site_distance_per_length
+        lattice_list.append((nearest_site_distance, lattice_basis, no_unit_cells_per_side))
+    nearest_site_distance, lattice_basis, no_unit_cells_per_side = max(lattice_list, key=lambda lattice: lattice[0])
+
+    return lattice_basis + 0.25, no_unit_cells_per_side, nearest_site_distance
+
+
+def lattice_pack_box_coordinates(molecule_coordinates, no_molecules, box_length, overlap_distance, rng):
+    """Pack the rigid molecule on a jittered cubic lattice (FCC, BCC, or SC) with random orientations.
+
+    The overlapping molecules are given new orientations and sites, until there are no overlaps.
+    Returns the packed atom coordinates, or None if the overlaps can not be removed.
+    """
+    molecule_coordinates = molecule_coordinates - molecule_coordinates.mean(axis=0)
+    lattice_basis, no_unit_cells_per_side, nearest_site_distance = get_box_packing_lattice(no_molecules, box_length)
+    no_basis_sites = len(lattice_basis)
+    no_sites = no_basis_sites * no_unit_cells_per_side ** 3
+    unit_cell_length = box_length / no_unit_cells_per_side
+    max_jitter = max(
+        0, nearest_site_distance - 2 * np.linalg.norm(molecule_coordinates, axis=1).max() - overlap_distance
+    ) / 2
+
+    site_index_array = rng.choice(no_sites, size=no_molecules, replace=False)
+    unit_cell_xyz_array = np.array(
+        np.unravel_index(site_index_array // no_basis_sites, (no_unit_cells_per_side,) * 3)
+    ).T
+    site_centers = (unit_cell_xyz_array + lattice_basis[site_index_array % no_basis_sites]) * unit_cell_length
+    atom_molecule_index_array = np.repeat(np.arange(no_molecules), len(molecule_coordinates))
+
+    molecule_centers = site_centers + rng.uniform(-max_jitter, max_jitter, (no_molecules, 3))
+    molecule_orientations = get_random_orientation_matrices(no_molecules, rng)
+    query_molecules = None
+    for try_i in range(box_packing_lattice_max_tries):
+        coordinates = (
+            np.einsum("mij,aj->mai", molecule_orientations, molecule_coordinates) + molecule_centers[:, np.newaxis, :]
+        ).reshape(-1, 3)
+        overlapping_molecules = get_overlapping_molecules(
+            coordinates, atom_molecule_index_array, box_length, overlap_distance, query_molecules=query_molecules
+        )
+        if len(overlapping_molecules) == 0:
+            return coordinates
+
+        # the overlapping molecules get new orientations, and about half of them are moved to empty
+        # lattice sites, if there are any.  Only the re-drawn molecules need checked on the next try.
+        empty_site_index_array = np.setdiff1d(np.arange(no_sites), site_index_array)
+        moved_molecules = overlapping_molecules[rng.random(len(overlapping_molecules)) < 0.5]
+        moved_molecules = moved_molecules[:len(empty_site_index_array)]
+        site_index_array[moved_molecules] = rng.choice(empty_site_index_array, size=len(moved_molecules), replace=False)
+        unit_cell_xyz_array = np.array(
+            np.unravel_index(site_index_array[moved_molecules] // no_basis_sites, (no_unit_cells_per_side,) * 3)
+        ).T
+        site_centers[moved_molecules] = (
+            unit_cell_xyz_array + lattice_basis[site_index_array[moved_molecules] % no_basis_sites]
+        ) * unit_cell_length
+
+        molecule_orientations[overlapping_molecules] = get_random_orientation_matrices(len(overlapping_molecules), rng)
+        molecule_centers[overlapping_molecules] = site_centers[overlapping_molecules] + rng.uniform(
+            -max_jitter, max_jitter, (len(overlapping_molecules), 3)
+        )
+        query_molecules = overlapping_molecules
+
+    return None
+
+
+def build_packed_box_compound(molecule_type_list, no_molecules, coordinates, box_length_nm):
+    """Build the packed box mbuild Compound, with the molecules at the coordinates, as made by mb.fill_box."""
+    packed_box = mb.Compound()
+    for molecule_i in range(no_molecules):
+        packed_box.add(mb.clone(molecule_type_list[0]))
+    packed_box.xyz = coordinates
+    packed_box.box = mb.Box(lengths=[box_length_nm, box_length_nm, box_length_nm])
+
+    return packed_box
+
+
+def pack_box(molecule_type_list, no_molecules, box_length_nm, rng):
+    """Pack the box, with the box_packing_method."""
+    if box_packing_method == "lattice" and len(molecule_type_list) == 1:
+        coordinates = lattice_pack_box_coordinates(
+            molecule_type_list[0].xyz, no_molecules, box_length_nm, box_packing_overlap_nm, rng
+        )
+        if coordinates is not None:
+            return build_packed_box_compound(molecule_type_list, no_molecules, coordinates, box_length_nm)
+        print('The lattice packing could not remove all the overlaps, so packmol is used.')
+
+    return mb.fill_box(compound=molecule_type_list,
+                       n_compounds=no_molecules,
+                       box=[box_length_nm, box_length_nm, box_length_nm]
+                       )
+
+# ******************************************************
+# ******************************************************
+# lattice box packer, for the rigid molecules (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# packed box library, in place of packing each job's boxes (start)
+# ******************************************************
+# ******************************************************
+packed_box_library_directory_name = "packed_box_library"
+packed_box_library_version = 1
+
+# the max random rotation of each molecule about its center, in degrees, when a library box is reused
+# Note: the boxes are also given a random cube rotation and periodic shift, which keep the packing valid.
+packed_box_library_molecule_max_rotation_deg = 5
+
+
+def get_packed_box_library_file(mol2_file, no_molecules, box_length_ang):
+    """Get the packed box library file, keyed by the mol2 file hash, number of molecules, and box length."""
+    packed_box_key_dict = {
+        "packed_box_library_version": packed_box_library_version,
+        "mol2_file_sha256": get_file_sha256(mol2_file),
+        "no_molecules": int(no_molecules),
+        "box_length_ang": round(float(box_length_ang), 3),
+    }
+    packed_box_key = hashlib.sha256(json.dumps(packed_box_key_dict, sort_keys=True).encode("utf-8")).hexdigest()
+
+    return os.path.join(project_directory_path, packed_box_library_directory_name, f"{packed_box_key}.npz")
+
+
+def get_cube_rotation_matrix_list():
+    """Get the 24 proper rotation matrices of a cube."""
+    rotation_matrix_list = []
+    for axes_order in [[0, 1, 2], [0, 2, 1], [1, 0, 2], [1, 2, 0], [2, 0, 1], [2, 1, 0]]:
+        for axes_signs in np.array(np.meshgrid([1, -1], [1, -1], [1, -1])).T.reshape(-1, 3):
+            rotation_matrix = np.eye(3)[axes_order] * axes_signs[:, np.newaxis]
+            if np.linalg.det(rotation_matrix) > 0:
+                rotation_matrix_list.append(rotation_matrix)
+
+    return rotation_matrix_list
+
+
+def get_random_rotation_matrices(no_rotations, max_rotation_deg, rng):
+    """Get random rotation matrices, about random axes, by up to max_rotation_deg."""
+    axes = rng.normal(size=(no_rotations, 3))
+    axes /= np.linalg.norm(axes, axis=1)[:, np.newaxis]
+    angles = np.deg2rad(rng.uniform(-max_rotation_deg, max_rotation_deg, no_rotations))
+
+    # Rodrigues' rotation formula
+    cross_product_matrices = np.zeros((no_rotations, 3, 3))
+    cross_product_matrices[:, 0, 1], cross_product_matrices[:, 0, 2] = -axes[:, 2], axes[:, 1]
+    cross_product_matrices[:, 1, 0], cross_product_matrices[:, 1, 2] = axes[:, 2], -axes[:, 0]
+    cross_product_matrices[:, 2, 0], cross_product_matrices[:, 2, 1] = -axes[:, 1], axes[:, 0]
+
+    return np.eye(3) + np.sin(angles)[:, np.newaxis, np.newaxis] * cross_product_matrices \
+        + (1 - np.cos(angles))[:, np.newaxis, np.newaxis] * cross_product_matrices @ cross_product_matrices
+
+
+def perturb_packed_box_coordinates(coordinates, no_molecules, box_length, rng):
+    """Move the packed box molecules as rigid bodies: a cube rotation, a periodic shift, and small molecule rotations."""
+    molecule_coordinates = coordinates.reshape(no_molecules, -1, 3)
+    box_center = np.full(3, box_length / 2)
+    cube_rotation_matrix_list = get_cube_rotation_matrix_list()
+    cube_rotation_matrix = cube_rotation_matrix_list[rng.integers(len(cube_rotation_matrix_list))]
+    molecule_coordinates = (molecule_coordinates - box_center) @ cube_rotation_matrix.T + box_center
+
+    molecule_centers = molecule_coordinates.mean(axis=1)
+    molecule_rotation_matrices = get_random_rotation_matrices(
+        no_molecules, packed_box_library_molecule_max_rotation_deg, rng
+    )
+    molecule_coordinates = np.einsum(
+        "mij,maj->mai", molecule_rotation_matrices, molecule_coordinates - molecule_centers[:, np.newaxis, :]
+    )
+
+    # the molecule centers are shifted and wrapped back into the box
+    molecule_centers = np.mod(molecule_centers + rng.uniform(0, box_length, 3), box_length)
+
+    return (molecule_coordinates + molecule_centers[:, np.newaxis, :]).reshape(-1, 3)
+
+
+def fill_box_from_packed_box_library(molecule_type_list, mol2_file, no_molecules, box_length_ang, rng):
+    """Get the packed box from the packed box library, with the molecules randomly moved, or pack and add it."""
+    packed_box_library_file = get_packed_box_library_file(mol2_file, no_molecules, box_length_ang)
+    box_length_nm = box_length_ang / 10
+    if not os.path.isfile(packed_box_library_file):
+        print(f'Packing the box, and adding it to the packed box library: {packed_box_library_file}')
+        packed_box = pack_box(molecule_type_list, no_molecules, box_length_nm, rng)
+        os.makedirs(os.path.dirname(packed_box_library_file), exist_ok=True)
+        packed_box_library_file_tmp = f"{packed_box_library_file[:-len('.npz')]}.{os.getpid()}.tmp.npz"
+        np.savez(packed_box_library_file_tmp, xyz=packed_box.xyz.astype(np.float32), box_length_nm=box_length_nm)
+        os.replace(packed_box_library_file_tmp, packed_box_library_file)
+
+        return packed_box
+
+    print(f'Using the packed box library: {packed_box_library_file}')
+    with np.load(packed_box_library_file) as packed_box_library_data:
+        coordinates = packed_box_library_data["xyz"].astype(np.float64)
+
+    return build_packed_box_compound(
+        molecule_type_list,
+        no_molecules,
+        perturb_packed_box_coordinates(coordinates, no_molecules, box_length_nm, rng),
+        box_length_nm,
+    )
+
+# ******************************************************
+# ******************************************************
+# packed box library, in place of packing each job's boxes (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# initial GEMC box sizes and molecule counts, from the NPT replica averages (start)
+# ******************************************************
+# ******************************************************
+def get_npt_liquid_density_temp_K_and_molecules_per_ang_cubed():
+    """Get the temperatures and the liquid number densities (molecules/Angstrom**3) from the NPT replica averages,
+    at the npt_production_pressure_bar pressure.
+    """
+    npt_avg_file = os.path.join(
+        project_directory_path, npt_project_relative_path, "analysis", npt_avg_std_of_replicates_txt_file_name_liq
+    )
+    if not os.path.isfile(npt_avg_file):
+        return None, None
+
+    npt_data = pd.read_csv(npt_avg_file, sep='\s+', header=0, na_values='NaN', index_col=False)
+    # the NPT replica averages of other pressures are not mixed into the temperature averages
+    npt_data = npt_data[np.isclose(npt_data.loc[:, "P_bar"], npt_production_pressure_bar)]
+    npt_data = npt_data.assign(molecules_per_ang_cubed=npt_data.loc[:, "No_mol"] / npt_data.loc[:, "V_ang_cubed"])
+    npt_data = npt_data.groupby("T_K", as_index=False)["molecules_per_ang_cubed"].mean()
+    npt_data = npt_data.sort_values("T_K")
+    if len(npt_data) == 0:
+        return None, None
+
+    return npt_data.loc[:, "T_K"].to_numpy(), npt_data.loc[:, "molecules_per_ang_cubed"].to_numpy()
+
+
+def convert_kg_per_m_cubed_to_molecules_per_ang_cubed(density_kg_per_m_cubed):
+    """Convert the density from kg/m**3 to molecules/Angstrom**3."""
+    return density_kg_per_m_cubed * 10 ** 3 / molecule_A_molar_mass_g_per_mol * 6.02214076 * 10 ** 23 * 10 ** -30
+
+
+def interpolate_liquid_density(temperature_K, temp_K_array, density_array):
+    """Interpolate the liquid density (molecules/Angstrom**3) to the temperature.
+
+    Below the data it is extrapolated linearly, and above the data it follows the scaling law to the critical point.
+    """
+    if temperature_K > temp_K_array[-1]:
+        critical_density = convert_kg_per_m_cubed_to_molecules_per_ang_cubed(critical_density_estimate_kg_per_m_cubed)
+        if temperature_K >= critical_temp_estimate_K or temp_K_array[-1] >= critical_temp_estimate_K:
+            return critical_density
+        scaling_amplitude = (density_array[-1] - critical_density) \
+            / (critical_temp_estimate_K - temp_K_array[-1]) ** 0.325
+
+        return critical_density + scaling_amplitude * (critical_temp_estimate_K - temperature_K) ** 0.325
+
+    if len(temp_K_array) == 1:
+        return density_array[0]
+    if temperature_K >= temp_K_array[0]:
+        return np.interp(temperature_K, temp_K_array, density_array)
+
+    slope = (density_array[1] - density_array[0]) / (temp_K_array[1] - temp_K_array[0])
+
+    return density_array[0] + slope * (temperature_K - temp_K_array[0])
+
+
+def interpolate_vapor_density_estimate(temperature_K):
+    """Interpolate the vapor density estimate (kg/m**3) to the temperature, as ln(density) vs 1/T."""
+    temp_K_array = np.array(sorted(vapor_density_estimate_temp_K_to_kg_per_m_cubed_dict.keys()), dtype=float)
+    density_array = np.array([vapor_density_estimate_temp_K_to_kg_per_m_cubed_dict[temp_i] for temp_i in temp_K_array])
+    inverse_temp_array = 1 / temp_K_array[::-1]
+    ln_density_array = np.log(density_array[::-1])
+
+    # extrapolate linearly in 1/T outside the data (Clausius-Clapeyron like)
+    if 1 / temperature_K < inverse_temp_array[0]:
+        end_indices = [0, 1]
+    elif 1 / temperature_K > inverse_temp_array[-1]:
+        end_indices = [-2, -1]
+    else:
+        return np.exp(np.interp(1 / temperature_K, inverse_temp_array, ln_density_array))
+    slope = (ln_density_array[end_indices[1]] - ln_density_array[end_indices[0]]) \
+        / (inverse_temp_array[end_indices[1]] - inverse_temp_array[end_indices[0]])
+
+    return np.exp(ln_density_array[end_indices[0]] + slope * (1 / temperature_K - inverse_temp_array[end_indices[0]]))
+
+
+def interpolate_temp_to_value_dict(temp_to_value_dict, temperature_K):
+    """Get the hand set value at the temperature, interpolated linearly between the set temperatures.
+
+    The set temperatures use their value as is, and the temperatures outside them use the nearest value.
+    """
+    if temperature_K in temp_to_value_dict:
+        return temp_to_value_dict[temperature_K]
+
+    temp_K_list = sorted(temp_to_value_dict.keys())
+    return float(np.interp(temperature_K, temp_K_list, [temp_to_value_dict[temp_i] for temp_i in temp_K_list]))
+
+
+def get_gemc_initial_boxes_from_npt(temperature_K):
+    """Get the initial GEMC box lengths (Angstrom) and molecule counts from the NPT replica averages.
+
+    Returns None if the NPT replica averages do not exist.
+    """
+    temp_K_array, liquid_molecules_per_ang_cubed_array = get_npt_liquid_density_temp_K_and_molecules_per_ang_cubed()
+    if temp_K_array is None:
+        return None
+
+    vapor_molecules_per_ang_cubed = convert_kg_per_m_cubed_to_molecules_per_ang_cubed(
+        interpolate_vapor_density_estimate(temperature_K)
+    )
+    liquid_molecules_per_ang_cubed = max(
+        interpolate_liquid_density(temperature_K, temp_K_array, liquid_molecules_per_ang_cubed_array),
+        vapor_molecules_per_ang_cubed,
+    )
+
+    # split the molecules so both boxes have about the same volume
+    box_1_molecules = int(max(
+        gemc_box_1_min_molecules,
+        round(gemc_total_molecules * vapor_molecules_per_ang_cubed
+              / (liquid_molecules_per_ang_cubed + vapor_molecules_per_ang_cubed)),
+    ))
+    box_0_molecules = gemc_total_molecules - box_1_molecules
+
+    return {
+        "box_0_length_ang": float((box_0_molecules / liquid_molecules_per_ang_cubed) ** (1 / 3)),
+        "box_1_length_ang": float((box_1_molecules / vapor_molecules_per_ang_cubed) ** (1 / 3)),
+        "box_0_molecules": box_0_molecules,
+        "box_1_molecules": box_1_molecules,
+        "seed_source": "npt_replica_averages",
+    }
+
+# ******************************************************
+# ******************************************************
+# initial GEMC box sizes and molecule counts, from the NPT replica averages (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
 # ******************************************************
+# warm-start from the nearest completed state point, with the boxes rescaled (start)
 # ******************************************************
+# ******************************************************
+def get_warm_start_group_jobs(job):
+    """Get the jobs with the same state point as the job, except for the temperature."""
+    return [
+        other_job for other_job in get_statepoint_group_jobs(job, statepoint_without_temperature)
+        if other_job.id != job.id
+    ]
+
+
+def get_warm_start_donor_job(job):
+    """Get the nearest temperature job with a completed production run, or None if none is close enough."""
+    donor_job_list = [
+        other_job for other_job in get_warm_start_group_jobs(job)
+        if abs(other_job.sp.production_temperature_K - job.sp.production_temperature_K)
+        <= warm_start_max_temperature_difference_K
+        and part_4b_job_production_run_completed_properly(other_job)
+    ]
+    if len(donor_job_list) == 0:
+        return None
+
+    return min(
+        donor_job_list,
+        key=lambda other_job: (
+            abs(other_job.sp.production_temperature_K - job.sp.production_temperature_K),
+            other_job.sp.production_temperature_K,
+        )
+    )
+
+
+def part_1b_warm_start_donor_ready(job):
+    """Check that the job can start: warm-start is off, it is the first job of its group, or a donor is completed."""
+    if not warm_start_from_neighbor_state_point or "warm_start" in job.doc:
+        return True
+
+    group_temp_list = [other_job.sp.production_temperature_K for other_job in get_warm_start_group_jobs(job)]
+    if len(group_temp_list) == 0 or job.sp.production_temperature_K <= min(group_temp_list):
+        return True
+
+    return get_warm_start_donor_job(job) is not None
+
+
+def read_psf_atom_molecule_indices_and_masses(psf_file):
+    """Read the molecule index (by segment and residue) and mass of each atom from the psf file."""
+    with open(psf_file, "r") as fp:
+        psf_lines = fp.readlines()
+
+    natom_line_index = next(line_i for line_i, line in enumerate(psf_lines) if "!NATOM" in line)
+    no_atoms = int(psf_lines[natom_line_index].split()[0])
+    molecule_key_to_index_dict = {}
+    molecule_index_list = []
+    mass_list = []
+    for line in psf_lines[natom_line_index + 1: natom_line_index + 1 + no_atoms]:
+        line_split = line.split()
+        molecule_index_list.append(
+            molecule_key_to_index_dict.setdefault((line_split[1], line_split[2]), len(molecule_key_to_index_dict))
+        )
+        mass_list.append(float(line_split[7]))
+
+    return np.array(molecule_index_list), np.array(mass_list)
+
+
+def read_gomc_bin_coor_file(coor_file):
+    """Read the atom coordinates from the binary (NAMD format) coor file."""
+    with open(coor_file, "rb") as fp:
+        no_atoms = int(np.frombuffer(fp.read(4), dtype="<i4")[0])
+        return np.frombuffer(fp.read(no_atoms * 3 * 8), dtype="<f8").reshape(no_atoms, 3).copy()
+
+
+def write_gomc_bin_coor_file(coor_file, coordinates):
+    """Write the atom coordinates to the binary (NAMD format) coor file."""
+    with open(coor_file, "wb") as fp:
+        fp.write(np.array([len(coordinates)], dtype="<i4").tobytes())
+        fp.write(np.ascontiguousarray(coordinates, dtype="<f8").tobytes())
+
+
+def write_warm_start_box_restart_files(donor_job, box_no, new_restart_name_str, scale_factor):
+    """Write the donor job's final box restart files to the job, with the molecule centers and box scaled."""
+    donor_restart_name = donor_job.fn(f"{gomc_production_output_name_str}_BOX_{box_no}_restart")
+    new_restart_name = f"{new_restart_name_str}_BOX_{box_no}_restart"
+
+    # the psf is not changed
+    with open(f"{donor_restart_name}.psf", "r") as fp_read, open(f"{new_restart_name}.psf", "w") as fp_write:
+        fp_write.write(fp_read.read())
+
+    # the xsc cell basis vectors are scaled, about the origin
+    with open(f"{donor_restart_name}.xsc", "r") as fp:
+        xsc_lines = fp.readlines()
+    for line_i, line in enumerate(xsc_lines):
+        if line.strip() != "" and not line.startswith("#"):
+            xsc_values = line.split()
+            origin = np.array([float(value) for value in xsc_values[10:13]])
+            xsc_values[1:10] = [str(float(value) * scale_factor) for value in xsc_values[1:10]]
+            xsc_lines[line_i] = " ".join(xsc_values) + "\n"
+    with open(f"{new_restart_name}.xsc", "w") as fp:
+        fp.writelines(xsc_lines)
+
+    # the molecules are moved as rigid bodies, by scaling their centers of mass
+    molecule_index_array, mass_array = read_psf_atom_molecule_indices_and_masses(f"{donor_restart_name}.psf")
+    coordinates = read_gomc_bin_coor_file(f"{donor_restart_name}.coor")
+    molecule_mass_array = np.bincount(molecule_index_array, weights=mass_array)
+    molecule_center_array = np.column_stack([
+        np.bincount(molecule_index_array, weights=mass_array * coordinates[:, dim_i]) / molecule_mass_array
+        for dim_i in range(3)
+    ])
+    coordinates += (scale_factor - 1) * (molecule_center_array[molecule_index_array] - origin)
+    write_gomc_bin_coor_file(f"{new_restart_name}.coor", coordinates)
+
+    # the pdb box and coordinates are kept the same as the xsc and coor files
+    with open(f"{donor_restart_name}.pdb", "r") as fp:
+        pdb_lines = fp.readlines()
+    atom_i = 0
+    for line_i, line in enumerate(pdb_lines):
+        if line.startswith("CRYST1"):
+            pdb_lines[line_i] = "CRYST1" + "".join(
+                f"{float(line[start:start + 9]) * scale_factor:9.3f}" for start in [6, 15, 24]
+            ) + line[33:]
+        elif line.startswith(("ATOM", "HETATM")):
+            pdb_lines[line_i] = line[:30] + "".join(
+                f"{coordinate:8.3f}" for coordinate in coordinates[atom_i]
+            ) + line[54:]
+            atom_i += 1
+    with open(f"{new_restart_name}.pdb", "w") as fp:
+        fp.writelines(pdb_lines)
+
+    return len(molecule_mass_array), float(abs(np.linalg.det(np.array(xsc_values[1:10], dtype=float).reshape(3, 3))))
+
+
+def write_warm_start_restart_files(job, donor_job):
+    """Write the warm-start restart files from the donor job, rescaling the boxes to the job's target densities."""
+    temperature_K = job.sp.production_temperature_K
+    donor_temperature_K = donor_job.sp.production_temperature_K
+
+    # the liquid and vapor target density ratios, the same as the initial GEMC box sizes
+    vapor_density_ratio = interpolate_vapor_density_estimate(donor_temperature_K) \
+        / interpolate_vapor_density_estimate(temperature_K)
+    liquid_density_ratio = 1
+    temp_K_array, liquid_molecules_per_ang_cubed_array = get_npt_liquid_density_temp_K_and_molecules_per_ang_cubed()
+    if temp_K_array is not None:
+        liquid_density_ratio = interpolate_liquid_density(
+            donor_temperature_K, temp_K_array, liquid_molecules_per_ang_cubed_array
+        ) / interpolate_liquid_density(temperature_K, temp_K_array, liquid_molecules_per_ang_cubed_array)
+
+    # the liquid box is the higher density box at the end of the donor production run
+    donor_box_density_list = []
+    for box_no in [0, 1]:
+        donor_molecule_index_array, _ = read_psf_atom_molecule_indices_and_masses(
+            donor_job.fn(f"{gomc_production_output_name_str}_BOX_{box_no}_restart.psf")
+        )
+        with open(donor_job.fn(f"{gomc_production_output_name_str}_BOX_{box_no}_restart.xsc"), "r") as fp:
+            donor_xsc_values = [line.split() for line in fp if line.strip() != "" and not line.startswith("#")][-1]
+        donor_box_volume = abs(np.linalg.det(np.array(donor_xsc_values[1:10], dtype=float).reshape(3, 3)))
+        donor_box_density_list.append(len(np.unique(donor_molecule_index_array)) / donor_box_volume)
+    liquid_box_no = 0 if donor_box_density_list[0] >= donor_box_density_list[1] else 1
+
+    warm_start_dict = {
+        "donor_job_id": donor_job.id,
+        "donor_temperature_K": donor_temperature_K,
+        "liquid_box_no": liquid_box_no,
+    }
+    gemc_initial_boxes_dict = {"seed_source": f"warm_start_{donor_job.id}"}
+    for box_no in [0, 1]:
+        density_ratio = liquid_density_ratio if box_no == liquid_box_no else vapor_density_ratio
+        scale_factor = float(density_ratio ** (1 / 3))
+        box_molecules, box_volume_ang_cubed = write_warm_start_box_restart_files(
+            donor_job, box_no, warm_start_restart_name_str, scale_factor
+        )
+        warm_start_dict[f"box_{box_no}_scale_factor"] = scale_factor
+        gemc_initial_boxes_dict[f"box_{box_no}_length_ang"] = float(box_volume_ang_cubed ** (1 / 3))
+        gemc_initial_boxes_dict[f"box_{box_no}_molecules"] = int(box_molecules)
+
+    # the Charmm object is built with the donor's molecule counts and the rescaled box sizes,
+    # so the pdb, psf and control files match the warm-start restart files
+    job.doc.gemc_initial_boxes = gemc_initial_boxes_dict
+    job.doc.warm_start = warm_start_dict
+
+    print(f"Warm-start from job id {donor_job.id} ({donor_temperature_K} K): {warm_start_dict}")
+
+
+def warm_start_restart_files_written(job):
+    """Check if the job document has the warm-start, and its restart files are in the job directory."""
+    return "warm_start" in job.doc and all(
+        job.isfile(f"{warm_start_restart_name_str}_BOX_{box_no}_restart.{file_extension_str}")
+        for box_no in [0, 1]
+        for file_extension_str in ["pdb", "psf", "coor", "xsc"]
+    )
+
+
+def remove_warm_start_job_doc_keys(job):
+    """Remove the warm-start and its initial boxes from the job document, if the warm-start restart files are missing."""
+    if "warm_start" in job.doc:
+        del job.doc["warm_start"]
+    if str(job.doc.get("gemc_initial_boxes", {}).get("seed_source", "")).startswith("warm_start"):
+        del job.doc["gemc_initial_boxes"]
+
+# ******************************************************
+# ******************************************************
+# warm-start from the nearest completed state point, with the boxes rescaled (end)
+# ******************************************************
+# ******************************************************
+
 
 # ******************************************************
 # ******************************************************
@@ -581,7 +1789,7 @@ def build_charmm(job, write_files=True):
     #total_molecules_vapor = 30
 
     forcefield_files = '../../SPCE_GMSO.xml'
-    molecule_A = mb.load('../../SPCE.mol2')
+    molecule_A = load_molecule_template('../../SPCE.mol2')
     molecule_A.name = 'WAT'
 
     molecule_type_list = [molecule_A]
@@ -595,16 +1803,44 @@ def build_charmm(job, write_files=True):
     #print('total_molecules_liquid = ' + str(total_molecules_liquid))
     #print('total_molecules_vapor = ' + str(total_molecules_vapor))
 
-    box_0_box_size_ang = box_0_temp_to_length_ang_dict[job.sp.production_temperature_K]
-    box_1_box_size_ang = box_1_temp_to_length_ang_dict[job.sp.production_temperature_K]
-    box_0_molecules = box_0_temp_to_molecules_dict[job.sp.production_temperature_K]
-    box_1_molecules = box_1_temp_to_molecules_dict[job.sp.production_temperature_K]
+    # the initial boxes are saved in the job document the first time, so the rebuilds
+    # for the control files use the same boxes, even if the NPT replica averages change
+    if "gemc_initial_boxes" not in job.doc:
+        gemc_initial_boxes_dict = get_gemc_initial_boxes_from_npt(job.sp.production_temperature_K)
+        if gemc_initial_boxes_dict is None:
+            print('The NPT replica averages do not exist, so the hand set box sizes and molecule counts are used.')
+            gemc_initial_boxes_dict = {
+                "box_0_length_ang": interpolate_temp_to_value_dict(
+                    box_0_temp_to_length_ang_dict, job.sp.production_temperature_K
+                ),
+                "box_1_length_ang": interpolate_temp_to_value_dict(
+                    box_1_temp_to_length_ang_dict, job.sp.production_temperature_K
+                ),
+                "box_0_molecules": int(round(interpolate_temp_to_value_dict(
+                    box_0_temp_to_molecules_dict, job.sp.production_temperature_K
+                ))),
+                "box_1_molecules": int(round(interpolate_temp_to_value_dict(
+                    box_1_temp_to_molecules_dict, job.sp.production_temperature_K
+                ))),
+                "seed_source": "build_charmm_dicts",
+            }
+        job.doc.gemc_initial_boxes = gemc_initial_boxes_dict
+
+    box_0_box_size_ang = job.doc.gemc_initial_boxes["box_0_length_ang"]
+    box_1_box_size_ang = job.doc.gemc_initial_boxes["box_1_length_ang"]
+    box_0_molecules = job.doc.gemc_initial_boxes["box_0_molecules"]
+    box_1_molecules = job.doc.gemc_initial_boxes["box_1_molecules"]
+    print(f"Initial boxes ({job.doc.gemc_initial_boxes['seed_source']}): "
+          f"box 0 = {box_0_molecules} molecules, L = {box_0_box_size_ang:.3f} Angstrom; "
+          f"box 1 = {box_1_molecules} molecules, L = {box_1_box_size_ang:.3f} Angstrom")
+
+    # the packed boxes are reused from the packed box library, with the molecules randomly moved for each job
+    packed_box_rng = np.random.default_rng(int(job.id, 16))
 
     print('Running: liquid phase box packing')
-    box_liq = mb.fill_box(compound=molecule_type_list,
-                          n_compounds=box_0_molecules,
-                          box=[box_0_box_size_ang/10, box_0_box_size_ang/10, box_0_box_size_ang/10]
-                          )
+    box_liq = fill_box_from_packed_box_library(
+        molecule_type_list, '../../SPCE.mol2', box_0_molecules, box_0_box_size_ang, packed_box_rng
+    )
     #removed 5/9/2023
     #box_liq.energy_minimize(forcefield=forcefield_files,
     #                        steps=10 ** 5
@@ -612,10 +1848,9 @@ def build_charmm(job, write_files=True):
     print('Completed: liquid phase box packing')
 
     print('Running: vapor phase box packing')
-    box_vap = mb.fill_box(compound=molecule_type_list,
-                          n_compounds=box_1_molecules,
-                          box=[box_1_box_size_ang/10, box_1_box_size_ang/10, box_1_box_size_ang/10]
-                          )
+    box_vap = fill_box_from_packed_box_library(
+        molecule_type_list, '../../SPCE.mol2', box_1_molecules, box_1_box_size_ang, packed_box_rng
+    )
     #removed 5/9/2023
     #box_vap.energy_minimize(forcefield=forcefield_files,
     #                        steps=10 ** 5
@@ -626,6 +1861,8 @@ def build_charmm(job, write_files=True):
     print('molecule_mol_fraction_list =  ' + str(molecule_mol_fraction_list))
 
     print('Running: GOMC FF file, and the psf and pdb files')
+    # the Charmm object is typed for every job, as it keeps the job's box coordinates for the psf and pdb
+    # files, so only its force field (FF) file is reused from the template cache
     gomc_charmm = mf_charmm.Charmm(
         box_liq,
         mosdef_structure_box_0_name_str,
@@ -639,7 +1876,19 @@ def build_charmm(job, write_files=True):
     )
 
     if write_files == True:
-        gomc_charmm.write_inp()
+        # the force field (FF) file is the same for all the jobs with the same template,
+        # so it is only written once, and then copied from the template cache
+        template_cache_key = get_molecule_template_cache_key(
+            forcefield_files, ['../../SPCE.mol2'], residues_list, bead_to_atom_name_dict, fixed_bonds_angles_list
+        )
+        template_cache_ff_file = get_template_cache_ff_file(template_cache_key)
+        if os.path.isfile(template_cache_ff_file):
+            print(f'Using the template cache force field (FF) file: {template_cache_key}')
+            shutil.copyfile(template_cache_ff_file, f"{gomc_ff_filename_str}.inp")
+        else:
+            gomc_charmm.write_inp()
+            add_ff_file_to_template_cache(template_cache_key, f"{gomc_ff_filename_str}.inp")
+        job.doc.template_cache_key = template_cache_key
 
         gomc_charmm.write_psf()
 
@@ -659,39 +1908,88 @@ def build_charmm(job, write_files=True):
 
 # ******************************************************
 # ******************************************************
-# Creating GOMC files (pdb, psf, force field (FF), and gomc control files (start)
+# electrostatics scheme and run steps of each job (start)
 # ******************************************************
 # ******************************************************
-@Project.pre(part_1a_initial_data_input_to_json)
-@Project.post(part_2a_gomc_equilb_design_ensemble_control_file_written)
-@Project.post(part_2b_gomc_production_control_file_written)
-@Project.post(mosdef_input_written)
-@Project.operation(directives=
-    {
-        "np": 1,
-        "ngpu": 0,
-        "memory": memory_needed,
-        "walltime": walltime_mosdef_hr,
-    }, with_job=True
-)
-def build_psf_pdb_ff_gomc_conf(job):
-    """Build the Charmm object and write the pdb, psd, and force field (FF) files for all the simulations in the workspace."""
-    gomc_charmm_object_with_files = build_charmm(job, write_files=True)
+def get_electrostatics_scheme(job):
+    """Get the job's electrostatics scheme, which is "EWALD" if it is not in the state point."""
+    return job.sp.get("electrostatics_scheme", "EWALD")
 
-    # ******************************************************
-    # common variables (start)
-    # ******************************************************
-    # variables from signac workspace
-    box_0_temp_to_rcutcoulomb_dict = {300:12,
-                                     350: 12,
-                                     400: 12,
-                                     450: 12,
-                                     500: 12,
-                                     550: 12,
-                                     575: 12,
-                                     600: 12,
-                                     615: 10,
-                                     625: 10,
+
+def get_gomc_run_steps(job, control_file_name_str):
+    """Get the GOMC run steps of the control file, which are fixed by the benchmark jobs' state point."""
+    if "benchmark_gomc_steps" in job.sp:
+        return int(job.sp.benchmark_gomc_steps)
+    if control_file_name_str == gomc_equilb_control_file_name_str:
+        return int(warm_start_gomc_steps_equilibration if "warm_start" in job.doc else gomc_steps_equilibration)
+
+    return int(gomc_steps_production)
+
+
+def get_gomc_output_freq(job, output_freq, no_outputs_per_run):
+    """Get the GOMC output frequency, which is at most the run steps over no_outputs_per_run for the benchmark jobs."""
+    if "benchmark_gomc_steps" in job.sp:
+        return int(max(min(output_freq, int(job.sp.benchmark_gomc_steps) // no_outputs_per_run), 1))
+
+    return int(output_freq)
+
+
+def get_gomc_job_output_freq_dict(job):
+    """Get the job's GOMC restart (coordinate), console and Blk file output frequencies."""
+    return {
+        "coordinate_output_freq": get_gomc_output_freq(job, coordinate_output_freq, 1),
+        "console_output_freq": get_gomc_output_freq(job, console_output_freq, electrostatics_benchmark_no_output_blocks),
+        "block_ave_output_freq": get_gomc_output_freq(job, block_ave_output_freq, electrostatics_benchmark_no_output_blocks),
+    }
+
+
+def get_electrostatics_scheme_control_keywords(job):
+    """Get the electrostatics scheme keywords of the job, with the autotuned Wolf alpha of each box."""
+    electrostatics_scheme_control_keywords = dict(electrostatics_scheme_control_keywords_dict[get_electrostatics_scheme(job)])
+    electrostatics_autotune_selected_dict = job.doc.get("electrostatics_autotune", {}).get("selected")
+    if electrostatics_autotune_selected_dict is not None and "WolfAlpha 0" in electrostatics_scheme_control_keywords:
+        for box_no in [0, 1]:
+            electrostatics_scheme_control_keywords[f"WolfAlpha {box_no}"] = \
+                f"{electrostatics_autotune_selected_dict['WolfAlpha']}"
+
+    return electrostatics_scheme_control_keywords
+
+
+def add_electrostatics_scheme_control_keywords(job, control_file_name_str):
+    """Add the electrostatics scheme keywords to the control file written in the current directory."""
+    electrostatics_scheme_control_keywords = get_electrostatics_scheme_control_keywords(job)
+    if len(electrostatics_scheme_control_keywords) == 0:
+        return
+
+    with open(f"{control_file_name_str}.conf", "a") as fp:
+        for keyword_str, value_str in electrostatics_scheme_control_keywords.items():
+            fp.write(f"{keyword_str}\t{value_str}\n")
+
+# ******************************************************
+# ******************************************************
+# electrostatics scheme and run steps of each job (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# GOMC control file variables, and the control file only regeneration (start)
+# ******************************************************
+# ******************************************************
+def get_gomc_common_control_variables(job):
+    """Get the GOMC control file variables, which are common to the equilb and production control files."""
+    # variables from signac workspace
+    box_0_temp_to_rcutcoulomb_dict = {300:12,
+                                     350: 12,
+                                     400: 12,
+                                     450: 12,
+                                     500: 12,
+                                     550: 12,
+                                     575: 12,
+                                     600: 12,
+                                     615: 10,
+                                     625: 10,
                                      }
     
     box_1_temp_to_rcutcoulomb_dict = {300:100,
@@ -715,11 +2013,23 @@ def build_psf_pdb_ff_gomc_conf(job):
     LRC = True
     Ewald_tol=0.00001
     Exclude = "1-4"
-    RcutCoulomb_box_0 = box_0_temp_to_rcutcoulomb_dict[job.sp.production_temperature_K]*u.angstrom
-    RcutCoulomb_box_1 = box_1_temp_to_rcutcoulomb_dict[job.sp.production_temperature_K]*u.angstrom
+    # the temperatures between (or outside) the set temperatures use the interpolated (or nearest) cutoffs
+    RcutCoulomb_box_0 = interpolate_temp_to_value_dict(
+        box_0_temp_to_rcutcoulomb_dict, job.sp.production_temperature_K
+    )*u.angstrom
+    RcutCoulomb_box_1 = interpolate_temp_to_value_dict(
+        box_1_temp_to_rcutcoulomb_dict, job.sp.production_temperature_K
+    )*u.angstrom
     #RcutCoulomb_box_0=14.0 * u.angstrom
     #RcutCoulomb_box_1=17.0 * u.angstrom
 
+    # the autotuned values (see part_2d_autotune_electrostatics) replace the hand set values
+    electrostatics_autotune_selected_dict = job.doc.get("electrostatics_autotune", {}).get("selected")
+    if electrostatics_autotune_selected_dict is not None:
+        RcutCoulomb_box_0 = electrostatics_autotune_selected_dict["RcutCoulomb_box_0"] * u.angstrom
+        RcutCoulomb_box_1 = electrostatics_autotune_selected_dict["RcutCoulomb_box_1"] * u.angstrom
+        Ewald_tol = electrostatics_autotune_selected_dict["Ewald_tol"]
+
     # MC move ratios
     DisFreq = 0.34
     RotFreq = 0.34
@@ -732,6 +2042,926 @@ def build_psf_pdb_ff_gomc_conf(job):
     SwapFreq = 0.20
     MEMC_2Freq = 0.0
 
+    # CBMC trials
+    CBMC_First = 12
+    CBMC_Nth = 10
+
+    # the autotuned values (see part_4c_autotune_move_mix) replace the hand set values
+    move_mix_autotune_selected_dict = job.doc.get("move_mix_autotune", {}).get("selected")
+    if move_mix_autotune_selected_dict is not None:
+        DisFreq = move_mix_autotune_selected_dict["DisFreq"]
+        RotFreq = move_mix_autotune_selected_dict["RotFreq"]
+        VolFreq = move_mix_autotune_selected_dict["VolFreq"]
+        MultiParticleFreq = move_mix_autotune_selected_dict["MultiParticleFreq"]
+        RegrowthFreq = move_mix_autotune_selected_dict["RegrowthFreq"]
+        IntraSwapFreq = move_mix_autotune_selected_dict["IntraSwapFreq"]
+        IntraMEMC_2Freq = move_mix_autotune_selected_dict["IntraMEMC_2Freq"]
+        CrankShaftFreq = move_mix_autotune_selected_dict["CrankShaftFreq"]
+        SwapFreq = move_mix_autotune_selected_dict["SwapFreq"]
+        MEMC_2Freq = move_mix_autotune_selected_dict["MEMC_2Freq"]
+        CBMC_First = move_mix_autotune_selected_dict["CBMC_First"]
+        CBMC_Nth = move_mix_autotune_selected_dict["CBMC_Nth"]
+
+    return {
+        "production_temperature_K": production_temperature_K,
+        "seed_no": seed_no,
+        "Rcut_ang": Rcut_ang,
+        "Rcut_low_ang": Rcut_low_ang,
+        "LRC": LRC,
+        "Ewald_tol": Ewald_tol,
+        "Exclude": Exclude,
+        "RcutCoulomb_box_0": RcutCoulomb_box_0,
+        "RcutCoulomb_box_1": RcutCoulomb_box_1,
+        "DisFreq": DisFreq,
+        "RotFreq": RotFreq,
+        "VolFreq": VolFreq,
+        "MultiParticleFreq": MultiParticleFreq,
+        "RegrowthFreq": RegrowthFreq,
+        "IntraSwapFreq": IntraSwapFreq,
+        "IntraMEMC_2Freq": IntraMEMC_2Freq,
+        "CrankShaftFreq": CrankShaftFreq,
+        "SwapFreq": SwapFreq,
+        "MEMC_2Freq": MEMC_2Freq,
+        "CBMC_First": CBMC_First,
+        "CBMC_Nth": CBMC_Nth,
+    }
+
+
+def get_gomc_control_file_keyword_values(job, control_file_name_str):
+    """Get the GOMC control file keyword values, which the workflow sets, as the control file text."""
+    gomc_common_control_variables_dict = get_gomc_common_control_variables(job)
+    MC_steps = get_gomc_run_steps(job, control_file_name_str)
+    gomc_job_output_freq_dict = get_gomc_job_output_freq_dict(job)
+
+    gomc_control_file_keyword_values_dict = {
+        "RunSteps": f"{int(MC_steps)}",
+        "Ewald": f"{get_electrostatics_scheme(job) == 'EWALD'}",
+        "Temperature": f"{gomc_common_control_variables_dict['production_temperature_K'].to_value('K')}",
+        "Random_Seed": f"{gomc_common_control_variables_dict['seed_no']}",
+        "LRC": f"{gomc_common_control_variables_dict['LRC']}",
+        "Rcut": f"{gomc_common_control_variables_dict['Rcut_ang'].to_value('angstrom')}",
+        "RcutLow": f"{gomc_common_control_variables_dict['Rcut_low_ang'].to_value('angstrom')}",
+        "RcutCoulomb 0": f"{gomc_common_control_variables_dict['RcutCoulomb_box_0'].to_value('angstrom')}",
+        "RcutCoulomb 1": f"{gomc_common_control_variables_dict['RcutCoulomb_box_1'].to_value('angstrom')}",
+        "Tolerance": f"{gomc_common_control_variables_dict['Ewald_tol']}",
+        "Exclude": f"{gomc_common_control_variables_dict['Exclude']}",
+        "EqSteps": f"{EqSteps}",
+        "AdjSteps": f"{AdjSteps}",
+        "PressureCalc": f"True {pressure_calc_freq}",
+        "RestartFreq": f"True {gomc_job_output_freq_dict['coordinate_output_freq']}",
+        "CheckpointFreq": f"True {gomc_job_output_freq_dict['coordinate_output_freq']}",
+        "DCDFreq": f"True {gomc_job_output_freq_dict['coordinate_output_freq']}",
+        "ConsoleFreq": f"True {gomc_job_output_freq_dict['console_output_freq']}",
+        "BlockAverageFreq": f"True {gomc_job_output_freq_dict['block_ave_output_freq']}",
+    }
+    for move_freq_variable_str, move_freq_keyword_str in [
+        ("DisFreq", "DisFreq"),
+        ("RotFreq", "RotFreq"),
+        ("VolFreq", "VolFreq"),
+        ("MultiParticleFreq", "MultiParticleFreq"),
+        ("RegrowthFreq", "RegrowthFreq"),
+        ("IntraSwapFreq", "IntraSwapFreq"),
+        ("IntraMEMC_2Freq", "IntraMEMC-2Freq"),
+        ("CrankShaftFreq", "CrankShaftFreq"),
+        ("SwapFreq", "SwapFreq"),
+        ("MEMC_2Freq", "MEMC-2Freq"),
+        ("CBMC_First", "CBMC_First"),
+        ("CBMC_Nth", "CBMC_Nth"),
+    ]:
+        gomc_control_file_keyword_values_dict[move_freq_keyword_str] = \
+            f"{gomc_common_control_variables_dict[move_freq_variable_str]}"
+    gomc_control_file_keyword_values_dict.update(get_electrostatics_scheme_control_keywords(job))
+
+    return gomc_control_file_keyword_values_dict
+
+
+def get_gomc_control_file_line_keyword(line, gomc_control_file_keyword_values_dict):
+    """Get the workflow set keyword (including the box number for the box keywords) of the control file line."""
+    line_split = line.split()
+    if len(line_split) == 0 or line_split[0].startswith("#"):
+        return None
+    if " ".join(line_split[:2]) in gomc_control_file_keyword_values_dict:
+        return " ".join(line_split[:2])
+    if line_split[0] in gomc_control_file_keyword_values_dict:
+        return line_split[0]
+
+    return None
+
+
+def save_gomc_control_file_metadata(job, control_file_name_str, residues_list):
+    """Save the written control file, and its structure, force field (FF) and box metadata, in the job document.
+
+    This is the template for writing the control file again, without building the Charmm object.
+    Note: the control file is read from the current directory, where it was written.
+    """
+    with open(f"{control_file_name_str}.conf", "r") as fp:
+        conf_line_list = fp.read().splitlines()
+
+    control_file_metadata_dict = {
+        "conf_lines": conf_line_list,
+        "residues": list(residues_list),
+        "keyword_values": get_gomc_control_file_keyword_values(job, control_file_name_str),
+    }
+    for line in conf_line_list:
+        line_split = line.split()
+        if len(line_split) >= 2 and line_split[0] == "Parameters":
+            control_file_metadata_dict["ff_filename"] = line_split[1]
+        elif len(line_split) >= 3 and line_split[0] in ["Coordinates", "Structure"]:
+            control_file_metadata_dict[f"{line_split[0]}_box_{line_split[1]}"] = line_split[2]
+        elif len(line_split) >= 5 and line_split[0].startswith("CellBasisVector"):
+            control_file_metadata_dict[f"{line_split[0]}_box_{line_split[1]}"] = \
+                [float(value) for value in line_split[2:5]]
+
+    job.doc.setdefault("gomc_control_file_metadata", {})[control_file_name_str] = control_file_metadata_dict
+
+
+def write_gomc_control_file_from_metadata(job, control_file_name_str):
+    """Write the control file again from the job document template, with the current workflow keyword values."""
+    control_file_metadata_dict = job.doc.gomc_control_file_metadata[control_file_name_str]
+    gomc_control_file_keyword_values_dict = get_gomc_control_file_keyword_values(job, control_file_name_str)
+
+    conf_line_list = []
+    for line in control_file_metadata_dict["conf_lines"]:
+        line_keyword = get_gomc_control_file_line_keyword(line, gomc_control_file_keyword_values_dict)
+        if line_keyword is None:
+            conf_line_list.append(line)
+        else:
+            conf_line_list.append(f"{line_keyword: <25} {gomc_control_file_keyword_values_dict[line_keyword]}")
+
+    control_file = job.fn(f"{control_file_name_str}.conf")
+    with open(f"{control_file}.tmp", "w") as fp:
+        fp.write("\n".join(conf_line_list) + "\n")
+    os.replace(f"{control_file}.tmp", control_file)
+
+    job.doc.gomc_control_file_metadata[control_file_name_str]["keyword_values"] = gomc_control_file_keyword_values_dict
+
+
+def gomc_control_file_regeneration_needed(job, control_file_name_str):
+    """Check if the control file's simulation is not started, and its workflow keyword values have changed."""
+    if gomc_simulation_started(job, control_file_name_str) \
+            or gomc_segmented_run_started(job, control_file_name_str) \
+            or not gomc_control_file_written(job, control_file_name_str):
+        return False
+
+    control_file_metadata_dict = job.doc.get("gomc_control_file_metadata", {}).get(control_file_name_str)
+    if control_file_metadata_dict is None:
+        return True
+
+    return control_file_metadata_dict["keyword_values"] \
+        != get_gomc_control_file_keyword_values(job, control_file_name_str)
+
+
+@Project.label
+def part_2c_gomc_control_files_up_to_date(job):
+    """Check that the control files of the simulations not started use the current workflow keyword values."""
+    return not any(
+        gomc_control_file_regeneration_needed(job, control_file_name_str)
+        for control_file_name_str in [gomc_equilb_control_file_name_str, gomc_production_control_file_name_str]
+    )
+
+
+@Project.pre(part_2a_gomc_equilb_design_ensemble_control_file_written)
+@Project.pre(part_2b_gomc_production_control_file_written)
+@Project.post(part_2c_gomc_control_files_up_to_date)
+@Project.operation(directives=
+    {
+        "np": 1,
+        "ngpu": 0,
+        "memory": memory_needed,
+        "walltime": walltime_gomc_analysis_hr,
+    }, with_job=True
+)
+def part_2c_regenerate_gomc_control_files(job):
+    """Write the control files again with the current workflow keyword values, without building the Charmm object."""
+    for control_file_name_str in [gomc_equilb_control_file_name_str, gomc_production_control_file_name_str]:
+        if not gomc_control_file_regeneration_needed(job, control_file_name_str):
+            continue
+
+        # the control files written before the metadata was saved are used as the template
+        if control_file_name_str not in job.doc.get("gomc_control_file_metadata", {}):
+            save_gomc_control_file_metadata(job, control_file_name_str, [])
+
+        write_gomc_control_file_from_metadata(job, control_file_name_str)
+        print(f"Completed: the {control_file_name_str}.conf GOMC control file is written again")
+
+# ******************************************************
+# ******************************************************
+# GOMC control file variables, and the control file only regeneration (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# electrostatics autotuning, from short GOMC probes of the equilb starting configuration (start)
+# ******************************************************
+# ******************************************************
+autotune_probe_control_file_name_str = "probe"
+autotune_probe_input_file_keyword_list = [
+    "Parameters", "Coordinates", "Structure", "binCoordinates", "extendedSystem", "binVelocities"
+]
+
+
+def get_electrostatics_autotune_probe_list(job):
+    """Get the autotune probe settings, with the reference probe first, and then all the candidate combinations."""
+    gomc_common_control_variables_dict = get_gomc_common_control_variables(job)
+    control_file_metadata_dict = job.doc.gomc_control_file_metadata[gomc_equilb_control_file_name_str]
+
+    rcutcoulomb_candidates_dict = {}
+    for box_no, rcutcoulomb_candidates_ang in [
+        (0, autotune_rcutcoulomb_box_0_candidates_ang), (1, autotune_rcutcoulomb_box_1_candidates_ang)
+    ]:
+        max_rcutcoulomb_ang = 0.5 * min(
+            np.linalg.norm(control_file_metadata_dict[f"CellBasisVector{vector_no}_box_{box_no}"])
+            for vector_no in [1, 2, 3]
+        )
+        rcutcoulomb_candidates_dict[box_no] = sorted({
+            float(rcutcoulomb_ang) for rcutcoulomb_ang in list(rcutcoulomb_candidates_ang)
+            + [gomc_common_control_variables_dict[f"RcutCoulomb_box_{box_no}"].to_value("angstrom")]
+            if rcutcoulomb_ang <= max_rcutcoulomb_ang
+        }) or [float(max_rcutcoulomb_ang)]
+
+    ewald_tol_candidates = sorted({float(ewald_tol) for ewald_tol in autotune_ewald_tol_candidates}
+                                  | {float(gomc_common_control_variables_dict["Ewald_tol"])})
+    electrostatics_scheme_control_keywords = electrostatics_scheme_control_keywords_dict[get_electrostatics_scheme(job)]
+
+    reference_probe_dict = {
+        "Ewald": True,
+        "RcutCoulomb_box_0": rcutcoulomb_candidates_dict[0][-1],
+        "RcutCoulomb_box_1": rcutcoulomb_candidates_dict[1][-1],
+        "Ewald_tol": ewald_tol_candidates[0],
+        "WolfAlpha": None,
+    }
+    probe_list = [reference_probe_dict]
+    for rcutcoulomb_box_0_ang in rcutcoulomb_candidates_dict[0]:
+        for rcutcoulomb_box_1_ang in rcutcoulomb_candidates_dict[1]:
+            if get_electrostatics_scheme(job) == "EWALD":
+                accuracy_probe_dict_list = [
+                    {"Ewald": True, "Ewald_tol": ewald_tol, "WolfAlpha": None} for ewald_tol in ewald_tol_candidates
+                ]
+            else:
+                accuracy_probe_dict_list = [
+                    {"Ewald": False, "Ewald_tol": float(gomc_common_control_variables_dict["Ewald_tol"]),
+                     "WolfAlpha": wolf_alpha}
+                    for wolf_alpha in sorted({float(wolf_alpha) for wolf_alpha in autotune_wolf_alpha_candidates}
+                                             | {float(electrostatics_scheme_control_keywords["WolfAlpha 0"])})
+                ]
+            for accuracy_probe_dict in accuracy_probe_dict_list:
+                probe_dict = {
+                    "Ewald": accuracy_probe_dict["Ewald"],
+                    "RcutCoulomb_box_0": rcutcoulomb_box_0_ang,
+                    "RcutCoulomb_box_1": rcutcoulomb_box_1_ang,
+                    "Ewald_tol": accuracy_probe_dict["Ewald_tol"],
+                    "WolfAlpha": accuracy_probe_dict["WolfAlpha"],
+                }
+                if probe_dict != reference_probe_dict:
+                    probe_list.append(probe_dict)
+
+    return probe_list
+
+
+def write_gomc_probe_control_file(job, template_control_file_name_str, probe_keyword_values_dict, probe_directory):
+    """Write the probe control file in the probe directory, from a control file template in the job document.
+
+    The probe starts from the same configuration as the template, and its input files are read from the job directory.
+    """
+    conf_line_list = []
+    for line in job.doc.gomc_control_file_metadata[template_control_file_name_str]["conf_lines"]:
+        line_split = line.split()
+        line_keyword = get_gomc_control_file_line_keyword(line, probe_keyword_values_dict)
+        if line_keyword is not None:
+            conf_line_list.append(f"{line_keyword: <25} {probe_keyword_values_dict[line_keyword]}")
+        elif len(line_split) >= 2 and line_split[0] in autotune_probe_input_file_keyword_list:
+            conf_line_list.append(" ".join(line_split[:-1] + [job.fn(line_split[-1])]))
+        else:
+            conf_line_list.append(line)
+
+    with open(os.path.join(probe_directory, f"{autotune_probe_control_file_name_str}.conf"), "w") as fp:
+        fp.write("\n".join(conf_line_list) + "\n")
+
+
+def run_gomc_probe(job, probe_directory, gomc_binary_file=None, gomc_ncpu=None):
+    """Run the GOMC probe control file in the probe directory, and get its wall time (s).
+
+    The job's equilb binary file and gomc_ncpu are used, if they are not given.
+    """
+    run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
+        str(gomc_binary_path),
+        str(job.doc.gomc_equilb_design_ensemble_gomc_binary_file if gomc_binary_file is None else gomc_binary_file),
+        str(job.doc.gomc_ncpu if gomc_ncpu is None else gomc_ncpu),
+        str(autotune_probe_control_file_name_str),
+        str(autotune_probe_control_file_name_str),
+    )
+    start_time_s = time.perf_counter()
+    subprocess.run(run_command, shell=True, cwd=probe_directory)
+
+    return time.perf_counter() - start_time_s
+
+
+def write_electrostatics_autotune_probe_control_file(job, probe_dict, probe_directory, probe_gomc_steps):
+    """Write the electrostatics probe control file in the probe directory, from the equilb control file template."""
+    probe_keyword_values_dict = get_gomc_control_file_keyword_values(job, gomc_equilb_control_file_name_str)
+    probe_keyword_values_dict.update({
+        "RunSteps": f"{int(probe_gomc_steps)}",
+        "OutputName": autotune_probe_control_file_name_str,
+        "Ewald": f"{probe_dict['Ewald']}",
+        "RcutCoulomb 0": f"{probe_dict['RcutCoulomb_box_0']}",
+        "RcutCoulomb 1": f"{probe_dict['RcutCoulomb_box_1']}",
+        "Tolerance": f"{probe_dict['Ewald_tol']}",
+        "PressureCalc": f"False {pressure_calc_freq}",
+        "RestartFreq": f"False {coordinate_output_freq}",
+        "CheckpointFreq": f"False {coordinate_output_freq}",
+        "DCDFreq": f"False {coordinate_output_freq}",
+        "ConsoleFreq": f"True {max(int(probe_gomc_steps), 1)}",
+        "BlockAverageFreq": f"False {block_ave_output_freq}",
+    })
+    if probe_dict["WolfAlpha"] is None:
+        for wolf_keyword_str in ["Wolf", "DSF"]:
+            if wolf_keyword_str in probe_keyword_values_dict:
+                probe_keyword_values_dict[wolf_keyword_str] = "False"
+    else:
+        for box_no in [0, 1]:
+            probe_keyword_values_dict[f"WolfAlpha {box_no}"] = f"{probe_dict['WolfAlpha']}"
+
+    write_gomc_probe_control_file(job, gomc_equilb_control_file_name_str, probe_keyword_values_dict, probe_directory)
+
+
+def get_gomc_console_first_total_energies(console_file):
+    """Get the total energy (K) of each box at the first energy output (the starting configuration) of the console file."""
+    energy_title_list = None
+    first_total_energy_dict = {}
+    with open(console_file, "r") as fp:
+        for line in fp:
+            if line.startswith("ETITLE:") and energy_title_list is None:
+                energy_title_list = line.split()
+            elif energy_title_list is not None:
+                for box_no in [0, 1]:
+                    if line.startswith(f"ENER_{box_no}:") and box_no not in first_total_energy_dict:
+                        first_total_energy_dict[box_no] = float(line.split()[energy_title_list.index("TOTAL")])
+            if len(first_total_energy_dict) == 2:
+                break
+
+    return first_total_energy_dict
+
+
+def get_pdb_no_residues(pdb_file):
+    """Get the number of residues (molecules) in the pdb file, from the residue changes in its ATOM records."""
+    no_residues = 0
+    last_residue_str = None
+    with open(pdb_file, "r") as fp:
+        for line in fp:
+            if line.startswith(("ATOM", "HETATM")) and line[17:27] != last_residue_str:
+                no_residues += 1
+                last_residue_str = line[17:27]
+
+    return no_residues
+
+
+def run_electrostatics_autotune_probe(job, probe_dict, probe_no):
+    """Run the GOMC probe, and get its steps per second, and the starting total energy of each box.
+
+    The wall time of the startup probe (in the startup subdirectory) is subtracted from the probe's wall time.
+    """
+    probe_directory = job.fn(os.path.join(autotune_directory_name, f"probe_{probe_no}"))
+    startup_probe_directory = os.path.join(probe_directory, "startup")
+    os.makedirs(startup_probe_directory, exist_ok=True)
+    write_electrostatics_autotune_probe_control_file(
+        job, probe_dict, startup_probe_directory, autotune_startup_probe_gomc_steps
+    )
+    startup_time_s = run_gomc_probe(job, startup_probe_directory)
+    write_electrostatics_autotune_probe_control_file(job, probe_dict, probe_directory, autotune_probe_gomc_steps)
+    probe_time_s = run_gomc_probe(job, probe_directory)
+
+    probe_step_time_s = probe_time_s - startup_time_s
+    if probe_step_time_s <= 0:
+        print(f"WARNING: The electrostatics autotune probe_{probe_no} wall time ({probe_time_s:.3f} s) is not more "
+              f"than its startup time ({startup_time_s:.3f} s), so the startup time is not subtracted. "
+              f"Increase the autotune_probe_gomc_steps.")
+        probe_step_time_s = probe_time_s
+
+    first_total_energy_dict = get_gomc_console_first_total_energies(
+        os.path.join(probe_directory, f"out_{autotune_probe_control_file_name_str}.dat")
+    )
+    probe_result_dict = dict(probe_dict)
+    probe_result_dict.update({
+        "wall_time_s": probe_time_s,
+        "startup_time_s": startup_time_s,
+        "steps_per_s": (autotune_probe_gomc_steps - autotune_startup_probe_gomc_steps) / probe_step_time_s
+        if len(first_total_energy_dict) == 2 else 0.0,
+        "TOTAL_box_0": first_total_energy_dict.get(0),
+        "TOTAL_box_1": first_total_energy_dict.get(1),
+    })
+
+    return probe_result_dict
+
+
+def get_electrostatics_autotune_donor_job(job):
+    """Get an autotuned job at the same state point, except the replica, so its autotuned values are reused."""
+    for other_job in get_statepoint_group_jobs(job, statepoint_without_replica):
+        if other_job.id != job.id and "electrostatics_autotune" in other_job.doc:
+            return other_job
+
+    return None
+
+
+@Project.label
+def part_2d_electrostatics_autotune_completed(job):
+    """Check that the electrostatics are autotuned, if the autotuning is used."""
+    return not autotune_electrostatics or "electrostatics_autotune" in job.doc
+
+
+def part_2d_electrostatics_autotune_ready(job):
+    """Check that the autotuning is used, and the production simulation is not started."""
+    return autotune_electrostatics and not part_3b_output_gomc_production_run_started(job)
+
+
+@Project.pre(part_2a_gomc_equilb_design_ensemble_control_file_written)
+@Project.pre(part_2b_gomc_production_control_file_written)
+@Project.pre(part_2d_electrostatics_autotune_ready)
+@Project.post(part_2d_electrostatics_autotune_completed)
+@Project.operation(directives=
+    {
+        "np": lambda job: job.doc.gomc_ncpu,
+        "ngpu": lambda job: job.doc.gomc_ngpu,
+        "memory": memory_needed,
+        "walltime": walltime_gomc_analysis_hr,
+    }, with_job=True
+)
+def part_2d_autotune_electrostatics(job):
+    """Autotune the RcutCoulomb of each box, and the Ewald tolerance or Wolf alpha, with short GOMC probes.
+
+    The control files are written again with the autotuned values by part_2c_regenerate_gomc_control_files.
+    """
+    electrostatics_autotune_donor_job = get_electrostatics_autotune_donor_job(job)
+    if electrostatics_autotune_donor_job is not None:
+        job.doc.electrostatics_autotune = dict(electrostatics_autotune_donor_job.doc.electrostatics_autotune)
+        job.doc.electrostatics_autotune["donor_job_id"] = electrostatics_autotune_donor_job.id
+        print(f"Completed: the electrostatics autotuned values are reused from job id {electrostatics_autotune_donor_job.id}")
+        return
+
+    # the control files written before the metadata was saved are used as the template
+    if gomc_equilb_control_file_name_str not in job.doc.get("gomc_control_file_metadata", {}):
+        save_gomc_control_file_metadata(job, gomc_equilb_control_file_name_str, [])
+
+    probe_list = get_electrostatics_autotune_probe_list(job)
+    reference_probe_result_dict = run_electrostatics_autotune_probe(job, probe_list[0], 0)
+    if reference_probe_result_dict["steps_per_s"] == 0:
+        raise ValueError(
+            f"The electrostatics autotune reference probe failed, see the {autotune_directory_name}/probe_0 directory."
+        )
+
+    # the vapor box energy deviation is per molecule, as its total energy is near zero
+    box_1_molecules = max(get_pdb_no_residues(job.fn(
+        job.doc.gomc_control_file_metadata[gomc_equilb_control_file_name_str]["Coordinates_box_1"]
+    )), 1)
+    probe_result_list = []
+    for probe_no, probe_dict in enumerate(probe_list[1:], start=1):
+        probe_result_dict = run_electrostatics_autotune_probe(job, probe_dict, probe_no)
+        if probe_result_dict["steps_per_s"] > 0:
+            relative_energy_deviation_box_0 = abs(
+                probe_result_dict["TOTAL_box_0"] / reference_probe_result_dict["TOTAL_box_0"] - 1
+            )
+            energy_deviation_box_1_K_per_molecule = abs(
+                probe_result_dict["TOTAL_box_1"] - reference_probe_result_dict["TOTAL_box_1"]
+            ) / box_1_molecules
+        else:
+            relative_energy_deviation_box_0 = np.nan
+            energy_deviation_box_1_K_per_molecule = np.nan
+        probe_result_dict["relative_energy_deviation_box_0"] = float(relative_energy_deviation_box_0)
+        probe_result_dict["energy_deviation_box_1_K_per_molecule"] = float(energy_deviation_box_1_K_per_molecule)
+        probe_result_dict["acceptable"] = bool(
+            probe_result_dict["steps_per_s"] > 0
+            and relative_energy_deviation_box_0 <= autotune_max_relative_energy_deviation_box_0
+            and energy_deviation_box_1_K_per_molecule <= autotune_max_energy_deviation_box_1_K_per_molecule
+        )
+        probe_result_list.append(probe_result_dict)
+
+    # the reference probe is always acceptable, so it is selected if none of the candidates are
+    acceptable_probe_result_list = [reference_probe_result_dict] + [
+        probe_result_dict for probe_result_dict in probe_result_list if probe_result_dict["acceptable"]
+    ]
+    selected_probe_result_dict = max(
+        acceptable_probe_result_list, key=lambda probe_result_dict: probe_result_dict["steps_per_s"]
+    )
+
+    job.doc.electrostatics_autotune = {
+        "reference": reference_probe_result_dict,
+        "probes": probe_result_list,
+        "selected": {
+            "RcutCoulomb_box_0": selected_probe_result_dict["RcutCoulomb_box_0"],
+            "RcutCoulomb_box_1": selected_probe_result_dict["RcutCoulomb_box_1"],
+            "Ewald_tol": selected_probe_result_dict["Ewald_tol"],
+            "WolfAlpha": selected_probe_result_dict["WolfAlpha"],
+            "steps_per_s": selected_probe_result_dict["steps_per_s"],
+        },
+    }
+    print(
+        f"Completed: the electrostatics autotune selected RcutCoulomb = {selected_probe_result_dict['RcutCoulomb_box_0']} "
+        f"(box 0), {selected_probe_result_dict['RcutCoulomb_box_1']} (box 1), "
+        f"Ewald_tol = {selected_probe_result_dict['Ewald_tol']}, WolfAlpha = {selected_probe_result_dict['WolfAlpha']}, "
+        f"from {len(probe_list)} probes"
+    )
+
+# ******************************************************
+# ******************************************************
+# electrostatics autotuning, from short GOMC probes of the equilb starting configuration (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# GOMC launch autotuning (gomc_ncpu, and the CPU or GPU binary), from benchmarks and a cost model (start)
+# ******************************************************
+# ******************************************************
+def gpu_present():
+    """Check if nvidia-smi finds a GPU on this node."""
+    if shutil.which("nvidia-smi") is None:
+        return False
+    nvidia_smi_output = subprocess.run(["nvidia-smi", "-L"], capture_output=True, text=True)
+
+    return nvidia_smi_output.returncode == 0 and "GPU" in nvidia_smi_output.stdout
+
+
+def gomc_gpu_binary_available():
+    """Check if the GOMC_GPU_GEMC binary is in gomc_binary_path (on the submitting node, which may not have a GPU)."""
+    return os.path.isfile(os.path.join(os.path.expanduser(gomc_binary_path), "GOMC_GPU_GEMC"))
+
+
+def get_available_gomc_cpu_or_gpu_list():
+    """Get the available GOMC binaries ("CPU" and/or "GPU"), with "GPU" only if a GPU is present."""
+    available_gomc_cpu_or_gpu_list = []
+    for gomc_cpu_or_gpu in ["CPU", "GPU"]:
+        if gomc_cpu_or_gpu == "GPU" and not gpu_present():
+            continue
+        if os.path.isfile(os.path.join(os.path.expanduser(gomc_binary_path), f"GOMC_{gomc_cpu_or_gpu}_GEMC")):
+            available_gomc_cpu_or_gpu_list.append(gomc_cpu_or_gpu)
+
+    return available_gomc_cpu_or_gpu_list
+
+
+def get_gomc_launch_cost_model_variables(job):
+    """Get the job's cost model variables, the total molecules (from the equilb psf files) and the largest RcutCoulomb."""
+    control_file_metadata_dict = job.doc.gomc_control_file_metadata[gomc_equilb_control_file_name_str]
+    no_molecules = 0
+    for box_no in [0, 1]:
+        atom_molecule_index_array, _ = read_psf_atom_molecule_indices_and_masses(
+            job.fn(control_file_metadata_dict[f"Structure_box_{box_no}"])
+        )
+        no_molecules += len(np.unique(atom_molecule_index_array))
+
+    gomc_common_control_variables_dict = get_gomc_common_control_variables(job)
+    max_rcutcoulomb_ang = max(
+        gomc_common_control_variables_dict["RcutCoulomb_box_0"].to_value("angstrom"),
+        gomc_common_control_variables_dict["RcutCoulomb_box_1"].to_value("angstrom"),
+    )
+
+    return no_molecules, float(max_rcutcoulomb_ang)
+
+
+def get_gomc_launch_cost_model_features(ncpu, no_molecules, max_rcutcoulomb_ang):
+    """Get the cost model features (1, log cores, log cores squared, log molecules, log cores times log molecules,
+    log largest RcutCoulomb)."""
+    return [
+        1.0, np.log(ncpu), np.log(ncpu) ** 2, np.log(no_molecules), np.log(ncpu) * np.log(no_molecules),
+        np.log(max_rcutcoulomb_ang),
+    ]
+
+
+def fit_log_linear_cost_model(features_list, log_values_list):
+    """Fit the log cost model by least squares, or get None if the features do not determine its coefficients.
+
+    The features (except the first, the intercept) with the same value in all the rows are dropped from the fit,
+    and saved as the constant features, so the model is only used for the same values (see predict_log_cost_model).
+    """
+    features_array = np.array(features_list, dtype=float)
+    constant_feature_bool_array = np.all(np.isclose(features_array, features_array[0]), axis=0)
+    constant_feature_bool_array[0] = False
+    fit_features_array = features_array[:, ~constant_feature_bool_array]
+    if len(fit_features_array) <= fit_features_array.shape[1] \
+            or np.linalg.matrix_rank(fit_features_array) < fit_features_array.shape[1]:
+        return None
+
+    fit_coefficients, _, _, _ = np.linalg.lstsq(fit_features_array, np.array(log_values_list), rcond=None)
+    cost_model_coefficients = np.zeros(features_array.shape[1])
+    cost_model_coefficients[~constant_feature_bool_array] = fit_coefficients
+
+    return {
+        "coefficients": [float(coefficient) for coefficient in cost_model_coefficients],
+        "constant_features": {
+            str(feature_i): float(features_array[0, feature_i])
+            for feature_i in np.nonzero(constant_feature_bool_array)[0]
+        },
+        "no_fit_features": int(fit_features_array.shape[1]),
+    }
+
+
+def predict_log_cost_model(cost_model_dict, features):
+    """Predict the log cost from the fit model, or get None if a constant feature of the fit has another value."""
+    for feature_i, feature_value in cost_model_dict.get("constant_features", {}).items():
+        if not np.isclose(features[int(feature_i)], feature_value):
+            return None
+
+    return float(np.dot(cost_model_dict["coefficients"], features))
+
+
+def fit_gomc_launch_cost_model(project):
+    """Fit the log steps/s cost model of each binary to all the benchmarked jobs, and save it in the project document."""
+    gomc_launch_cost_model_dict = {}
+    for gomc_cpu_or_gpu in ["CPU", "GPU"]:
+        benchmark_features_list = []
+        benchmark_log_steps_per_s_list = []
+        no_benchmarked_jobs = 0
+        for job in project:
+            gomc_launch_autotune_dict = job.doc.get("gomc_launch_autotune", {})
+            if gomc_launch_autotune_dict.get("method") != "benchmark":
+                continue
+            job_benchmark_list = [
+                benchmark_dict for benchmark_dict in gomc_launch_autotune_dict["benchmarks"]
+                if benchmark_dict["gomc_cpu_or_gpu"] == gomc_cpu_or_gpu and benchmark_dict["steps_per_s"] > 0
+            ]
+            no_benchmarked_jobs += len(job_benchmark_list) > 0
+            for benchmark_dict in job_benchmark_list:
+                benchmark_features_list.append(get_gomc_launch_cost_model_features(
+                    benchmark_dict["ncpu"], gomc_launch_autotune_dict["no_molecules"],
+                    gomc_launch_autotune_dict["max_rcutcoulomb_ang"]
+                ))
+                benchmark_log_steps_per_s_list.append(np.log(benchmark_dict["steps_per_s"]))
+
+        if no_benchmarked_jobs < launch_autotune_benchmark_no_jobs:
+            continue
+
+        # the model is not fit, if the benchmarks do not determine its coefficients (e.g., only 2 +p values)
+        cost_model_dict = fit_log_linear_cost_model(benchmark_features_list, benchmark_log_steps_per_s_list)
+        if cost_model_dict is None:
+            continue
+
+        cost_model_dict.update({
+            "no_benchmarked_jobs": int(no_benchmarked_jobs),
+            "no_benchmarks": len(benchmark_features_list),
+        })
+        gomc_launch_cost_model_dict[gomc_cpu_or_gpu] = cost_model_dict
+
+    project.doc.gomc_launch_cost_model = gomc_launch_cost_model_dict
+
+    return gomc_launch_cost_model_dict
+
+
+def select_gomc_launch(benchmark_list):
+    """Select the binary and gomc_ncpu from the benchmarks (or cost model predictions) of steps/s."""
+    selected_benchmark_dict_by_cpu_or_gpu = {}
+    for gomc_cpu_or_gpu in ["CPU", "GPU"]:
+        cpu_or_gpu_benchmark_list = sorted(
+            [
+                benchmark_dict for benchmark_dict in benchmark_list
+                if benchmark_dict["gomc_cpu_or_gpu"] == gomc_cpu_or_gpu and benchmark_dict["steps_per_s"] > 0
+            ],
+            key=lambda benchmark_dict: benchmark_dict["ncpu"],
+        )
+        if len(cpu_or_gpu_benchmark_list) == 0:
+            continue
+
+        # the largest +p value, with the parallel efficiency over the smallest +p value
+        smallest_ncpu_benchmark_dict = cpu_or_gpu_benchmark_list[0]
+        selected_benchmark_dict_by_cpu_or_gpu[gomc_cpu_or_gpu] = smallest_ncpu_benchmark_dict
+        for benchmark_dict in cpu_or_gpu_benchmark_list[1:]:
+            parallel_efficiency = (benchmark_dict["steps_per_s"] / smallest_ncpu_benchmark_dict["steps_per_s"]) \
+                / (benchmark_dict["ncpu"] / smallest_ncpu_benchmark_dict["ncpu"])
+            if parallel_efficiency >= launch_autotune_min_parallel_efficiency \
+                    and benchmark_dict["steps_per_s"] > selected_benchmark_dict_by_cpu_or_gpu[gomc_cpu_or_gpu]["steps_per_s"]:
+                selected_benchmark_dict_by_cpu_or_gpu[gomc_cpu_or_gpu] = benchmark_dict
+
+    if "GPU" in selected_benchmark_dict_by_cpu_or_gpu and (
+        "CPU" not in selected_benchmark_dict_by_cpu_or_gpu
+        or selected_benchmark_dict_by_cpu_or_gpu["GPU"]["steps_per_s"]
+        >= launch_autotune_gpu_min_speedup * selected_benchmark_dict_by_cpu_or_gpu["CPU"]["steps_per_s"]
+    ):
+        return selected_benchmark_dict_by_cpu_or_gpu["GPU"]
+
+    return selected_benchmark_dict_by_cpu_or_gpu.get("CPU")
+
+
+def gomc_console_file_completed(console_file):
+    """Check if the GOMC console file (of a probe) ends with the completed message."""
+    if not os.path.isfile(console_file):
+        return False
+    with open(console_file, "rb") as fp:
+        fp.seek(max(os.path.getsize(console_file) - gomc_console_tail_bytes, 0))
+        return "Completed" in fp.read().decode("utf-8", errors="replace")
+
+
+def run_gomc_launch_benchmarks(job, available_gomc_cpu_or_gpu_list):
+    """Run the short equilb control file benchmark of each available binary and +p value, and get their steps/s."""
+    probe_keyword_values_dict = get_gomc_control_file_keyword_values(job, gomc_equilb_control_file_name_str)
+    probe_keyword_values_dict.update({
+        "RunSteps": f"{int(launch_autotune_probe_gomc_steps)}",
+        "OutputName": autotune_probe_control_file_name_str,
+        "PressureCalc": f"False {pressure_calc_freq}",
+        "RestartFreq": f"False {coordinate_output_freq}",
+        "CheckpointFreq": f"False {coordinate_output_freq}",
+        "DCDFreq": f"False {coordinate_output_freq}",
+        "ConsoleFreq": f"True {int(launch_autotune_probe_gomc_steps)}",
+        "BlockAverageFreq": f"False {block_ave_output_freq}",
+    })
+
+    max_ncpu = len(os.sched_getaffinity(0))
+    benchmark_list = []
+    for gomc_cpu_or_gpu in available_gomc_cpu_or_gpu_list:
+        for ncpu in launch_autotune_ncpu_candidates:
+            if ncpu > max_ncpu:
+                continue
+            probe_directory = job.fn(os.path.join(launch_autotune_directory_name, f"{gomc_cpu_or_gpu}_p{ncpu}"))
+            os.makedirs(probe_directory, exist_ok=True)
+            write_gomc_probe_control_file(
+                job, gomc_equilb_control_file_name_str, probe_keyword_values_dict, probe_directory
+            )
+            probe_time_s = run_gomc_probe(job, probe_directory, f"GOMC_{gomc_cpu_or_gpu}_GEMC", ncpu)
+            probe_completed_bool = gomc_console_file_completed(
+                os.path.join(probe_directory, f"out_{autotune_probe_control_file_name_str}.dat")
+            )
+            benchmark_list.append({
+                "gomc_cpu_or_gpu": gomc_cpu_or_gpu,
+                "ncpu": int(ncpu),
+                "wall_time_s": probe_time_s,
+                "steps_per_s": launch_autotune_probe_gomc_steps / probe_time_s if probe_completed_bool else 0.0,
+            })
+
+    return benchmark_list
+
+
+@Project.label
+def part_2e_gomc_launch_autotune_completed(job):
+    """Check that the GOMC binary and gomc_ncpu are autotuned, if the autotuning is used."""
+    return not autotune_gomc_launch or "gomc_launch_autotune" in job.doc
+
+
+def part_2e_gomc_launch_autotune_ready(job):
+    """Check that the autotuning is used, and the production simulation is not started."""
+    return autotune_gomc_launch and not part_3b_output_gomc_production_run_started(job)
+
+
+@Project.pre(part_2a_gomc_equilb_design_ensemble_control_file_written)
+@Project.pre(part_2d_electrostatics_autotune_completed)
+@Project.pre(part_2e_gomc_launch_autotune_ready)
+@Project.post(part_2e_gomc_launch_autotune_completed)
+@Project.operation(directives=
+    {
+        "np": max(launch_autotune_ncpu_candidates),
+        # a GPU is only requested to benchmark the GPU binary, if it exists
+        "ngpu": lambda job: 1 if gomc_gpu_binary_available() else 0,
+        "memory": memory_needed,
+        "walltime": walltime_gomc_analysis_hr,
+    }, with_job=True
+)
+def part_2e_autotune_gomc_launch(job):
+    """Autotune the job's GOMC binary (CPU or GPU) and gomc_ncpu, from benchmarks, or the cost model once it is fit."""
+    # the control files written before the metadata was saved are used as the template
+    if gomc_equilb_control_file_name_str not in job.doc.get("gomc_control_file_metadata", {}):
+        save_gomc_control_file_metadata(job, gomc_equilb_control_file_name_str, [])
+
+    available_gomc_cpu_or_gpu_list = get_available_gomc_cpu_or_gpu_list()
+    if len(available_gomc_cpu_or_gpu_list) == 0:
+        raise ValueError(f"No GOMC_CPU_GEMC or GOMC_GPU_GEMC binary is available in {gomc_binary_path}.")
+
+    no_molecules, max_rcutcoulomb_ang = get_gomc_launch_cost_model_variables(job)
+    gomc_launch_cost_model_dict = fit_gomc_launch_cost_model(job.project)
+    predicted_log_steps_per_s_dict = {
+        (gomc_cpu_or_gpu, int(ncpu)): predict_log_cost_model(
+            gomc_launch_cost_model_dict[gomc_cpu_or_gpu],
+            get_gomc_launch_cost_model_features(ncpu, no_molecules, max_rcutcoulomb_ang),
+        )
+        for gomc_cpu_or_gpu in available_gomc_cpu_or_gpu_list if gomc_cpu_or_gpu in gomc_launch_cost_model_dict
+        for ncpu in launch_autotune_ncpu_candidates if ncpu <= len(os.sched_getaffinity(0))
+    }
+    # the cost model is used, if it is fit for all the binaries, and predicts all their +p values
+    if all(gomc_cpu_or_gpu in gomc_launch_cost_model_dict for gomc_cpu_or_gpu in available_gomc_cpu_or_gpu_list) \
+            and None not in predicted_log_steps_per_s_dict.values():
+        gomc_launch_autotune_method = "cost_model"
+        benchmark_list = [
+            {
+                "gomc_cpu_or_gpu": gomc_cpu_or_gpu,
+                "ncpu": ncpu,
+                "steps_per_s": float(np.exp(predicted_log_steps_per_s)),
+            }
+            for (gomc_cpu_or_gpu, ncpu), predicted_log_steps_per_s in predicted_log_steps_per_s_dict.items()
+        ]
+    else:
+        gomc_launch_autotune_method = "benchmark"
+        benchmark_list = run_gomc_launch_benchmarks(job, available_gomc_cpu_or_gpu_list)
+
+    selected_benchmark_dict = select_gomc_launch(benchmark_list)
+    if selected_benchmark_dict is None:
+        raise ValueError(
+            f"All the GOMC launch benchmarks failed, see the {launch_autotune_directory_name} directory."
+        )
+
+    job.doc.gomc_ncpu = selected_benchmark_dict["ncpu"]
+    job.doc.gomc_ngpu = 1 if selected_benchmark_dict["gomc_cpu_or_gpu"] == "GPU" else 0
+    job.doc.gomc_cpu_or_gpu = selected_benchmark_dict["gomc_cpu_or_gpu"]
+    job.doc.gomc_equilb_design_ensemble_gomc_binary_file = f"GOMC_{job.doc.gomc_cpu_or_gpu}_GEMC"
+    job.doc.gomc_production_ensemble_gomc_binary_file = f"GOMC_{job.doc.gomc_cpu_or_gpu}_GEMC"
+    job.doc.gomc_launch_autotune = {
+        "method": gomc_launch_autotune_method,
+        "no_molecules": no_molecules,
+        "max_rcutcoulomb_ang": max_rcutcoulomb_ang,
+        "benchmarks": benchmark_list,
+        "selected": selected_benchmark_dict,
+    }
+    if gomc_launch_autotune_method == "benchmark":
+        fit_gomc_launch_cost_model(job.project)
+
+    print(
+        f"Completed: the GOMC launch autotune ({gomc_launch_autotune_method}) selected "
+        f"{job.doc.gomc_equilb_design_ensemble_gomc_binary_file} +p{job.doc.gomc_ncpu}"
+    )
+
+# ******************************************************
+# ******************************************************
+# GOMC launch autotuning (gomc_ncpu, and the CPU or GPU binary), from benchmarks and a cost model (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# Creating GOMC files (pdb, psf, force field (FF), and gomc control files (start)
+# ******************************************************
+# ******************************************************
+def bulk_build_used(*jobs):
+    """Check that the bulk build is used, instead of the per-job build operation."""
+    return use_bulk_build
+
+
+def bulk_build_not_used(*jobs):
+    """Check that the per-job build operation is used, instead of the bulk build."""
+    return not use_bulk_build
+
+
+@Project.pre(part_1a_initial_data_input_to_json)
+@Project.pre(part_1b_warm_start_donor_ready)
+@Project.pre(bulk_build_not_used)
+@Project.post(part_2a_gomc_equilb_design_ensemble_control_file_written)
+@Project.post(part_2b_gomc_production_control_file_written)
+@Project.post(mosdef_input_written)
+@Project.operation(directives=
+    {
+        "np": 1,
+        "ngpu": 0,
+        "memory": memory_needed,
+        "walltime": walltime_mosdef_hr,
+    }, with_job=True
+)
+def build_psf_pdb_ff_gomc_conf(job):
+    """Build the Charmm object and write the pdb, psd, and force field (FF) files for all the simulations in the workspace."""
+    write_psf_pdb_ff_gomc_conf_files(job)
+
+
+def write_psf_pdb_ff_gomc_conf_files(job):
+    """Build the Charmm object and write the pdb, psf, force field (FF), and control files in the current directory."""
+    # a failed (i.e., staged) build can leave the warm-start job document keys, without the restart files
+    if warm_start_from_neighbor_state_point and not warm_start_restart_files_written(job):
+        remove_warm_start_job_doc_keys(job)
+        warm_start_donor_job = get_warm_start_donor_job(job)
+        if warm_start_donor_job is not None:
+            write_warm_start_restart_files(job, warm_start_donor_job)
+
+    gomc_charmm_object_with_files = build_charmm(job, write_files=True)
+
+    # ******************************************************
+    # common variables (start)
+    # ******************************************************
+    gomc_common_control_variables_dict = get_gomc_common_control_variables(job)
+    production_temperature_K = gomc_common_control_variables_dict["production_temperature_K"]
+    seed_no = gomc_common_control_variables_dict["seed_no"]
+
+    # the output frequencies, which are shorter for the benchmark jobs' short runs
+    gomc_job_output_freq_dict = get_gomc_job_output_freq_dict(job)
+
+    # cutoff and tail correction
+    Rcut_ang = gomc_common_control_variables_dict["Rcut_ang"]
+    Rcut_low_ang = gomc_common_control_variables_dict["Rcut_low_ang"]
+    LRC = gomc_common_control_variables_dict["LRC"]
+    Ewald_tol = gomc_common_control_variables_dict["Ewald_tol"]
+    Exclude = gomc_common_control_variables_dict["Exclude"]
+    RcutCoulomb_box_0 = gomc_common_control_variables_dict["RcutCoulomb_box_0"]
+    RcutCoulomb_box_1 = gomc_common_control_variables_dict["RcutCoulomb_box_1"]
+
+    # MC move ratios
+    DisFreq = gomc_common_control_variables_dict["DisFreq"]
+    RotFreq = gomc_common_control_variables_dict["RotFreq"]
+    VolFreq = gomc_common_control_variables_dict["VolFreq"]
+    MultiParticleFreq = gomc_common_control_variables_dict["MultiParticleFreq"]
+    RegrowthFreq = gomc_common_control_variables_dict["RegrowthFreq"]
+    IntraSwapFreq = gomc_common_control_variables_dict["IntraSwapFreq"]
+    IntraMEMC_2Freq = gomc_common_control_variables_dict["IntraMEMC_2Freq"]
+    CrankShaftFreq = gomc_common_control_variables_dict["CrankShaftFreq"]
+    SwapFreq = gomc_common_control_variables_dict["SwapFreq"]
+    MEMC_2Freq = gomc_common_control_variables_dict["MEMC_2Freq"]
+
+    # CBMC trials
+    CBMC_First = gomc_common_control_variables_dict["CBMC_First"]
+    CBMC_Nth = gomc_common_control_variables_dict["CBMC_Nth"]
+
     # output all data and calc frequecy
     output_true_list_input = [
         True,
@@ -760,7 +2990,17 @@ def build_psf_pdb_ff_gomc_conf(job):
     starting_control_file_name_str = gomc_charmm_object_with_files
 
     # calc MC steps for gomc equilb
-    MC_steps = int(gomc_steps_equilibration)
+    MC_steps = get_gomc_run_steps(job, gomc_equilb_control_file_name_str)
+
+    # the warm-start equilb restarts from the rescaled final configuration of the donor job
+    warm_start_bool = "warm_start" in job.doc
+    warm_start_restart_files_dict = {}
+    for box_no in [0, 1]:
+        for file_variable_str, file_extension_str in [
+            ("Coordinates", "pdb"), ("Structure", "psf"), ("binCoordinates", "coor"), ("extendedSystem", "xsc")
+        ]:
+            warm_start_restart_files_dict[f"{file_variable_str}_box_{box_no}"] = \
+                f"{warm_start_restart_name_str}_BOX_{box_no}_restart.{file_extension_str}" if warm_start_bool else None
 
     gomc_control.write_gomc_control_file(
         starting_control_file_name_str,
@@ -771,18 +3011,18 @@ def build_psf_pdb_ff_gomc_conf(job):
         ff_psf_pdb_file_directory=None,
         check_input_files_exist=False,
         Parameters=None,
-        Restart=False,
+        Restart=warm_start_bool,
         Checkpoint=False,
         ExpertMode=False,
-        Coordinates_box_0=None,
-        Structure_box_0=None,
-        binCoordinates_box_0=None,
-        extendedSystem_box_0=None,
+        Coordinates_box_0=warm_start_restart_files_dict["Coordinates_box_0"],
+        Structure_box_0=warm_start_restart_files_dict["Structure_box_0"],
+        binCoordinates_box_0=warm_start_restart_files_dict["binCoordinates_box_0"],
+        extendedSystem_box_0=warm_start_restart_files_dict["extendedSystem_box_0"],
         binVelocities_box_0=None,
-        Coordinates_box_1=None,
-        Structure_box_1=None,
-        binCoordinates_box_1=None,
-        extendedSystem_box_1=None,
+        Coordinates_box_1=warm_start_restart_files_dict["Coordinates_box_1"],
+        Structure_box_1=warm_start_restart_files_dict["Structure_box_1"],
+        binCoordinates_box_1=warm_start_restart_files_dict["binCoordinates_box_1"],
+        extendedSystem_box_1=warm_start_restart_files_dict["extendedSystem_box_1"],
         binVelocities_box_1=None,
         input_variables_dict={
             "PRNG": seed_no,
@@ -793,7 +3033,7 @@ def build_psf_pdb_ff_gomc_conf(job):
             "RcutLow": Rcut_low_ang,
             "RcutCoulomb_box_0":RcutCoulomb_box_0,
             "RcutCoulomb_box_1":RcutCoulomb_box_1,
-            "Ewald": True,
+            "Ewald": get_electrostatics_scheme(job) == "EWALD",
             "ElectroStatic": True,
             "Tolerance": Ewald_tol,
             "VDWGeometricSigma": False,
@@ -812,19 +3052,22 @@ def build_psf_pdb_ff_gomc_conf(job):
             "EqSteps": EqSteps,
             "AdjSteps":AdjSteps,
             "PressureCalc": [True, pressure_calc_freq],
-            "RestartFreq": [True, coordinate_output_freq],
-            "CheckpointFreq": [True, coordinate_output_freq],
-            "DCDFreq": [True, coordinate_output_freq],
-            "ConsoleFreq": [True, console_output_freq],
-            "BlockAverageFreq":[True, block_ave_output_freq],
+            "RestartFreq": [True, gomc_job_output_freq_dict["coordinate_output_freq"]],
+            "CheckpointFreq": [True, gomc_job_output_freq_dict["coordinate_output_freq"]],
+            "DCDFreq": [True, gomc_job_output_freq_dict["coordinate_output_freq"]],
+            "ConsoleFreq": [True, gomc_job_output_freq_dict["console_output_freq"]],
+            "BlockAverageFreq":[True, gomc_job_output_freq_dict["block_ave_output_freq"]],
             "HistogramFreq": output_false_list_input,
             "CoordinatesFreq": output_false_list_input,
-            "CBMC_First": 12,
-            "CBMC_Nth": 10,
+            "CBMC_First": CBMC_First,
+            "CBMC_Nth": CBMC_Nth,
             "CBMC_Ang": 50,
             "CBMC_Dih": 50,
         },
     )
+    add_electrostatics_scheme_control_keywords(job, gomc_equilb_control_file_name_str)
+    save_gomc_control_file_metadata(job, gomc_equilb_control_file_name_str, gomc_charmm_object_with_files.residues)
+
     print("#**********************")
     print("Completed: equilb GEMC-NVT GOMC control file written")
     print("#**********************")
@@ -847,7 +3090,7 @@ def build_psf_pdb_ff_gomc_conf(job):
     restart_control_file_name_str = gomc_equilb_output_name_str
 
     # calc MC steps
-    MC_steps = int(gomc_steps_production)
+    MC_steps = get_gomc_run_steps(job, gomc_production_control_file_name_str)
 
 
     Coordinates_box_0 = "{}_BOX_0_restart.pdb".format(
@@ -906,7 +3149,7 @@ def build_psf_pdb_ff_gomc_conf(job):
             "RcutLow": Rcut_low_ang,
             "RcutCoulomb_box_0":RcutCoulomb_box_0,
             "RcutCoulomb_box_1":RcutCoulomb_box_1,
-            "Ewald": True,
+            "Ewald": get_electrostatics_scheme(job) == "EWALD",
             "ElectroStatic": True,
             "Tolerance": Ewald_tol,
             "VDWGeometricSigma": False,
@@ -925,76 +3168,1105 @@ def build_psf_pdb_ff_gomc_conf(job):
             "EqSteps": EqSteps,
             "AdjSteps":AdjSteps,
             "PressureCalc": [True, pressure_calc_freq],
-            "RestartFreq": [True, coordinate_output_freq],
-            "CheckpointFreq": [True, coordinate_output_freq],
-            "DCDFreq": [True, coordinate_output_freq],
-            "ConsoleFreq": [True, console_output_freq],
-            "BlockAverageFreq":[True, block_ave_output_freq],
+            "RestartFreq": [True, gomc_job_output_freq_dict["coordinate_output_freq"]],
+            "CheckpointFreq": [True, gomc_job_output_freq_dict["coordinate_output_freq"]],
+            "DCDFreq": [True, gomc_job_output_freq_dict["coordinate_output_freq"]],
+            "ConsoleFreq": [True, gomc_job_output_freq_dict["console_output_freq"]],
+            "BlockAverageFreq":[True, gomc_job_output_freq_dict["block_ave_output_freq"]],
             "HistogramFreq": output_false_list_input,
             "CoordinatesFreq": output_false_list_input,            
-            "CBMC_First": 12,
-            "CBMC_Nth": 10,
+            "CBMC_First": CBMC_First,
+            "CBMC_Nth": CBMC_Nth,
             "CBMC_Ang": 50,
             "CBMC_Dih": 50,
         },
     )
 
-    print("#**********************")
-    print("Completed: production NPT or GEMC-NVT GOMC control file writing")
-    print("#**********************")
-    # ******************************************************
-    # production NPT or GEMC-NVT - GOMC control file writing  (end)
-    # ******************************************************
+    add_electrostatics_scheme_control_keywords(job, gomc_production_control_file_name_str)
+    save_gomc_control_file_metadata(
+        job, gomc_production_control_file_name_str, gomc_charmm_object_with_files.residues
+    )
+
+    print("#**********************")
+    print("Completed: production NPT or GEMC-NVT GOMC control file writing")
+    print("#**********************")
+    # ******************************************************
+    # production NPT or GEMC-NVT - GOMC control file writing  (end)
+    # ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# Creating GOMC files (pdb, psf, force field (FF), and gomc control files (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# Creating GOMC files in bulk, for all the ready jobs in one process pool (start)
+# ******************************************************
+# ******************************************************
+def get_build_staging_directory(job):
+    """Get the job's build staging directory, at the same depth as the job directory, so the '../../' paths work."""
+    return os.path.join(project_directory_path, "build_staging", job.id)
+
+
+def timed_write_psf_pdb_ff_gomc_conf_files(job_id):
+    """Write the job's files in its staging directory, then move them to the job directory.
+
+    The control files are moved last, so the job is never seen with only part of its files.
+    Returns the run time and any error.
+    """
+    # the job is opened by its id, as the FlowProject jobs can not be pickled for the process pool
+    job = signac.get_project(project_directory_path).open_job(id=job_id)
+    start_time_s = time.perf_counter()
+    build_staging_directory = get_build_staging_directory(job)
+    shutil.rmtree(build_staging_directory, ignore_errors=True)
+    os.makedirs(build_staging_directory)
+    starting_directory = os.getcwd()
+    try:
+        os.chdir(build_staging_directory)
+        write_psf_pdb_ff_gomc_conf_files(job)
+        os.chdir(starting_directory)
+
+        staged_file_list = sorted(os.listdir(build_staging_directory), key=lambda file: file.endswith(".conf"))
+        for staged_file in staged_file_list:
+            os.replace(os.path.join(build_staging_directory, staged_file), job.fn(staged_file))
+        error_str = None
+    except Exception as error:
+        error_str = f"{type(error).__name__}: {error}"
+    finally:
+        os.chdir(starting_directory)
+        shutil.rmtree(build_staging_directory, ignore_errors=True)
+
+    return job_id, time.perf_counter() - start_time_s, error_str
+
+
+def build_ready(job):
+    """Check if the job is ready to build, and is not built."""
+    return part_1a_initial_data_input_to_json(job) \
+        and part_1b_warm_start_donor_ready(job) \
+        and not (
+            mosdef_input_written(job)
+            and part_2a_gomc_equilb_design_ensemble_control_file_written(job)
+            and part_2b_gomc_production_control_file_written(job)
+        )
+
+
+def bulk_build_jobs_eligible(*jobs):
+    """Check if any job is ready to build."""
+    return any(build_ready(job) for job in jobs)
+
+
+def bulk_build_jobs_completed(*jobs):
+    """Check if no job is ready to build."""
+    return not bulk_build_jobs_eligible(*jobs)
+
+
+@Project.pre(bulk_build_used)
+@Project.pre(bulk_build_jobs_eligible)
+@Project.post(bulk_build_jobs_completed)
+@Project.operation(directives=
+    {
+        "np": bulk_build_no_processes,
+        "ngpu": 0,
+        "memory": memory_needed,
+        "walltime": walltime_mosdef_hr,
+    }, aggregator=aggregator(all_jobs_if_any)
+)
+def bulk_build_psf_pdb_ff_gomc_conf(*jobs):
+    """Build the pdb, psf, force field (FF), and control files for all the ready jobs, in one process pool."""
+    ready_job_list = [job for job in jobs if build_ready(job)]
+
+    print(f"Building {len(ready_job_list)} jobs, with {bulk_build_no_processes} processes")
+    start_time_s = time.perf_counter()
+    failed_job_error_dict = {}
+    with ProcessPoolExecutor(max_workers=bulk_build_no_processes) as executor:
+        future_to_job_dict = {
+            executor.submit(timed_write_psf_pdb_ff_gomc_conf_files, job.id): job for job in ready_job_list
+        }
+        for future in as_completed(future_to_job_dict):
+            job = future_to_job_dict[future]
+            job_id, job_time_s, error_str = future.result()
+            if error_str is None:
+                print(f"job id {job.id} (T = {job.sp.production_temperature_K} K, "
+                      f"replica = {job.sp.replica_number_int}): {job_time_s:.3f} s")
+            else:
+                failed_job_error_dict[job.id] = error_str
+                print(f"job id {job.id} FAILED after {job_time_s:.3f} s: {error_str}")
+
+    print(f"Completed: the build of {len(ready_job_list) - len(failed_job_error_dict)} of {len(ready_job_list)} "
+          f"jobs in {time.perf_counter() - start_time_s:.3f} s")
+
+    if len(failed_job_error_dict) > 0:
+        raise RuntimeError(f"The build failed for these job ids: {failed_job_error_dict}")
+
+# ******************************************************
+# ******************************************************
+# Creating GOMC files in bulk, for all the ready jobs in one process pool (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# checkpoint-segmented GOMC runs, and stitching the segment output files (start)
+# ******************************************************
+# ******************************************************
+gomc_segment_restart_keyword_to_extension_list = [
+    ("Coordinates", "pdb"), ("Structure", "psf"), ("binCoordinates", "coor"), ("extendedSystem", "xsc")
+]
+
+
+def get_gomc_run_max_no_segments(job, control_file_name_str):
+    """Get the maximum number of segments of the GOMC run, including the production run's convergence extensions."""
+    # the benchmark jobs always run their fixed steps
+    if control_file_name_str == gomc_production_control_file_name_str \
+            and production_convergence_relative_tolerance_dict is not None \
+            and "benchmark_gomc_steps" not in job.sp:
+        return gomc_run_no_segments + production_convergence_max_no_extensions
+
+    return gomc_run_no_segments
+
+
+def gomc_segmented_run_started(job, control_file_name_str):
+    """Check if the first segment of the segmented GOMC run is started."""
+    return os.path.isfile(job.fn(f"out_{control_file_name_str}_seg0.dat"))
+
+
+def get_gomc_run_next_segment_no(job, control_file_name_str):
+    """Get the number of the first segment of the GOMC run, which is not completed."""
+    max_no_segments = get_gomc_run_max_no_segments(job, control_file_name_str)
+    for segment_no in range(max_no_segments):
+        if not gomc_console_file_completed(job.fn(f"out_{control_file_name_str}_seg{segment_no}.dat")):
+            return segment_no
+
+    return max_no_segments
+
+
+def get_gomc_segment_steps(job, run_steps, segment_no):
+    """Get the steps of the segment, as a multiple of the Blk file output frequency, with the remainder in the last segment.
+
+    The segments add up to the run steps, and the convergence extension segments have the same steps as the first segment.
+    """
+    job_block_ave_output_freq = get_gomc_job_output_freq_dict(job)["block_ave_output_freq"]
+    segment_steps = max(int(run_steps) // gomc_run_no_segments // job_block_ave_output_freq, 1) \
+        * job_block_ave_output_freq
+    if segment_no != gomc_run_no_segments - 1:
+        return segment_steps
+
+    last_segment_steps = int(run_steps) - segment_steps * (gomc_run_no_segments - 1)
+    if last_segment_steps <= 0:
+        raise ValueError(
+            f"The {run_steps} run steps can not be split into {gomc_run_no_segments} segments "
+            f"of at least the Blk file output frequency ({job_block_ave_output_freq} steps)."
+        )
+
+    return last_segment_steps
+
+
+def write_gomc_segment_control_file(job, control_file_name_str, output_name_str, segment_no):
+    """Write the segment's control file, from the run's control file.
+
+    The first segment starts like the run, and the others restart from the last segment's restart and
+    checkpoint files.  The restart and checkpoint files are only written at the end of each segment.
+    """
+    with open(job.fn(f"{control_file_name_str}.conf"), "r") as fp:
+        conf_line_list = fp.read().splitlines()
+
+    run_steps = [line.split()[1] for line in conf_line_list if line.split()[:1] == ["RunSteps"]][0]
+    segment_steps = get_gomc_segment_steps(job, run_steps, segment_no)
+    segment_keyword_values_dict = {
+        "RunSteps": f"{segment_steps}",
+        "OutputName": f"{output_name_str}_seg{segment_no}",
+        "RestartFreq": f"True {segment_steps}",
+        "CheckpointFreq": f"True {segment_steps}",
+    }
+    restart_keyword_list = ["Restart", "Checkpoint"] + [
+        file_keyword_str for file_keyword_str, file_extension_str in gomc_segment_restart_keyword_to_extension_list
+    ]
+
+    segment_conf_line_list = []
+    for line in conf_line_list:
+        line_split = line.split()
+        line_keyword = get_gomc_control_file_line_keyword(line, segment_keyword_values_dict)
+        if line_keyword is not None:
+            segment_conf_line_list.append(f"{line_keyword: <25} {segment_keyword_values_dict[line_keyword]}")
+        elif segment_no > 0 and len(line_split) > 0 and line_split[0] in restart_keyword_list:
+            continue
+        else:
+            segment_conf_line_list.append(line)
+
+    if segment_no > 0:
+        last_segment_output_name_str = f"{output_name_str}_seg{segment_no - 1}"
+        segment_conf_line_list += [
+            "",
+            f"# restart from segment {segment_no - 1}",
+            f"{'Restart': <25} True",
+            f"{'Checkpoint': <25} True {last_segment_output_name_str}_restart.chk",
+        ]
+        for box_no in [0, 1]:
+            for file_keyword_str, file_extension_str in gomc_segment_restart_keyword_to_extension_list:
+                segment_conf_line_list.append(
+                    f"{file_keyword_str: <25} {box_no} "
+                    f"{last_segment_output_name_str}_BOX_{box_no}_restart.{file_extension_str}"
+                )
+
+    with open(job.fn(f"{control_file_name_str}_seg{segment_no}.conf"), "w") as fp:
+        fp.write("\n".join(segment_conf_line_list) + "\n")
+
+
+def wait4_gomc_process(gomc_process, timeout_s=None):
+    """Wait for the GOMC process with os.wait4, and get its peak memory (GB), or None if it is still running after timeout_s."""
+    wait_until_s = None if timeout_s is None else time.perf_counter() + timeout_s
+    while True:
+        finished_pid, wait_status, run_resource_usage = os.wait4(
+            gomc_process.pid, 0 if timeout_s is None else os.WNOHANG
+        )
+        if finished_pid != 0:
+            break
+        if time.perf_counter() >= wait_until_s:
+            return None
+        time.sleep(1)
+
+    gomc_process.returncode = os.waitstatus_to_exitcode(wait_status)
+
+    # the peak memory of the shell and the gomc it waited for, only from this run, and at least the memory of
+    # this python process, which the shell is forked from (Linux ru_maxrss is in KiB)
+    return run_resource_usage.ru_maxrss / 1024 ** 2
+
+
+def run_gomc_command(run_command, cwd=None):
+    """Run the GOMC command (like subprocess.run with check=True), and get its peak memory (GB)."""
+    gomc_process = subprocess.Popen(run_command, shell=True, cwd=cwd)
+    try:
+        max_rss_gb = wait4_gomc_process(gomc_process)
+    except BaseException:
+        gomc_process.kill()
+        gomc_process.wait()
+        raise
+
+    if gomc_process.returncode != 0:
+        raise subprocess.CalledProcessError(gomc_process.returncode, run_command)
+
+    return max_rss_gb
+
+
+def run_gomc_run_segment(job, control_file_name_str, output_name_str, gomc_binary_file):
+    """Run the next segment of the GOMC run, and stitch the completed segments' Blk files.
+
+    Returns the number of the segment run, or of the last segment if all the segments are completed.
+    """
+    max_no_segments = get_gomc_run_max_no_segments(job, control_file_name_str)
+    segment_no = get_gomc_run_next_segment_no(job, control_file_name_str)
+    if segment_no == max_no_segments:
+        # the run was not finished after its last segment, so it is only finished again
+        stitch_gomc_segment_blk_files(job, output_name_str, max_no_segments)
+        return max_no_segments - 1
+
+    segment_control_file_name_str = f"{control_file_name_str}_seg{segment_no}"
+    write_gomc_segment_control_file(job, control_file_name_str, output_name_str, segment_no)
+
+    print(f"Running segment {segment_no} (of {gomc_run_no_segments}, up to {max_no_segments}) of job id {job}")
+    run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
+        str(gomc_binary_path),
+        str(gomc_binary_file),
+        str(job.doc.gomc_ncpu),
+        str(segment_control_file_name_str),
+        str(segment_control_file_name_str),
+    )
+
+    print('gomc segment run_command = ' + str(run_command))
+
+    start_time_s = time.perf_counter()
+    max_rss_gb = run_gomc_command(run_command, cwd=job.path)
+    job.doc.setdefault("gomc_run_segment_wall_time_s", {}).setdefault(control_file_name_str, {})[
+        str(segment_no)
+    ] = time.perf_counter() - start_time_s
+    job.doc.setdefault("gomc_run_segment_max_rss_gb", {}).setdefault(control_file_name_str, {})[
+        str(segment_no)
+    ] = max_rss_gb
+
+    stitch_gomc_segment_blk_files(job, output_name_str, segment_no + 1)
+
+    return segment_no
+
+
+def get_gomc_run_segments_wall_time_s(job, control_file_name_str, no_segments_completed):
+    """Get the total wall time of the completed segments of the GOMC run."""
+    segment_wall_time_s_dict = job.doc.get("gomc_run_segment_wall_time_s", {}).get(control_file_name_str, {})
+    return sum(segment_wall_time_s_dict.get(str(segment_no), 0) for segment_no in range(no_segments_completed))
+
+
+def get_gomc_run_segments_max_rss_gb(job, control_file_name_str, no_segments_completed):
+    """Get the peak memory of the completed segments of the GOMC run."""
+    segment_max_rss_gb_dict = job.doc.get("gomc_run_segment_max_rss_gb", {}).get(control_file_name_str, {})
+    return max(segment_max_rss_gb_dict.get(str(segment_no), 0) for segment_no in range(no_segments_completed))
+
+
+def stitch_gomc_segment_blk_files(job, output_name_str, no_segments_completed):
+    """Stitch the completed segments' Blk files into the run's Blk files, with one header.
+
+    Each segment must continue the steps of the last segment, or the segments were not restarted from each other.
+    """
+    for box_no in [0, 1]:
+        header_line = None
+        blk_data_line_list = []
+        last_step = -1
+        for segment_no in range(no_segments_completed):
+            segment_blk_file = job.fn(f"Blk_{output_name_str}_seg{segment_no}_BOX_{box_no}.dat")
+            if not os.path.isfile(segment_blk_file):
+                continue
+
+            with open(segment_blk_file, "r") as fp:
+                segment_header_line = fp.readline()
+                segment_blk_data_line_list = [line for line in fp.read().splitlines() if len(line.split()) > 0]
+
+            header_line = header_line or segment_header_line
+            if len(segment_blk_data_line_list) > 0 and int(float(segment_blk_data_line_list[0].split()[0])) <= last_step:
+                raise ValueError(
+                    f"The segment {segment_no} Blk file {segment_blk_file} starts at step "
+                    f"{segment_blk_data_line_list[0].split()[0]}, which is not after the last step {last_step} "
+                    f"of the segments before it."
+                )
+
+            blk_data_line_list += segment_blk_data_line_list
+            if len(segment_blk_data_line_list) > 0:
+                last_step = int(float(segment_blk_data_line_list[-1].split()[0]))
+
+        if header_line is None:
+            continue
+
+        blk_file = job.fn(f"Blk_{output_name_str}_BOX_{box_no}.dat")
+        with open(f"{blk_file}.tmp", "w") as fp:
+            fp.write(header_line)
+            fp.write("".join(f"{line}\n" for line in blk_data_line_list))
+        os.replace(f"{blk_file}.tmp", blk_file)
+
+
+def finish_gomc_segmented_run(job, control_file_name_str, output_name_str, no_segments_completed, completed_note_str=None):
+    """Copy the last segment's restart files to the run's restart files, and stitch the segment console files.
+
+    The stitched console file is written last, as it marks the run as started and completed.
+    """
+    last_segment_output_name_str = f"{output_name_str}_seg{no_segments_completed - 1}"
+    for box_no in [0, 1]:
+        for file_keyword_str, file_extension_str in gomc_segment_restart_keyword_to_extension_list:
+            shutil.copy2(
+                job.fn(f"{last_segment_output_name_str}_BOX_{box_no}_restart.{file_extension_str}"),
+                job.fn(f"{output_name_str}_BOX_{box_no}_restart.{file_extension_str}"),
+            )
+    if os.path.isfile(job.fn(f"{last_segment_output_name_str}_restart.chk")):
+        shutil.copy2(
+            job.fn(f"{last_segment_output_name_str}_restart.chk"), job.fn(f"{output_name_str}_restart.chk")
+        )
+
+    console_file = job.fn(f"out_{control_file_name_str}.dat")
+    with open(f"{console_file}.tmp", "w") as fp:
+        for segment_no in range(no_segments_completed):
+            fp.write(f"\n# segment {segment_no} of {no_segments_completed}: out_{control_file_name_str}_seg{segment_no}.dat\n")
+            with open(job.fn(f"out_{control_file_name_str}_seg{segment_no}.dat"), "r") as segment_fp:
+                fp.write(segment_fp.read())
+        if completed_note_str is not None:
+            fp.write(f"\n# {completed_note_str}\n")
+    os.replace(f"{console_file}.tmp", console_file)
+
+# ******************************************************
+# ******************************************************
+# checkpoint-segmented GOMC runs, and stitching the segment output files (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# GOMC run walltime and memory directives, from a runtime cost model of the logged runs (start)
+# ******************************************************
+# ******************************************************
+control_file_name_to_gomc_binary_file_doc_key_dict = {
+    gomc_equilb_control_file_name_str: "gomc_equilb_design_ensemble_gomc_binary_file",
+    gomc_production_control_file_name_str: "gomc_production_ensemble_gomc_binary_file",
+}
+
+# the cost model, fit once per python process (i.e., once per status or submit)
+gomc_runtime_cost_model_cache_dict = {}
+
+
+def get_gomc_run_timing(job, control_file_name_str, output_name_str, run_time_s, max_rss_gb):
+    """Get the GOMC run's wall time, steps (the last Blk file step), steps per second, peak memory, and cost model variables.
+
+    The cost model variables are only added if the job has them (i.e., not for the jobs built before the control file metadata).
+    """
+    blk_data = load_blk_file(job.fn(f"Blk_{output_name_str}_BOX_0.dat"))
+    run_steps = int(blk_data[blk_data.dtype.names[0]][-1]) if len(blk_data) > 0 else 0
+    gomc_binary_file = job.doc[control_file_name_to_gomc_binary_file_doc_key_dict[control_file_name_str]]
+
+    run_timing_dict = {
+        "wall_time_s": run_time_s,
+        "steps": run_steps,
+        "steps_per_s": run_steps / run_time_s,
+        "ncpu": int(job.doc.gomc_ncpu),
+        "gomc_cpu_or_gpu": "GPU" if "GPU" in gomc_binary_file else "CPU",
+        "max_rss_gb": max_rss_gb,
+    }
+    if gomc_equilb_control_file_name_str in job.doc.get("gomc_control_file_metadata", {}):
+        run_timing_dict["no_molecules"], run_timing_dict["max_rcutcoulomb_ang"] = \
+            get_gomc_launch_cost_model_variables(job)
+    else:
+        print(f"The job id {job} has no control file metadata, so its run timing is not used by the cost model")
+
+    return run_timing_dict
+
+
+def save_equilb_run_timing(job, equilb_run_time_s, equilb_max_rss_gb):
+    """Save the equilb run wall time, steps (the last Blk file step), steps per second and peak memory in the job document."""
+    job.doc.equilb_run_timing = get_gomc_run_timing(
+        job, gomc_equilb_control_file_name_str, gomc_equilb_output_name_str, equilb_run_time_s, equilb_max_rss_gb
+    )
+
+
+def get_gomc_runtime_cost_model_features(ncpu, gomc_cpu_or_gpu, no_molecules, max_rcutcoulomb_ang):
+    """Get the runtime cost model features (1, log cores, log molecules, log largest RcutCoulomb, and 1 for the GPU binary)."""
+    return [
+        1.0, np.log(ncpu), np.log(no_molecules), np.log(max_rcutcoulomb_ang), float(gomc_cpu_or_gpu == "GPU")
+    ]
+
+
+def fit_gomc_runtime_cost_model(project):
+    """Fit the log steps/s and the peak memory models to the logged GOMC runs, and save them in the project document."""
+    run_features_list = []
+    run_log_steps_per_s_list = []
+    run_no_molecules_list = []
+    run_memory_features_list = []
+    run_max_rss_gb_list = []
+    for job in project:
+        for run_timing_doc_key_str in ["equilb_run_timing", "production_run_timing"]:
+            run_timing_dict = job.doc.get(run_timing_doc_key_str, {})
+            if "no_molecules" not in run_timing_dict or run_timing_dict["steps_per_s"] <= 0:
+                continue
+
+            run_features_list.append(get_gomc_runtime_cost_model_features(
+                run_timing_dict["ncpu"], run_timing_dict["gomc_cpu_or_gpu"],
+                run_timing_dict["no_molecules"], run_timing_dict["max_rcutcoulomb_ang"]
+            ))
+            run_log_steps_per_s_list.append(np.log(run_timing_dict["steps_per_s"]))
+            run_no_molecules_list.append(int(run_timing_dict["no_molecules"]))
+            run_memory_features_list.append([1.0, run_timing_dict["no_molecules"]])
+            run_max_rss_gb_list.append(run_timing_dict["max_rss_gb"])
+
+    # the model is not used, if there are too few runs or molecule counts, if the runs do not determine
+    # its coefficients, or if there are too few runs per fit feature
+    gomc_runtime_cost_model_dict = {"no_runs": len(run_features_list)}
+    cost_model_dict = None
+    if len(run_features_list) >= runtime_cost_model_min_no_runs \
+            and len(set(run_no_molecules_list)) >= runtime_cost_model_min_no_molecule_counts:
+        cost_model_dict = fit_log_linear_cost_model(run_features_list, run_log_steps_per_s_list)
+    if cost_model_dict is not None \
+            and len(run_features_list) >= runtime_cost_model_min_no_runs_per_feature * cost_model_dict["no_fit_features"]:
+        residual_array = np.array(run_log_steps_per_s_list) \
+            - np.array(run_features_list) @ np.array(cost_model_dict["coefficients"])
+        memory_model_coefficients, _, _, _ = np.linalg.lstsq(
+            np.array(run_memory_features_list), np.array(run_max_rss_gb_list), rcond=None
+        )
+        gomc_runtime_cost_model_dict.update(cost_model_dict)
+        gomc_runtime_cost_model_dict.update({
+            # the residual standard deviation, corrected for the fit degrees of freedom
+            "residual_std": float(np.sqrt(
+                np.sum(residual_array ** 2) / (len(run_features_list) - cost_model_dict["no_fit_features"])
+            )),
+            "memory_coefficients": [float(coefficient) for coefficient in memory_model_coefficients],
+        })
+
+    project.doc.gomc_runtime_cost_model = gomc_runtime_cost_model_dict
+
+    return gomc_runtime_cost_model_dict
+
+
+def get_gomc_runtime_cost_model(job):
+    """Get the runtime cost model, if it is used, and fit to enough logged GOMC runs."""
+    if not use_runtime_cost_model:
+        return {}
+    if "model" not in gomc_runtime_cost_model_cache_dict:
+        gomc_runtime_cost_model_cache_dict["model"] = fit_gomc_runtime_cost_model(job.project)
+
+    return gomc_runtime_cost_model_cache_dict["model"]
+
+
+def get_gomc_run_walltime_hr(job, control_file_name_str, fixed_walltime_hr):
+    """Get the GOMC run's (or run segment's) walltime, from the runtime cost model, or the fixed walltime."""
+    if gomc_run_no_segments > 1:
+        fixed_walltime_hr = walltime_gomc_segment_hr
+
+    gomc_runtime_cost_model_dict = get_gomc_runtime_cost_model(job)
+    if "coefficients" not in gomc_runtime_cost_model_dict \
+            or control_file_name_str not in job.doc.get("gomc_control_file_metadata", {}):
+        return fixed_walltime_hr
+
+    run_steps = get_gomc_run_steps(job, control_file_name_str)
+    if gomc_run_no_segments > 1:
+        run_steps = max(
+            get_gomc_segment_steps(job, run_steps, segment_no) for segment_no in [0, gomc_run_no_segments - 1]
+        )
+
+    no_molecules, max_rcutcoulomb_ang = get_gomc_launch_cost_model_variables(job)
+    gomc_binary_file = job.doc[control_file_name_to_gomc_binary_file_doc_key_dict[control_file_name_str]]
+    predicted_log_steps_per_s = predict_log_cost_model(
+        gomc_runtime_cost_model_dict,
+        get_gomc_runtime_cost_model_features(
+            job.doc.gomc_ncpu, "GPU" if "GPU" in gomc_binary_file else "CPU", no_molecules, max_rcutcoulomb_ang
+        ),
+    )
+    # the job's cores, binary or RcutCoulomb are not in the logged runs
+    if predicted_log_steps_per_s is None:
+        return fixed_walltime_hr
+
+    predicted_log_steps_per_s -= runtime_cost_model_no_residual_std * gomc_runtime_cost_model_dict["residual_std"]
+    walltime_hr = runtime_cost_model_walltime_safety_factor * run_steps / np.exp(predicted_log_steps_per_s) / 3600
+
+    return float(min(max(walltime_hr, runtime_cost_model_min_walltime_hr), fixed_walltime_hr))
+
+
+def get_gomc_run_memory_gb(job):
+    """Get the GOMC run's memory, from the runtime cost model's peak memory, or the fixed memory_needed."""
+    gomc_runtime_cost_model_dict = get_gomc_runtime_cost_model(job)
+    if "memory_coefficients" not in gomc_runtime_cost_model_dict \
+            or gomc_equilb_control_file_name_str not in job.doc.get("gomc_control_file_metadata", {}):
+        return memory_needed
+
+    no_molecules, max_rcutcoulomb_ang = get_gomc_launch_cost_model_variables(job)
+    predicted_max_rss_gb = max(
+        float(np.dot([1.0, no_molecules], gomc_runtime_cost_model_dict["memory_coefficients"])), 0
+    )
+
+    return max(int(np.ceil(runtime_cost_model_memory_safety_factor * predicted_max_rss_gb)), 1)
+
+# ******************************************************
+# ******************************************************
+# GOMC run walltime and memory directives, from a runtime cost model of the logged runs (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# equilb NPT or GEMC-NVT - starting the GOMC simulation (start)
+# ******************************************************
+# ******************************************************
+
+def get_equilb_parent_job(job):
+    """Get the parent job (the lowest replica_number_int) of the job's statepoint_without_replica group."""
+    return min(
+        get_statepoint_group_jobs(job, statepoint_without_replica),
+        key=lambda group_job: group_job.sp.replica_number_int
+    )
+
+
+def part_4a_equilb_run_by_this_job(job):
+    """Check if the job runs its own equilb, instead of branching from its parent job."""
+    return not equilibrate_once_per_replica_group or get_equilb_parent_job(job).id == job.id
+
+
+def part_4a_equilb_parent_job_completed_properly(job):
+    """Check if the job branches from its parent job, and the parent job's equilb is completed properly."""
+    if part_4a_equilb_run_by_this_job(job):
+        return False
+
+    return part_4a_job_gomc_equilb_design_ensemble_completed_properly(get_equilb_parent_job(job))
+
+
+def node_bundle_not_used(*jobs):
+    """Check that the per-job GOMC run operations are used, instead of the node bundle."""
+    return not use_node_bundle
+
+
+def equilb_gomc_run_preconditions_met(job):
+    """Check the equilb GOMC run's preconditions (for its operation, and the node bundle)."""
+    return mosdef_input_written(job) \
+        and part_2a_gomc_equilb_design_ensemble_control_file_written(job) \
+        and part_4a_equilb_run_by_this_job(job) \
+        and part_2c_gomc_control_files_up_to_date(job) \
+        and part_2d_electrostatics_autotune_completed(job) \
+        and part_2e_gomc_launch_autotune_completed(job)
+
+
+@Project.pre(equilb_gomc_run_preconditions_met)
+@Project.pre(node_bundle_not_used)
+@Project.post(part_3a_output_gomc_equilb_design_ensemble_started)
+@Project.post(part_4a_job_gomc_equilb_design_ensemble_completed_properly)
+@Project.operation(directives=
+    {
+        "np": lambda job: job.doc.gomc_ncpu,
+        "ngpu": lambda job: job.doc.gomc_ngpu,
+        "memory": lambda job: get_gomc_run_memory_gb(job),
+        "walltime": lambda job: get_gomc_run_walltime_hr(
+            job, gomc_equilb_control_file_name_str, walltime_gomc_equilbrium_hr
+        ),
+    }, with_job=True
+)
+#@flow.with_job
+def run_equilb_ensemble_gomc_command(job):
+    """Run the gomc equilb_ensemble simulation, or its next segment if the runs are segmented."""
+    control_file_name_str = gomc_equilb_control_file_name_str
+
+    if gomc_run_no_segments > 1:
+        segment_no = run_gomc_run_segment(
+            job,
+            control_file_name_str,
+            gomc_equilb_output_name_str,
+            job.doc.gomc_equilb_design_ensemble_gomc_binary_file,
+        )
+        if segment_no + 1 == gomc_run_no_segments:
+            finish_gomc_segmented_run(job, control_file_name_str, gomc_equilb_output_name_str, segment_no + 1)
+            save_equilb_run_timing(
+                job,
+                get_gomc_run_segments_wall_time_s(job, control_file_name_str, gomc_run_no_segments),
+                get_gomc_run_segments_max_rss_gb(job, control_file_name_str, gomc_run_no_segments),
+            )
+        return
+
+    print(f"Running simulation job id {job}")
+    run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
+        str(gomc_binary_path),
+        str(job.doc.gomc_equilb_design_ensemble_gomc_binary_file),
+        str(job.doc.gomc_ncpu),
+        str(control_file_name_str),
+        str(control_file_name_str),
+    )
+
+    print('gomc equilb run_command = ' + str(run_command))
+
+    start_time_s = time.perf_counter()
+    max_rss_gb = run_gomc_command(run_command)
+    save_equilb_run_timing(job, time.perf_counter() - start_time_s, max_rss_gb)
+
+
+@Project.pre(part_2b_gomc_production_control_file_written)
+@Project.pre(part_4a_equilb_parent_job_completed_properly)
+@Project.post(part_4a_job_gomc_equilb_design_ensemble_completed_properly)
+@Project.operation(directives=
+    {
+        "np": 1,
+        "ngpu": 0,
+        "memory": memory_needed,
+        "walltime": walltime_gomc_analysis_hr,
+    }, with_job=True
+)
+def branch_equilb_from_parent_job(job):
+    """Copy the parent job's equilb restart files and console file, so the replica only runs the production."""
+    parent_job = get_equilb_parent_job(job)
+
+    for box_no in [0, 1]:
+        for file_extension_str in ["pdb", "psf", "coor", "xsc"]:
+            shutil.copy2(
+                parent_job.fn(f"{gomc_equilb_output_name_str}_BOX_{box_no}_restart.{file_extension_str}"),
+                f"{gomc_equilb_output_name_str}_BOX_{box_no}_restart.{file_extension_str}",
+            )
+
+    # the console file is copied last, as it marks the equilb as completed
+    with open(parent_job.fn(f"out_{gomc_equilb_control_file_name_str}.dat"), "r") as fp:
+        parent_console_output = fp.read()
+    with open(f"out_{gomc_equilb_control_file_name_str}.dat", "w") as fp:
+        fp.write(parent_console_output)
+        fp.write(f"\nBranched: replica {job.sp.replica_number_int} starts from the equilb of parent job id {parent_job.id}.\n")
+
+    job.doc.equilb_parent_job_id = parent_job.id
+
+    print(f"Branched job id {job.id} from the equilb of parent job id {parent_job.id}")
+
+
+# ******************************************************
+# ******************************************************
+# equilb NPT or GEMC-NVT - starting the GOMC simulation (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# move mix and CBMC trial autotuning, from GOMC pilot runs of the equilb restart files (start)
+# ******************************************************
+# ******************************************************
+move_mix_freq_list = [
+    "DisFreq", "RotFreq", "VolFreq", "MultiParticleFreq", "RegrowthFreq",
+    "IntraSwapFreq", "IntraMEMC_2Freq", "CrankShaftFreq", "SwapFreq", "MEMC_2Freq",
+]
+
+# the GOMC console move names (lower case, without "-", "_" and spaces) containing these strings,
+# in order, are the moves of these frequencies
+gomc_move_name_str_to_freq_list = [
+    ("volume", "VolFreq"),
+    ("multiparticle", "MultiParticleFreq"),
+    ("intraswap", "IntraSwapFreq"),
+    ("intramemc", "IntraMEMC_2Freq"),
+    ("memc", "MEMC_2Freq"),
+    ("crankshaft", "CrankShaftFreq"),
+    ("regrowth", "RegrowthFreq"),
+    ("transfer", "SwapFreq"),
+    ("swap", "SwapFreq"),
+    ("displace", "DisFreq"),
+    ("rotat", "RotFreq"),
+]
+
+
+def get_gomc_move_freq_name(gomc_move_name_str):
+    """Get the move frequency name of the GOMC console move name, or None if it is not known."""
+    gomc_move_name_str = gomc_move_name_str.lower().replace("-", "").replace("_", "").replace(" ", "")
+    for move_name_str, move_freq_name_str in gomc_move_name_str_to_freq_list:
+        if move_name_str in gomc_move_name_str:
+            return move_freq_name_str
+
+    return None
+
+
+def get_gomc_console_move_statistics(console_file):
+    """Get each move's acceptance (fraction, averaged over the boxes) and CPU time (s), from the console file.
+
+    These are read from the "% Accepted" lines, and the move timing ("<move>: <time> sec.") lines,
+    which GOMC writes at the end of the run.
+    """
+    move_acceptance_dict = {}
+    move_time_s_dict = {}
+    with open(console_file, "r") as fp:
+        for line in fp:
+            accepted_match = re.match(r"^\s*%\s*Accepted\s+(\S+)\s+\S+\s+(.*)$", line)
+            time_match = re.match(r"^\s*([A-Za-z][A-Za-z_\- ]*):\s+([0-9.eE+\-]+)\s*sec", line)
+            if accepted_match is not None:
+                move_freq_name_str = get_gomc_move_freq_name(accepted_match.group(1))
+                box_acceptance_list = []
+                for value_str in accepted_match.group(2).split():
+                    try:
+                        box_acceptance_list.append(float(value_str) / 100)
+                    except ValueError:
+                        pass
+                box_acceptance_list = [acceptance for acceptance in box_acceptance_list if np.isfinite(acceptance)]
+                if move_freq_name_str is not None and len(box_acceptance_list) > 0:
+                    move_acceptance_dict[move_freq_name_str] = float(np.mean(box_acceptance_list))
+            elif time_match is not None:
+                move_freq_name_str = get_gomc_move_freq_name(time_match.group(1))
+                if move_freq_name_str is not None:
+                    move_time_s_dict[move_freq_name_str] = \
+                        move_time_s_dict.get(move_freq_name_str, 0.0) + float(time_match.group(2))
+
+    return move_acceptance_dict, move_time_s_dict
+
+
+def normalize_move_mix(move_mix_dict, tunable_move_weight_dict):
+    """Get the move mix, with the tunable moves set from their weights, so all the frequencies sum to 1.
+
+    The tunable moves get the frequency left over by the fixed moves, and at least move_mix_autotune_min_freq.
+    """
+    move_mix_dict = dict(move_mix_dict)
+    fixed_freq_sum = sum(
+        move_mix_dict[move_freq_name_str] for move_freq_name_str in move_mix_freq_list
+        if move_freq_name_str not in tunable_move_weight_dict
+    )
+    tunable_freq_sum = 1 - fixed_freq_sum - move_mix_autotune_min_freq * len(tunable_move_weight_dict)
+    tunable_weight_sum = sum(tunable_move_weight_dict.values())
+    for move_freq_name_str, tunable_move_weight in tunable_move_weight_dict.items():
+        move_mix_dict[move_freq_name_str] = round(
+            float(move_mix_autotune_min_freq + tunable_freq_sum * tunable_move_weight / tunable_weight_sum), 4
+        )
+
+    # the rounding error is put in the largest tunable move, so the frequencies sum to 1 exactly
+    largest_move_freq_name_str = max(tunable_move_weight_dict, key=lambda name_str: move_mix_dict[name_str])
+    move_mix_dict[largest_move_freq_name_str] = round(
+        move_mix_dict[largest_move_freq_name_str] + 1 - sum(move_mix_dict[name_str] for name_str in move_mix_freq_list), 4
+    )
+
+    return move_mix_dict
+
+
+def get_move_mix_candidate_list(baseline_pilot_result_dict):
+    """Get the candidate move mixes, from the baseline pilot's acceptance per CPU second of each tunable move."""
+    baseline_move_mix_dict = {
+        move_freq_name_str: baseline_pilot_result_dict[move_freq_name_str] for move_freq_name_str in move_mix_freq_list
+    }
+    tunable_move_freq_list = [
+        move_freq_name_str for move_freq_name_str in move_mix_autotune_tunable_freq_list
+        if baseline_move_mix_dict[move_freq_name_str] > 0
+    ]
+    if len(tunable_move_freq_list) == 0:
+        return []
+
+    # the acceptance per CPU second of an attempted move, of the moves with measured statistics
+    move_efficiency_dict = {}
+    for move_freq_name_str in tunable_move_freq_list:
+        move_acceptance = baseline_pilot_result_dict["move_acceptance"].get(move_freq_name_str)
+        move_time_s = baseline_pilot_result_dict["move_time_s"].get(move_freq_name_str)
+        if move_acceptance is not None and move_time_s is not None and move_time_s > 0 and move_acceptance > 0:
+            move_attempts = baseline_move_mix_dict[move_freq_name_str] * move_mix_autotune_pilot_gomc_steps
+            move_efficiency_dict[move_freq_name_str] = move_acceptance / (move_time_s / move_attempts)
+
+    move_mix_candidate_list = []
+    if len(move_efficiency_dict) > 0:
+        move_efficiency_geometric_mean = np.exp(np.mean(np.log(list(move_efficiency_dict.values()))))
+        for efficiency_weight_exponent in move_mix_autotune_efficiency_weight_exponents:
+            move_mix_candidate_list.append(normalize_move_mix(baseline_move_mix_dict, {
+                move_freq_name_str: baseline_move_mix_dict[move_freq_name_str] * (
+                    move_efficiency_dict.get(move_freq_name_str, move_efficiency_geometric_mean)
+                    / move_efficiency_geometric_mean
+                ) ** efficiency_weight_exponent
+                for move_freq_name_str in tunable_move_freq_list
+            }))
+
+    if "SwapFreq" in tunable_move_freq_list:
+        for swap_freq_scale_factor in move_mix_autotune_swap_freq_scale_factors:
+            move_mix_candidate_list.append(normalize_move_mix(baseline_move_mix_dict, {
+                move_freq_name_str: baseline_move_mix_dict[move_freq_name_str]
+                * (swap_freq_scale_factor if move_freq_name_str == "SwapFreq" else 1)
+                for move_freq_name_str in tunable_move_freq_list
+            }))
+
+    return [
+        move_mix_candidate_dict for move_mix_candidate_no, move_mix_candidate_dict in enumerate(move_mix_candidate_list)
+        if move_mix_candidate_dict != baseline_move_mix_dict
+        and move_mix_candidate_dict not in move_mix_candidate_list[:move_mix_candidate_no]
+    ]
+
+
+def run_move_mix_autotune_pilot(job, pilot_dict, pilot_no):
+    """Run the GOMC pilot from the equilb restart files, and get its move statistics and effective samples per CPU second."""
+    pilot_directory = job.fn(os.path.join(move_mix_autotune_directory_name, f"pilot_{pilot_no}"))
+    os.makedirs(pilot_directory, exist_ok=True)
+
+    pilot_keyword_values_dict = get_gomc_control_file_keyword_values(job, gomc_production_control_file_name_str)
+    pilot_keyword_values_dict.update({
+        "RunSteps": f"{int(move_mix_autotune_pilot_gomc_steps)}",
+        "OutputName": autotune_probe_control_file_name_str,
+        "EqSteps": f"{int(move_mix_autotune_pilot_blk_output_freq)}",
+        "PressureCalc": f"False {pressure_calc_freq}",
+        "RestartFreq": f"False {coordinate_output_freq}",
+        "CheckpointFreq": f"False {coordinate_output_freq}",
+        "DCDFreq": f"False {coordinate_output_freq}",
+        "ConsoleFreq": f"True {int(move_mix_autotune_pilot_gomc_steps)}",
+        "BlockAverageFreq": f"True {int(move_mix_autotune_pilot_blk_output_freq)}",
+        "IntraMEMC-2Freq": f"{pilot_dict['IntraMEMC_2Freq']}",
+        "MEMC-2Freq": f"{pilot_dict['MEMC_2Freq']}",
+    })
+    for pilot_keyword_str in [
+        "DisFreq", "RotFreq", "VolFreq", "MultiParticleFreq", "RegrowthFreq", "IntraSwapFreq", "CrankShaftFreq",
+        "SwapFreq", "CBMC_First", "CBMC_Nth",
+    ]:
+        pilot_keyword_values_dict[pilot_keyword_str] = f"{pilot_dict[pilot_keyword_str]}"
+    write_gomc_probe_control_file(job, gomc_production_control_file_name_str, pilot_keyword_values_dict, pilot_directory)
+    pilot_time_s = run_gomc_probe(job, pilot_directory)
+
+    move_acceptance_dict, move_time_s_dict = get_gomc_console_move_statistics(
+        os.path.join(pilot_directory, f"out_{autotune_probe_control_file_name_str}.dat")
+    )
+    pilot_result_dict = dict(pilot_dict)
+    pilot_result_dict.update({
+        "wall_time_s": pilot_time_s,
+        "move_acceptance": move_acceptance_dict,
+        "move_time_s": move_time_s_dict,
+        "effective_samples_per_cpu_s": 0.0,
+    })
+
+    # the effective samples of the slowest decorrelating column, per CPU second
+    try:
+        effective_samples_list = []
+        for box_no, blk_column_title_list in move_mix_autotune_blk_column_title_dict.items():
+            blk_data = load_blk_file(
+                os.path.join(pilot_directory, f"Blk_{autotune_probe_control_file_name_str}_BOX_{box_no}.dat")
+            )
+            for blk_column_title in blk_column_title_list:
+                pilot_result_dict[f"statistical_inefficiency_{blk_column_title}_box_{box_no}"] = \
+                    float(get_statistical_inefficiency(blk_data[blk_column_title]))
+                effective_samples_list.append(
+                    len(blk_data) / pilot_result_dict[f"statistical_inefficiency_{blk_column_title}_box_{box_no}"]
+                )
+        pilot_result_dict["effective_samples_per_cpu_s"] = \
+            float(min(effective_samples_list) / (pilot_time_s * int(job.doc.gomc_ncpu)))
+    except (OSError, ValueError) as error:
+        print(f"The move mix autotune pilot_{pilot_no} has no usable Blk file data: {error}")
+
+    return pilot_result_dict
+
+
+def get_move_mix_autotune_donor_job(job):
+    """Get a move mix autotuned job at the same state point, except the replica, so its autotuned values are reused."""
+    for other_job in get_statepoint_group_jobs(job, statepoint_without_replica):
+        if other_job.id != job.id and "move_mix_autotune" in other_job.doc:
+            return other_job
+
+    return None
+
+
+@Project.label
+def part_4c_move_mix_autotune_completed(job):
+    """Check that the move mix and CBMC trials are autotuned, if the autotuning is used."""
+    return not autotune_move_mix or "move_mix_autotune" in job.doc
+
+
+def part_4c_move_mix_autotune_ready(job):
+    """Check that the autotuning is used, and the production simulation is not started."""
+    return autotune_move_mix and not part_3b_output_gomc_production_run_started(job)
 
 
+@Project.pre(part_2b_gomc_production_control_file_written)
+@Project.pre(part_2d_electrostatics_autotune_completed)
+@Project.pre(part_2e_gomc_launch_autotune_completed)
+@Project.pre(part_4a_job_gomc_equilb_design_ensemble_completed_properly)
+@Project.pre(part_4c_move_mix_autotune_ready)
+@Project.post(part_4c_move_mix_autotune_completed)
+@Project.operation(directives=
+    {
+        "np": lambda job: job.doc.gomc_ncpu,
+        "ngpu": lambda job: job.doc.gomc_ngpu,
+        "memory": memory_needed,
+        "walltime": walltime_gomc_analysis_hr,
+    }, with_job=True
+)
+def part_4c_autotune_move_mix(job):
+    """Autotune the production move frequencies, and CBMC trials, with GOMC pilot runs from the equilb restart files.
+
+    The production control file is written again with the autotuned values by part_2c_regenerate_gomc_control_files.
+    """
+    move_mix_autotune_donor_job = get_move_mix_autotune_donor_job(job)
+    if move_mix_autotune_donor_job is not None:
+        job.doc.move_mix_autotune = dict(move_mix_autotune_donor_job.doc.move_mix_autotune)
+        job.doc.move_mix_autotune["donor_job_id"] = move_mix_autotune_donor_job.id
+        print(f"Completed: the move mix autotuned values are reused from job id {move_mix_autotune_donor_job.id}")
+        return
+
+    # the control files written before the metadata was saved are used as the template
+    if gomc_production_control_file_name_str not in job.doc.get("gomc_control_file_metadata", {}):
+        save_gomc_control_file_metadata(job, gomc_production_control_file_name_str, [])
+
+    gomc_common_control_variables_dict = get_gomc_common_control_variables(job)
+    baseline_pilot_dict = {
+        pilot_variable_str: gomc_common_control_variables_dict[pilot_variable_str]
+        for pilot_variable_str in move_mix_freq_list + ["CBMC_First", "CBMC_Nth"]
+    }
+    baseline_pilot_result_dict = run_move_mix_autotune_pilot(job, baseline_pilot_dict, 0)
+    pilot_result_list = [baseline_pilot_result_dict]
+
+    # the move mix candidates are run with the hand set CBMC trials
+    for move_mix_candidate_dict in get_move_mix_candidate_list(baseline_pilot_result_dict):
+        pilot_dict = dict(baseline_pilot_dict)
+        pilot_dict.update(move_mix_candidate_dict)
+        pilot_result_list.append(run_move_mix_autotune_pilot(job, pilot_dict, len(pilot_result_list)))
+
+    # the CBMC trial candidates are run with the best move mix
+    best_move_mix_pilot_result_dict = max(
+        pilot_result_list, key=lambda pilot_result_dict: pilot_result_dict["effective_samples_per_cpu_s"]
+    )
+    for cbmc_first, cbmc_nth in move_mix_autotune_cbmc_first_nth_candidates:
+        if [cbmc_first, cbmc_nth] == [baseline_pilot_dict["CBMC_First"], baseline_pilot_dict["CBMC_Nth"]]:
+            continue
+        pilot_dict = {
+            pilot_variable_str: best_move_mix_pilot_result_dict[pilot_variable_str] for pilot_variable_str in move_mix_freq_list
+        }
+        pilot_dict.update({"CBMC_First": int(cbmc_first), "CBMC_Nth": int(cbmc_nth)})
+        pilot_result_list.append(run_move_mix_autotune_pilot(job, pilot_dict, len(pilot_result_list)))
+
+    # the hand set values are kept, if none of the pilots have usable data
+    selected_pilot_result_dict = max(
+        pilot_result_list, key=lambda pilot_result_dict: pilot_result_dict["effective_samples_per_cpu_s"]
+    )
+    selected_dict = {
+        pilot_variable_str: selected_pilot_result_dict[pilot_variable_str]
+        for pilot_variable_str in move_mix_freq_list + ["CBMC_First", "CBMC_Nth"]
+    }
+    selected_dict["effective_samples_per_cpu_s"] = selected_pilot_result_dict["effective_samples_per_cpu_s"]
+    job.doc.move_mix_autotune = {
+        "pilots": pilot_result_list,
+        "selected": selected_dict,
+    }
+    print(
+        f"Completed: the move mix autotune selected {selected_dict}, from {len(pilot_result_list)} pilots"
+    )
+
 # ******************************************************
 # ******************************************************
-# Creating GOMC files (pdb, psf, force field (FF), and gomc control files (end)
+# move mix and CBMC trial autotuning, from GOMC pilot runs of the equilb restart files (end)
 # ******************************************************
 # ******************************************************
 
 
 # ******************************************************
 # ******************************************************
-# equilb NPT or GEMC-NVT - starting the GOMC simulation (start)
+# production run convergence, from the block-averaged Blk file data (start)
 # ******************************************************
 # ******************************************************
+def get_block_averaged_standard_error(data_series, no_blocks):
+    """Get the standard error of the data series mean, from the means of no_blocks equal blocks of the data."""
+    data_series = np.asarray(data_series, dtype=np.float64)
+    block_length = len(data_series) // no_blocks
+    block_means = data_series[len(data_series) - block_length * no_blocks:].reshape(no_blocks, block_length).mean(axis=1)
 
-@Project.pre(mosdef_input_written)
-@Project.pre(part_2a_gomc_equilb_design_ensemble_control_file_written)
-@Project.post(part_3a_output_gomc_equilb_design_ensemble_started)
-@Project.post(part_4a_job_gomc_equilb_design_ensemble_completed_properly)
-@Project.operation(directives=
-    {
-        "np": lambda job: job.doc.gomc_ncpu,
-        "ngpu": lambda job: job.doc.gomc_ngpu,
-        "memory": memory_needed,
-        "walltime": walltime_gomc_equilbrium_hr,
-    }, with_job=True, cmd=True
-)
-#@flow.with_job
-#@flow.cmd
-def run_equilb_ensemble_gomc_command(job):
-    """Run the gomc equilb_ensemble simulation."""
-    control_file_name_str = gomc_equilb_control_file_name_str
+    return np.std(block_means, ddof=1) / np.sqrt(no_blocks)
 
-    print(f"Running simulation job id {job}")
-    run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
-        str(gomc_binary_path),
-        str(job.doc.gomc_equilb_design_ensemble_gomc_binary_file),
-        str(job.doc.gomc_ncpu),
-        str(control_file_name_str),
-        str(control_file_name_str),
+
+def save_production_run_timing(job, production_run_time_s, production_max_rss_gb):
+    """Save the production run wall time, steps (the last Blk file step), steps per second and peak memory in the job document."""
+    job.doc.production_run_timing = get_gomc_run_timing(
+        job,
+        gomc_production_control_file_name_str,
+        gomc_production_output_name_str,
+        production_run_time_s,
+        production_max_rss_gb,
     )
 
-    print('gomc equilb run_command = ' + str(run_command))
 
-    return run_command
+def get_production_run_convergence(job):
+    """Check if the production run Blk data meets the convergence tolerances.
+
+    Returns the converged bool, and the relative standard error of each box and property used.
+    """
+    production_converged_bool = True
+    relative_standard_error_dict = {}
+    for box_no, relative_tolerance_dict in production_convergence_relative_tolerance_dict.items():
+        try:
+            blk_data = load_blk_file(job.fn(f"Blk_{gomc_production_output_name_str}_BOX_{box_no}.dat"))
+        except FileNotFoundError:
+            return False, relative_standard_error_dict
+
+        if equilibration_detection_method is not None:
+            step_start_box, property_start_step_dict = detect_production_start_step(
+                blk_data, equilibration_detection_blk_column_title_list, method=equilibration_detection_method
+            )
+            blk_data = blk_data[blk_data[blk_data.dtype.names[0]] >= step_start_box]
+
+        if len(blk_data) < production_convergence_no_blocks * 2:
+            return False, relative_standard_error_dict
+
+        for column_title_i, relative_tolerance_i in relative_tolerance_dict.items():
+            data_mean = np.mean(blk_data[column_title_i])
+            relative_standard_error = float(
+                get_block_averaged_standard_error(blk_data[column_title_i], production_convergence_no_blocks)
+                / abs(data_mean)
+            ) if data_mean != 0 else float("inf")
+            relative_standard_error_dict[f"box_{box_no}_{column_title_i}"] = relative_standard_error
+
+            if not relative_standard_error <= relative_tolerance_i:
+                production_converged_bool = False
+
+    return production_converged_bool, relative_standard_error_dict
+
 
+def trim_gomc_blk_files(job, output_name_str, last_step):
+    """Remove the Blk file rows after the last step (i.e., the restart point the run was stopped at)."""
+    for box_no in [0, 1]:
+        blk_file = job.fn(f"Blk_{output_name_str}_BOX_{box_no}.dat")
+        if not os.path.isfile(blk_file):
+            continue
+
+        with open(blk_file, "r") as fp:
+            header_line = fp.readline()
+            blk_data_line_list = [
+                line for line in fp.read().splitlines()
+                if len(line.split()) > 0 and int(float(line.split()[0])) <= last_step
+            ]
+
+        with open(f"{blk_file}.tmp", "w") as fp:
+            fp.write(header_line + "".join(f"{line}\n" for line in blk_data_line_list))
+        os.replace(f"{blk_file}.tmp", blk_file)
 
 # ******************************************************
 # ******************************************************
-# equilb NPT or GEMC-NVT - starting the GOMC simulation (end)
+# production run convergence, from the block-averaged Blk file data (end)
 # ******************************************************
 # ******************************************************
 
@@ -1006,23 +4278,99 @@ def run_equilb_ensemble_gomc_command(job):
 # ******************************************************
 
 
-@Project.pre(part_2b_gomc_production_control_file_written)
-@Project.pre(part_4a_job_gomc_equilb_design_ensemble_completed_properly)
+def run_production_run_gomc_segment(job):
+    """Run the next segment of the production run, and finish the run after the last segment.
+
+    The run is stopped after the segment once it is converged, as the segments end at restart points.
+    If it is not converged after gomc_run_no_segments segments, it is extended by one segment at a time,
+    up to production_convergence_max_no_extensions segments.
+    """
+    control_file_name_str = gomc_production_control_file_name_str
+
+    segment_no = run_gomc_run_segment(
+        job,
+        control_file_name_str,
+        gomc_production_output_name_str,
+        job.doc.gomc_production_ensemble_gomc_binary_file,
+    )
+    no_segments_completed = segment_no + 1
+
+    # the benchmark jobs always run their fixed steps
+    convergence_checked_bool = production_convergence_relative_tolerance_dict is not None \
+        and "benchmark_gomc_steps" not in job.sp
+    production_converged_bool, relative_standard_error_dict = get_production_run_convergence(job) \
+        if convergence_checked_bool else (False, {})
+    stopped_early_bool = production_converged_bool and no_segments_completed < gomc_run_no_segments
+    no_extension_segments = max(no_segments_completed - gomc_run_no_segments, 0)
+    if not production_converged_bool \
+            and no_segments_completed < get_gomc_run_max_no_segments(job, control_file_name_str):
+        return
+
+    if stopped_early_bool:
+        completed_note_str = "the production run was stopped after a segment, as the convergence tolerances were met."
+    elif no_extension_segments > 0:
+        completed_note_str = (
+            f"the production run was extended by {no_extension_segments} segments, "
+            + ("until the convergence tolerances were met." if production_converged_bool
+               else "and the convergence tolerances were not met.")
+        )
+    else:
+        completed_note_str = None
+
+    finish_gomc_segmented_run(
+        job,
+        control_file_name_str,
+        gomc_production_output_name_str,
+        no_segments_completed,
+        completed_note_str=completed_note_str,
+    )
+    save_production_run_timing(
+        job,
+        get_gomc_run_segments_wall_time_s(job, control_file_name_str, no_segments_completed),
+        get_gomc_run_segments_max_rss_gb(job, control_file_name_str, no_segments_completed),
+    )
+    if convergence_checked_bool:
+        job.doc.production_convergence = {
+            "converged": production_converged_bool,
+            "stopped_early": stopped_early_bool,
+            "no_extension_segments": no_extension_segments,
+            "relative_standard_error": relative_standard_error_dict,
+        }
+
+
+def production_gomc_run_preconditions_met(job):
+    """Check the production GOMC run's preconditions (for its operation, and the node bundle)."""
+    return part_2b_gomc_production_control_file_written(job) \
+        and part_2c_gomc_control_files_up_to_date(job) \
+        and part_2d_electrostatics_autotune_completed(job) \
+        and part_2e_gomc_launch_autotune_completed(job) \
+        and part_4a_job_gomc_equilb_design_ensemble_completed_properly(job) \
+        and part_4c_move_mix_autotune_completed(job)
+
+
+@Project.pre(production_gomc_run_preconditions_met)
+@Project.pre(node_bundle_not_used)
 @Project.post(part_3b_output_gomc_production_run_started)
 @Project.post(part_4b_job_production_run_completed_properly)
 @Project.operation(directives=
     {
         "np": lambda job: job.doc.gomc_ncpu,
         "ngpu": lambda job: job.doc.gomc_ngpu,
-        "memory": memory_needed,
-        "walltime": walltime_gomc_production_hr,
-    }, with_job=True, cmd=True
+        "memory": lambda job: get_gomc_run_memory_gb(job),
+        "walltime": lambda job: get_gomc_run_walltime_hr(
+            job, gomc_production_control_file_name_str, walltime_gomc_production_hr
+        ),
+    }, with_job=True
 )
 def run_production_run_gomc_command(job):
-    """Run the gomc_production_ensemble simulation."""
+    """Run the gomc_production_ensemble simulation, stopping it at a restart point once it is converged."""
 
     control_file_name_str = gomc_production_control_file_name_str
 
+    if get_gomc_run_max_no_segments(job, control_file_name_str) > 1:
+        run_production_run_gomc_segment(job)
+        return
+
     print(f"Running simulation job id {job}")
     run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
         str(gomc_binary_path),
@@ -1034,7 +4382,68 @@ def run_production_run_gomc_command(job):
 
     print('gomc production run_command = ' + str(run_command))
 
-    return run_command
+    # the benchmark jobs always run their fixed steps
+    start_time_s = time.perf_counter()
+    if production_convergence_relative_tolerance_dict is None or "benchmark_gomc_steps" in job.sp:
+        max_rss_gb = run_gomc_command(run_command)
+        save_production_run_timing(job, time.perf_counter() - start_time_s, max_rss_gb)
+        return
+
+    # a convergence stop of an earlier run is not used for this run
+    job.doc.pop("production_convergence", None)
+
+    # run gomc in its own process group, so the shell and gomc can be stopped together
+    gomc_process = subprocess.Popen(run_command, shell=True, start_new_session=True)
+    restart_file = f"{gomc_production_output_name_str}_BOX_0_restart.coor"
+    converged_restart_mtime_ns = None
+    stopped_early_bool = False
+    try:
+        while True:
+            max_rss_gb = wait4_gomc_process(gomc_process, timeout_s=production_convergence_check_interval_s)
+            if max_rss_gb is not None:
+                break
+
+            restart_mtime_ns = os.stat(restart_file).st_mtime_ns if os.path.isfile(restart_file) else 0
+            if converged_restart_mtime_ns is None:
+                production_converged_bool, relative_standard_error_dict = get_production_run_convergence(job)
+                if production_converged_bool:
+                    print(f"The production run is converged, stopping at the next restart point: {relative_standard_error_dict}")
+                    converged_restart_mtime_ns = restart_mtime_ns
+
+            elif restart_mtime_ns > converged_restart_mtime_ns:
+                # wait for all the restart and checkpoint files to be written before stopping gomc
+                time.sleep(production_convergence_restart_write_wait_s)
+                os.killpg(gomc_process.pid, signal.SIGTERM)
+                max_rss_gb = wait4_gomc_process(gomc_process)
+                stopped_early_bool = True
+                break
+    finally:
+        # gomc is not left running if the supervision fails or is interrupted
+        if gomc_process.returncode is None:
+            os.killpg(gomc_process.pid, signal.SIGTERM)
+            wait4_gomc_process(gomc_process)
+
+    if not stopped_early_bool and gomc_process.returncode != 0:
+        raise subprocess.CalledProcessError(gomc_process.returncode, run_command)
+
+    restart_step = None
+    if stopped_early_bool:
+        # the Blk rows written after the restart point are removed, so the data ends where a restart resumes
+        blk_data = load_blk_file(job.fn(f"Blk_{gomc_production_output_name_str}_BOX_0.dat"))
+        restart_freq = get_gomc_job_output_freq_dict(job)["coordinate_output_freq"]
+        restart_step = int(blk_data[blk_data.dtype.names[0]][-1]) // restart_freq * restart_freq \
+            if len(blk_data) > 0 else 0
+        trim_gomc_blk_files(job, gomc_production_output_name_str, restart_step)
+    save_production_run_timing(job, time.perf_counter() - start_time_s, max_rss_gb)
+
+    # the convergence stop is written last, as it marks the stopped run as completed (part_4b)
+    production_converged_bool, relative_standard_error_dict = get_production_run_convergence(job)
+    job.doc.production_convergence = {
+        "converged": production_converged_bool,
+        "stopped_early": stopped_early_bool,
+        "restart_step": restart_step,
+        "relative_standard_error": relative_standard_error_dict,
+    }
 # ******************************************************
 # ******************************************************
 # production run - starting the GOMC simulation (end)
@@ -1042,13 +4451,476 @@ def run_production_run_gomc_command(job):
 # ******************************************************
 
 
+# ******************************************************
+# ******************************************************
+# node bundling - running many GOMC runs concurrently in one node allocation (start)
+# ******************************************************
+# ******************************************************
+# the GOMC run operations' conditions, as the runs are only ready if their preconditions are met and
+# their postconditions are not (the per-job operations are not eligible while the node bundle is used)
+node_bundle_gomc_run_ready_function_dict = {
+    "run_equilb_ensemble_gomc_command": lambda job: equilb_gomc_run_preconditions_met(job)
+        and not (part_3a_output_gomc_equilb_design_ensemble_started(job)
+                 and part_4a_job_gomc_equilb_design_ensemble_completed_properly(job)),
+    "run_production_run_gomc_command": lambda job: production_gomc_run_preconditions_met(job)
+        and not (part_3b_output_gomc_production_run_started(job)
+                 and part_4b_job_production_run_completed_properly(job)),
+}
+
+
+def node_bundle_used(*jobs):
+    """Check that the node bundle is used, instead of the per-job GOMC run operations."""
+    return use_node_bundle
+
+
+def get_node_bundle_eligible_gomc_runs(jobs):
+    """Get the ready (operation name, job) GOMC runs of the jobs, for the node bundle."""
+    return [
+        (operation_name_str, job)
+        for operation_name_str in node_bundle_gomc_run_operation_list
+        for job in jobs
+        if node_bundle_gomc_run_ready_function_dict[operation_name_str](job)
+    ]
+
+
+def node_bundle_gomc_runs_eligible(*jobs):
+    """Check that any of the jobs have a ready GOMC run, for the node bundle."""
+    return len(get_node_bundle_eligible_gomc_runs(jobs)) > 0
+
+
+def node_bundle_gomc_runs_completed(*jobs):
+    """Check that none of the jobs have an eligible GOMC run left, for the node bundle."""
+    return not node_bundle_gomc_runs_eligible(*jobs)
+
+
+def get_node_bundle_memory_gb(jobs):
+    """Get the node bundle's memory, as the GOMC run memory times the most runs which fit in the cores at the same time."""
+    if node_bundle_memory_gb is not None:
+        return node_bundle_memory_gb
+
+    max_no_concurrent_runs = min(
+        len(jobs), max(node_bundle_no_cores // max(min(int(job.doc.get("gomc_ncpu", 1)) for job in jobs), 1), 1)
+    )
+
+    return max(get_gomc_run_memory_gb(job) for job in jobs) * max_no_concurrent_runs
+
+
+def get_node_bundle_allocation():
+    """Get the allocation's cores (this process' CPU affinity) and GPU device ids (CUDA_VISIBLE_DEVICES)."""
+    core_list = sorted(os.sched_getaffinity(0))
+    if "CUDA_VISIBLE_DEVICES" in os.environ:
+        gpu_list = [gpu_str for gpu_str in os.environ["CUDA_VISIBLE_DEVICES"].split(",") if gpu_str.strip() != ""]
+    else:
+        gpu_list = [str(gpu_no) for gpu_no in range(node_bundle_no_gpus)]
+
+    return core_list, gpu_list
+
+
+def write_node_bundle_utilization(bundle_id, bundle_wall_time_s, no_allocation_cores, run_record_list):
+    """Append the node bundle's runs, with their core sets and CPU utilization, to the analysis text file."""
+    output_file = os.path.join(project_directory_path, "analysis", output_node_bundle_utilization_txt_file_name)
+    output_column_title_list = [
+        "bundle_id", "operation", "job_id", "cores", "gpu", "wall_time_s", "cpu_time_s", "utilization", "exit_code",
+    ]
+    write_header_bool = not os.path.isfile(output_file)
+    with open(output_file, "a") as utilization_txt_file:
+        if write_header_bool:
+            utilization_txt_file.write("".join(f"{title: <30} " for title in output_column_title_list) + " \n")
+        for run_record_dict in run_record_list:
+            utilization_txt_file.write("".join(
+                f"{str(run_record_dict[title]): <30} " for title in output_column_title_list
+            ) + " \n")
+
+        # the whole allocation's utilization, as the used core seconds over the allocated core seconds
+        used_core_s = sum(run_record_dict["cpu_time_s"] for run_record_dict in run_record_list)
+        allocation_utilization = round(used_core_s / max(bundle_wall_time_s * no_allocation_cores, 1e-9), 4)
+        utilization_txt_file.write("".join(f"{str(value): <30} " for value in [
+            bundle_id, "allocation", "", f"{no_allocation_cores} cores", "",
+            round(bundle_wall_time_s, 1), round(used_core_s, 1), allocation_utilization, "",
+        ]) + " \n")
+
+    return allocation_utilization
+
+
+@Project.pre(node_bundle_used)
+@Project.pre(node_bundle_gomc_runs_eligible)
+@Project.post(node_bundle_gomc_runs_completed)
+@Project.operation(directives=
+     {
+         "np": node_bundle_no_cores,
+         "ngpu": node_bundle_no_gpus,
+         "memory": lambda *jobs: get_node_bundle_memory_gb(jobs),
+         "walltime": walltime_gomc_production_hr,
+     }, aggregator=aggregator(all_jobs_if_any)
+)
+def bundle_gomc_runs_on_node(*jobs):
+    """Run the eligible GOMC runs concurrently on the allocation's disjoint core sets (and GPUs), until none are left.
+
+    Each run is its own 'python GEMC.py exec <operation> <job id>' process, pinned with taskset.
+    """
+    core_list, gpu_list = get_node_bundle_allocation()
+    free_core_list = list(core_list)
+    free_gpu_list = list(gpu_list)
+    taskset_bool = shutil.which("taskset") is not None
+    if not taskset_bool:
+        print("The taskset command is not available, so the GOMC runs are not pinned to their cores.")
+
+    bundle_id = os.environ.get("SLURM_JOB_ID", time.strftime("%Y%m%d-%H%M%S"))
+    bundle_start_time_s = time.perf_counter()
+    running_run_dict = {}
+    started_run_set = set()
+    run_record_list = []
+    never_fit_run_dict = {}
+    while True:
+        # start the eligible runs that fit in the free cores and GPUs
+        for operation_name_str, job in get_node_bundle_eligible_gomc_runs(jobs):
+            run_ncpu = int(job.doc.gomc_ncpu)
+            run_ngpu = int(job.doc.gomc_ngpu)
+            if run_ncpu > len(core_list) or run_ngpu > len(gpu_list):
+                # the run does not fit in the whole allocation, so it can never be started
+                never_fit_run_dict[f"{operation_name_str} {job.id}"] = f"{run_ncpu} cores, {run_ngpu} GPUs"
+                continue
+            if (operation_name_str, job.id) in started_run_set \
+                    or run_ncpu > len(free_core_list) or run_ngpu > len(free_gpu_list):
+                continue
+
+            run_core_list = free_core_list[:run_ncpu]
+            run_gpu_list = free_gpu_list[:run_ngpu]
+            free_core_list = free_core_list[run_ncpu:]
+            free_gpu_list = free_gpu_list[run_ngpu:]
+
+            run_command_list = [sys.executable, os.path.join(project_directory_path, "GEMC.py"), "exec",
+                                operation_name_str, job.id]
+            if taskset_bool:
+                run_command_list = ["taskset", "-c", ",".join(str(core) for core in run_core_list)] + run_command_list
+            run_environment = dict(os.environ, CUDA_VISIBLE_DEVICES=",".join(run_gpu_list))
+            with open(job.fn(f"node_bundle_{operation_name_str}.log"), "a") as log_file:
+                run_process = subprocess.Popen(
+                    run_command_list, cwd=project_directory_path, env=run_environment,
+                    stdout=log_file, stderr=subprocess.STDOUT,
+                )
+            started_run_set.add((operation_name_str, job.id))
+            running_run_dict[run_process.pid] = {
+                "process": run_process,
+                "operation": operation_name_str,
+                "job_id": job.id,
+                "core_list": run_core_list,
+                "gpu_list": run_gpu_list,
+                "start_time_s": time.perf_counter(),
+            }
+            print(f"Started {operation_name_str} of job id {job.id} on cores {run_core_list}, GPUs {run_gpu_list}")
+
+        if len(running_run_dict) == 0:
+            break
+
+        # wait for the runs, and free the cores and GPUs of the finished runs
+        time.sleep(node_bundle_check_interval_s)
+        for run_pid in list(running_run_dict.keys()):
+            finished_pid, wait_status, run_resource_usage = os.wait4(run_pid, os.WNOHANG)
+            if finished_pid == 0:
+                continue
+
+            running_run = running_run_dict.pop(run_pid)
+            running_run["process"].returncode = os.waitstatus_to_exitcode(wait_status)
+            free_core_list = sorted(free_core_list + running_run["core_list"])
+            free_gpu_list = free_gpu_list + running_run["gpu_list"]
+
+            # the CPU time includes the waited for children (the shell and GOMC)
+            run_wall_time_s = time.perf_counter() - running_run["start_time_s"]
+            run_cpu_time_s = run_resource_usage.ru_utime + run_resource_usage.ru_stime
+            run_record_list.append({
+                "bundle_id": bundle_id,
+                "operation": running_run["operation"],
+                "job_id": running_run["job_id"],
+                "cores": ",".join(str(core) for core in running_run["core_list"]),
+                "gpu": ",".join(running_run["gpu_list"]),
+                "wall_time_s": round(run_wall_time_s, 1),
+                "cpu_time_s": round(run_cpu_time_s, 1),
+                "utilization": round(run_cpu_time_s / max(run_wall_time_s * len(running_run["core_list"]), 1e-9), 4),
+                "exit_code": running_run["process"].returncode,
+            })
+            print(
+                f"Finished {running_run['operation']} of job id {running_run['job_id']} "
+                f"(exit code {running_run['process'].returncode}), CPU utilization {run_record_list[-1]['utilization']}"
+            )
+
+    allocation_utilization = write_node_bundle_utilization(
+        bundle_id, time.perf_counter() - bundle_start_time_s, len(core_list), run_record_list
+    )
+    print(
+        f"Completed: the node bundle ran {len(run_record_list)} GOMC runs, "
+        f"with an allocation utilization of {allocation_utilization}"
+    )
+
+    failed_run_list = [
+        f"{run_record_dict['operation']} {run_record_dict['job_id']}"
+        for run_record_dict in run_record_list if run_record_dict["exit_code"] != 0
+    ]
+    if len(never_fit_run_dict) > 0 or len(failed_run_list) > 0:
+        raise RuntimeError(
+            f"The node bundle ({len(core_list)} cores, {len(gpu_list)} GPUs) can not fit these GOMC runs: "
+            f"{never_fit_run_dict}, and these GOMC runs failed: {failed_run_list}"
+        )
+
+# ******************************************************
+# ******************************************************
+# node bundling - running many GOMC runs concurrently in one node allocation (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# GOMC Blk_*.dat file loader, with a parsed-data cache (start)
+# Note: the Blk file is parsed once into a NumPy record array, with the column names
+# from the header (STEP without the "#"), which is saved next to it as a binary .npz file.
+# The .npz file is keyed on the Blk file size and modification time, so the Blk file
+# is only parsed again if it changes.
+# ******************************************************
+# ******************************************************
+blk_file_parsed_cache_version = 1
+
+def get_blk_file_parsed_cache_path(blk_file_path):
+    """Get the parsed-data (.npz) cache file path for the GOMC Blk file."""
+    return f"{os.path.splitext(blk_file_path)[0]}_parsed.npz"
+
+
+def parse_blk_file(blk_file_path):
+    """Parse the GOMC Blk file into a NumPy record array, skipping a partly written last line."""
+    with open(blk_file_path, "r") as fp:
+        header_list = fp.readline().split()
+        data_text = fp.read()
+
+    header_list[0] = header_list[0].lstrip("#")
+    data_text = data_text[: data_text.rfind("\n") + 1]
+    if data_text.strip():
+        data_array = np.loadtxt(io.StringIO(data_text), ndmin=2)
+    else:
+        data_array = np.empty((0, len(header_list)))
+
+    blk_data = np.empty(
+        len(data_array),
+        dtype=[(column_i, np.int64 if i == 0 else np.float64) for i, column_i in enumerate(header_list)],
+    )
+    for i, column_i in enumerate(header_list):
+        blk_data[column_i] = data_array[:, i]
+
+    return blk_data.view(np.recarray)
+
+
+def load_blk_file(blk_file_path):
+    """Load the GOMC Blk file as a NumPy record array, from its parsed-data cache if it is current."""
+    blk_file_stat = os.stat(blk_file_path)
+    blk_file_size_mtime = np.array([blk_file_stat.st_size, blk_file_stat.st_mtime_ns], dtype=np.int64)
+    parsed_cache_path = get_blk_file_parsed_cache_path(blk_file_path)
+
+    try:
+        with np.load(parsed_cache_path) as parsed_cache:
+            if int(parsed_cache["version"]) == blk_file_parsed_cache_version \
+                    and np.array_equal(parsed_cache["blk_file_size_mtime"], blk_file_size_mtime):
+                return parsed_cache["blk_data"].view(np.recarray)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    blk_data = parse_blk_file(blk_file_path)
+
+    # write the cache to a temporary file first, so other processes never read a partly written cache
+    parsed_cache_tmp_path = f"{parsed_cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(parsed_cache_tmp_path, "wb") as fp:
+            np.savez(
+                fp,
+                version=blk_file_parsed_cache_version,
+                blk_file_size_mtime=blk_file_size_mtime,
+                blk_data=np.asarray(blk_data),
+            )
+        os.replace(parsed_cache_tmp_path, parsed_cache_path)
+    except OSError:
+        # the cache is optional, so the parsed data is still used if it can not be written
+        if os.path.isfile(parsed_cache_tmp_path):
+            os.remove(parsed_cache_tmp_path)
+
+    return blk_data
+
+# ******************************************************
+# ******************************************************
+# GOMC Blk_*.dat file loader, with a parsed-data cache (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# automatic equilibration detection, to pick the production start step (start)
+# Note: the start of the production data is picked for each box and property from the
+# Blk file time series, and the latest start of the properties is used for that box.
+# "mser" is the Marginal Standard Error Rule (White, 1997), and "max_neff" picks the start that
+# maximizes the number of uncorrelated samples, (N - t0) / g(t0) (Chodera, 2016).
+# ******************************************************
+# ******************************************************
+def get_statistical_inefficiency(data_series):
+    """Get the statistical inefficiency (g) of the data series, from its FFT autocorrelation function."""
+    data_series = np.asarray(data_series, dtype=np.float64)
+    no_samples = len(data_series)
+    data_deviation = data_series - np.mean(data_series)
+    data_variance = np.dot(data_deviation, data_deviation) / no_samples
+    if no_samples < 2 or data_variance == 0:
+        return 1.0
+
+    fft_length = 2 ** int(np.ceil(np.log2(2 * no_samples)))
+    data_fft = np.fft.rfft(data_deviation, n=fft_length)
+    autocorrelation = np.fft.irfft(data_fft * np.conjugate(data_fft), n=fft_length)[1:no_samples]
+    autocorrelation /= data_variance * np.arange(no_samples - 1, 0, -1)
+
+    # sum the autocorrelation up to its first zero crossing
+    lag_times = np.arange(1, no_samples)
+    non_positive_index = np.flatnonzero(autocorrelation <= 0)
+    last_lag_index = non_positive_index[0] if len(non_positive_index) > 0 else no_samples - 1
+    statistical_inefficiency = 1.0 + 2.0 * np.sum(
+        (1.0 - lag_times[:last_lag_index] / no_samples) * autocorrelation[:last_lag_index]
+    )
+
+    return max(statistical_inefficiency, 1.0)
+
+
+def detect_equilibration_mser(data_series):
+    """Get the production start index of the data series with the Marginal Standard Error Rule (MSER)."""
+    data_series = np.asarray(data_series, dtype=np.float64)
+    no_samples = len(data_series)
+
+    # sums over the last n samples, for every n at once
+    reversed_series = data_series[::-1]
+    no_last_samples = np.arange(1, no_samples + 1)
+    sum_last_samples = np.cumsum(reversed_series)
+    sum_squared_last_samples = np.cumsum(reversed_series ** 2)
+    mser_last_samples = (sum_squared_last_samples - sum_last_samples ** 2 / no_last_samples) / no_last_samples ** 2
+
+    # the mser for each start index, only searching the first half of the data
+    mser_start_index = mser_last_samples[::-1][: no_samples // 2 + 1]
+
+    return int(np.argmin(mser_start_index))
+
+
+def detect_equilibration_max_neff(data_series, max_start_index_tries=50):
+    """Get the production start index of the data series which maximizes the number of uncorrelated samples."""
+    data_series = np.asarray(data_series, dtype=np.float64)
+    no_samples = len(data_series)
+    start_index_list = np.unique(
+        np.linspace(0, no_samples // 2, min(no_samples // 2 + 1, max_start_index_tries)).astype(int)
+    )
+    no_uncorrelated_samples_list = [
+        (no_samples - start_index_i) / get_statistical_inefficiency(data_series[start_index_i:])
+        for start_index_i in start_index_list
+    ]
+
+    return int(start_index_list[np.argmax(no_uncorrelated_samples_list)])
+
+
+def detect_production_start_step(blk_data, column_title_list, method="mser", min_no_samples=4):
+    """Get the production start step of the Blk data, and the start step for each property (column).
+
+    The properties not in the Blk file, or with non-finite values, or fewer than min_no_samples values, are not used.
+    """
+    detect_equilibration_function_dict = {
+        "mser": detect_equilibration_mser,
+        "max_neff": detect_equilibration_max_neff,
+    }
+    if method not in detect_equilibration_function_dict:
+        raise ValueError(
+            f"ERROR: The equilibration detection method must be one of "
+            f"{list(detect_equilibration_function_dict.keys())}, not '{method}'."
+        )
+
+    step_column_title = blk_data.dtype.names[0]
+    property_start_step_dict = {}
+    for column_title_i in column_title_list:
+        if column_title_i not in blk_data.dtype.names:
+            continue
+
+        data_series = blk_data[column_title_i]
+        if len(data_series) < min_no_samples:
+            print(
+                f"WARNING: The {column_title_i} Blk data has {len(data_series)} rows, fewer than {min_no_samples}, "
+                f"so it is not used to pick the production start step."
+            )
+            continue
+        if not np.all(np.isfinite(data_series)):
+            continue
+
+        start_index = detect_equilibration_function_dict[method](data_series)
+        property_start_step_dict[column_title_i] = int(blk_data[step_column_title][start_index])
+
+    if len(property_start_step_dict) == 0:
+        return 0, property_start_step_dict
+
+    return max(property_start_step_dict.values()), property_start_step_dict
+
+# ******************************************************
+# ******************************************************
+# automatic equilibration detection, to pick the production start step (end)
+# ******************************************************
+# ******************************************************
+
+
 # ******************************************************
 # ******************************************************
 # data analysis - get the average data from each replicate (start)
 # ******************************************************
 # ******************************************************
 
+def remove_replica_and_critical_analysis_files(jobs):
+    """Remove the total averaged replicate data and all the analysis data after it, for the jobs' new averages.
+
+    The benchmark jobs are not in the production analysis, so they only remove the electrostatics benchmark table.
+    """
+    analysis_file_name_list = []
+    if any(production_analysis_job(job) for job in jobs):
+        analysis_file_name_list += [
+            output_avg_std_of_replicates_txt_file_name_liq,
+            output_avg_std_of_replicates_txt_file_name_vap,
+            output_critical_data_replicate_txt_file_name,
+            output_critical_data_avg_std_of_replicates_txt_file_name,
+            output_boiling_data_replicate_txt_file_name,
+            output_boiling_data_avg_std_of_replicates_txt_file_name,
+        ]
+    if not all(production_analysis_job(job) for job in jobs):
+        analysis_file_name_list.append(output_electrostatics_benchmark_txt_file_name)
+
+    for analysis_file_name in analysis_file_name_list:
+        analysis_file_path = os.path.join(project_directory_path, "analysis", analysis_file_name)
+        if os.path.isfile(analysis_file_path):
+            os.remove(analysis_file_path)
+
+
+def add_job_to_analysis_registry(job):
+    """Add the job to the project analysis registry, and clear the replica averages groups."""
+    if not production_analysis_job(job):
+        return
+
+    # the replica averages groups are cleared, as their analysis files were removed
+    analysis_registry = job.project.doc.setdefault(
+        "analysis_registry", {"individual_averages": {}, "replica_averages": []}
+    )
+    analysis_registry["replica_averages"] = []
+    group_job_id_list = analysis_registry.setdefault("individual_averages", {}).setdefault(
+        replica_group_key(job), []
+    )
+    if job.id not in group_job_id_list:
+        group_job_id_list.append(job.id)
+
+
+def bulk_analysis_used(*jobs):
+    """Check that the bulk part_5a analysis is used, instead of the per-job part_5a operation."""
+    return use_bulk_analysis
+
+
+def bulk_analysis_not_used(*jobs):
+    """Check that the per-job part_5a operation is used, instead of the bulk part_5a analysis."""
+    return not use_bulk_analysis
+
+
 @Project.pre(part_4b_job_production_run_completed_properly)
+@Project.pre(bulk_analysis_not_used)
 @Project.post(part_5a_analysis_individual_simulation_averages_completed)
 @Project.operation(directives=
      {
@@ -1059,23 +4931,20 @@ def run_production_run_gomc_command(job):
      }, with_job=True
 )
 def part_5a_analysis_individual_simulation_averages(job):
+    """Write the individual simulation averages for the job."""
     # remove the total averged replicate data and all analysis data after this,
     # as it is no longer valid when adding more simulations
-    if os.path.isfile(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_liq}'):
-        os.remove(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_liq}')
-    if os.path.isfile(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_vap}'):
-        os.remove(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_vap}')
-    if os.path.isfile(f'../../analysis/{output_critical_data_replicate_txt_file_name}'):
-        os.remove(f'../../analysis/{output_critical_data_replicate_txt_file_name}')
-    if os.path.isfile(f'../../analysis/{output_critical_data_avg_std_of_replicates_txt_file_name}'):
-        os.remove(f'../../analysis/{output_critical_data_avg_std_of_replicates_txt_file_name}')
-    if os.path.isfile(f'../../analysis/{output_boiling_data_replicate_txt_file_name}'):
-        os.remove(f'../../analysis/{output_boiling_data_replicate_txt_file_name}')
-    if os.path.isfile(f'../../analysis/{output_boiling_data_avg_std_of_replicates_txt_file_name}'):
-        os.remove(f'../../analysis/{output_boiling_data_avg_std_of_replicates_txt_file_name}')
+    remove_replica_and_critical_analysis_files([job])
+
+    write_individual_simulation_averages(job)
+
+    add_job_to_analysis_registry(job)
 
 
+def write_individual_simulation_averages(job):
+    """Get the averages from the job's production Blk files, and write them to the job's replicate txt files."""
     # this is set to basically use all values.  However, allows the ability to set if needed
+    # Note: the step_start is raised for each box by the automatic equilibration detection, if used.
     step_start = 0 * 10 ** 6
     step_finish = 1 * 10 ** 12
 
@@ -1102,57 +4971,34 @@ def part_5a_analysis_individual_simulation_averages(job):
     blk_file_reading_column_box_Hv_title = 'HEAT_VAP'  # column title title for HEAT_VAP
     blk_file_reading_column_box_Z_title = 'COMPRESSIBILITY'  # column title title for compressiblity (Z)
 
-    # Programmed data
-    step_start_string = str(int(step_start))
-    step_finish_string = str(int(step_finish))
+    step_no_title_mod = blk_file_reading_column_no_step_title[1:]
 
     # *************************
     # drawing in data from single file and extracting specific rows for the liquid box (start)
     # *************************
-    data_box_0 = pd.read_csv(reading_file_box_0, sep='\s+', header=0, na_values='NaN', index_col=False)
+    data_box_0 = load_blk_file(reading_file_box_0)
+    data_box_0 = data_box_0[
+        (data_box_0[step_no_title_mod] >= step_start) & (data_box_0[step_no_title_mod] <= step_finish)
+    ]
+    step_start_box_0 = step_start
+    property_start_step_box_0_dict = {}
+    if equilibration_detection_method is not None:
+        step_start_box_0, property_start_step_box_0_dict = detect_production_start_step(
+            data_box_0,
+            equilibration_detection_blk_column_title_list,
+            method=equilibration_detection_method,
+            min_no_samples=equilibration_detection_min_no_samples,
+        )
+        step_start_box_0 = max(step_start, step_start_box_0)
+        data_box_0 = data_box_0[data_box_0[step_no_title_mod] >= step_start_box_0]
 
-    data_box_0 = pd.DataFrame(data_box_0)
-    step_no_title_mod = blk_file_reading_column_no_step_title[1:]
-    header_list = list(data_box_0.columns)
-    header_list[0] = step_no_title_mod
-    data_box_0.columns = header_list
-
-    data_box_0 = data_box_0.query(step_start_string + ' <= ' + step_no_title_mod + ' <= ' + step_finish_string)
-
-    iter_no_box_0 = data_box_0.loc[:, step_no_title_mod]
-    iter_no_box_0 = list(iter_no_box_0)
-    iter_no_box_0 = np.transpose(iter_no_box_0)
-
-    pressure_box_0 = data_box_0.loc[:, blk_file_reading_column_no_pressure_title]
-    pressure_box_0 = list(pressure_box_0)
-    pressure_box_0 = np.transpose(pressure_box_0)
-    pressure_box_0_mean = np.nanmean(pressure_box_0)
-
-    total_molecules_box_0 = data_box_0.loc[:, blk_file_reading_column_total_molecules_title]
-    total_molecules_box_0 = list(total_molecules_box_0)
-    total_molecules_box_0 = np.transpose(total_molecules_box_0)
-    total_molecules_box_0_mean = np.nanmean(total_molecules_box_0)
-
-    Rho_box_0 = data_box_0.loc[:, blk_file_reading_column_Rho_title]
-    Rho_box_0 = list(Rho_box_0)
-    Rho_box_0 = np.transpose(Rho_box_0)
-    Rho_box_0_mean = np.nanmean(Rho_box_0)
-
-    volume_box_0 = data_box_0.loc[:, blk_file_reading_column_box_volume_title]
-    volume_box_0 = list(volume_box_0)
-    volume_box_0 = np.transpose(volume_box_0)
-    volume_box_0_mean = np.nanmean(volume_box_0)
+    pressure_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_no_pressure_title])
+    total_molecules_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_total_molecules_title])
+    Rho_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_Rho_title])
+    volume_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_box_volume_title])
     length_if_cube_box_0_mean = (volume_box_0_mean) ** (1 / 3)
-
-    Hv_box_0 = data_box_0.loc[:, blk_file_reading_column_box_Hv_title]
-    Hv_box_0 = list(Hv_box_0)
-    Hv_box_0 = np.transpose(Hv_box_0)
-    Hv_box_0_mean = np.nanmean(Hv_box_0)
-
-    Z_box_0 = data_box_0.loc[:, blk_file_reading_column_box_Z_title]
-    Z_box_0 = list(Z_box_0)
-    Z_box_0 = np.transpose(Z_box_0)
-    Z_box_0_mean = np.nanmean(Z_box_0)
+    Hv_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_box_Hv_title])
+    Z_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_box_Z_title])
 
     # *************************
     # drawing in data from single file and extracting specific rows for the liquid box (end)
@@ -1161,50 +5007,29 @@ def part_5a_analysis_individual_simulation_averages(job):
     # *************************
     # drawing in data from single file and extracting specific rows for the vapor box (start)
     # *************************
-    data_box_1 = pd.read_csv(reading_file_box_1, sep='\s+', header=0, na_values='NaN', index_col=False)
-    data_box_1 = pd.DataFrame(data_box_1)
+    data_box_1 = load_blk_file(reading_file_box_1)
+    data_box_1 = data_box_1[
+        (data_box_1[step_no_title_mod] >= step_start) & (data_box_1[step_no_title_mod] <= step_finish)
+    ]
+    step_start_box_1 = step_start
+    property_start_step_box_1_dict = {}
+    if equilibration_detection_method is not None:
+        step_start_box_1, property_start_step_box_1_dict = detect_production_start_step(
+            data_box_1,
+            equilibration_detection_blk_column_title_list,
+            method=equilibration_detection_method,
+            min_no_samples=equilibration_detection_min_no_samples,
+        )
+        step_start_box_1 = max(step_start, step_start_box_1)
+        data_box_1 = data_box_1[data_box_1[step_no_title_mod] >= step_start_box_1]
 
-    step_no_title_mod = blk_file_reading_column_no_step_title[1:]
-    header_list = list(data_box_1.columns)
-    header_list[0] = step_no_title_mod
-    data_box_1.columns = header_list
-
-    data_box_1 = data_box_1.query(step_start_string + ' <= ' + step_no_title_mod + ' <= ' + step_finish_string)
-
-    iter_no_box_1 = data_box_1.loc[:, step_no_title_mod]
-    iter_no_box_1 = list(iter_no_box_1)
-    iter_no_box_1 = np.nanmean(iter_no_box_1)
-
-    pressure_box_1 = data_box_1.loc[:, blk_file_reading_column_no_pressure_title]
-    pressure_box_1 = list(pressure_box_1)
-    pressure_box_1 = np.transpose(pressure_box_1)
-    pressure_box_1_mean = np.nanmean(pressure_box_1)
-
-    total_molecules_box_1 = data_box_1.loc[:, blk_file_reading_column_total_molecules_title]
-    total_molecules_box_1 = list(total_molecules_box_1)
-    total_molecules_box_1 = np.transpose(total_molecules_box_1)
-    total_molecules_box_1_mean = np.nanmean(total_molecules_box_1)
-
-    Rho_box_1 = data_box_1.loc[:, blk_file_reading_column_Rho_title]
-    Rho_box_1 = list(Rho_box_1)
-    Rho_box_1 = np.transpose(Rho_box_1)
-    Rho_box_1_mean = np.nanmean(Rho_box_1)
-
-    volume_box_1 = data_box_1.loc[:, blk_file_reading_column_box_volume_title]
-    volume_box_1 = list(volume_box_1)
-    volume_box_1 = np.transpose(volume_box_1)
-    volume_box_1_mean = np.nanmean(volume_box_1)
+    pressure_box_1_mean = np.nanmean(data_box_1[blk_file_reading_column_no_pressure_title])
+    total_molecules_box_1_mean = np.nanmean(data_box_1[blk_file_reading_column_total_molecules_title])
+    Rho_box_1_mean = np.nanmean(data_box_1[blk_file_reading_column_Rho_title])
+    volume_box_1_mean = np.nanmean(data_box_1[blk_file_reading_column_box_volume_title])
     length_if_cube_box_1_mean = (volume_box_1_mean) ** (1 / 3)
-
-    Hv_box_1 = data_box_1.loc[:, blk_file_reading_column_box_Hv_title]
-    Hv_box_1 = list(Hv_box_1)
-    Hv_box_1 = np.transpose(Hv_box_1)
-    Hv_box_1_mean = np.nanmean(Hv_box_1)
-
-    Z_box_1 = data_box_1.loc[:, blk_file_reading_column_box_Z_title]
-    Z_box_1 = list(Z_box_1)
-    Z_box_1 = np.transpose(Z_box_1)
-    Z_box_1_mean = np.nanmean(Z_box_1)
+    Hv_box_1_mean = np.nanmean(data_box_1[blk_file_reading_column_box_Hv_title])
+    Z_box_1_mean = np.nanmean(data_box_1[blk_file_reading_column_box_Z_title])
 
     # sort boxes based on density to liquid or vapor
     if (Rho_box_0_mean > Rho_box_1_mean) or (Rho_box_0_mean == Rho_box_1_mean):
@@ -1245,7 +5070,7 @@ def part_5a_analysis_individual_simulation_averages(job):
     # drawing in data from single file and extracting specific rows for the vapor box (end)
     # *************************
 
-    box_liq_replicate_data_txt_file = open(output_replicate_txt_file_name_liq, "w")
+    box_liq_replicate_data_txt_file = open(job.fn(output_replicate_txt_file_name_liq), "w")
     box_liq_replicate_data_txt_file.write(
         f"{output_column_temp_title: <30} "
         f"{output_column_no_pressure_title: <30} "
@@ -1269,7 +5094,7 @@ def part_5a_analysis_individual_simulation_averages(job):
         f" \n"
     )
 
-    box_vap_replicate_data_txt_file = open(output_replicate_txt_file_name_vap, "w")
+    box_vap_replicate_data_txt_file = open(job.fn(output_replicate_txt_file_name_vap), "w")
     box_vap_replicate_data_txt_file.write(
         f"{output_column_temp_title: <30} "
         f"{output_column_no_pressure_title: <30} "
@@ -1296,11 +5121,100 @@ def part_5a_analysis_individual_simulation_averages(job):
     box_liq_replicate_data_txt_file.close()
     box_vap_replicate_data_txt_file.close()
 
+    # write the production start steps used, so the equilibration steps can be set from them
+    job.doc.equilibration_detection = {
+        "method": equilibration_detection_method,
+        "production_start_step_box_0": int(step_start_box_0),
+        "production_start_step_box_1": int(step_start_box_1),
+        "property_start_step_box_0": property_start_step_box_0_dict,
+        "property_start_step_box_1": property_start_step_box_1_dict,
+        "no_production_samples_box_0": len(data_box_0),
+        "no_production_samples_box_1": len(data_box_1),
+    }
 
     # ***********************
     # calc the avg data from the liq and vap boxes (end)
     # ***********************
 
+
+def timed_write_individual_simulation_averages(job_id):
+    """Write the individual simulation averages for the job id, returning the run time and any error."""
+    # the job is opened by its id, as the FlowProject jobs can not be pickled for the process pool
+    start_time_s = time.perf_counter()
+    try:
+        write_individual_simulation_averages(signac.get_project(project_directory_path).open_job(id=job_id))
+        error_str = None
+    except Exception as error:
+        error_str = f"{type(error).__name__}: {error}"
+
+    return job_id, time.perf_counter() - start_time_s, error_str
+
+
+def part_5a_bulk_analysis_jobs_eligible(*jobs):
+    """Check if any job is ready for the individual simulation averages."""
+    return any(
+        part_4b_job_production_run_completed_properly(job)
+        and not part_5a_analysis_individual_simulation_averages_completed(job)
+        for job in jobs
+    )
+
+
+def part_5a_bulk_analysis_jobs_completed(*jobs):
+    """Check if all the jobs with a completed production run have the individual simulation averages."""
+    return not part_5a_bulk_analysis_jobs_eligible(*jobs)
+
+
+@Project.pre(bulk_analysis_used)
+@Project.pre(part_5a_bulk_analysis_jobs_eligible)
+@Project.post(part_5a_bulk_analysis_jobs_completed)
+@Project.operation(directives=
+     {
+         "np": bulk_analysis_no_processes,
+         "ngpu": 0,
+         "memory": memory_needed,
+         "walltime": walltime_gomc_analysis_hr,
+     }, aggregator=aggregator(all_jobs_if_any)
+)
+def part_5a_bulk_analysis_individual_simulation_averages(*jobs):
+    """Write the individual simulation averages for all the ready jobs, in one process pool."""
+    eligible_job_list = [
+        job for job in jobs
+        if part_4b_job_production_run_completed_properly(job)
+        and not part_5a_analysis_individual_simulation_averages_completed(job)
+    ]
+
+    # remove the total averged replicate data and all analysis data after this,
+    # as it is no longer valid when adding more simulations
+    remove_replica_and_critical_analysis_files(eligible_job_list)
+
+    print(f"Running the individual simulation averages for {len(eligible_job_list)} jobs, "
+          f"with {bulk_analysis_no_processes} processes")
+    start_time_s = time.perf_counter()
+    failed_job_error_dict = {}
+    with ProcessPoolExecutor(max_workers=bulk_analysis_no_processes) as executor:
+        future_to_job_dict = {
+            executor.submit(timed_write_individual_simulation_averages, job.id): job for job in eligible_job_list
+        }
+        for future in as_completed(future_to_job_dict):
+            job = future_to_job_dict[future]
+            job_id, job_time_s, error_str = future.result()
+            if error_str is None:
+                add_job_to_analysis_registry(job)
+                print(f"job id {job.id} (T = {job.sp.production_temperature_K} K, "
+                      f"replica = {job.sp.replica_number_int}): {job_time_s:.3f} s")
+            else:
+                failed_job_error_dict[job.id] = error_str
+                print(f"job id {job.id} FAILED after {job_time_s:.3f} s: {error_str}")
+
+    print(f"Completed: the individual simulation averages for "
+          f"{len(eligible_job_list) - len(failed_job_error_dict)} of {len(eligible_job_list)} jobs "
+          f"in {time.perf_counter() - start_time_s:.3f} s")
+
+    if len(failed_job_error_dict) > 0:
+        raise RuntimeError(
+            f"The individual simulation averages failed for these job ids: {failed_job_error_dict}"
+        )
+
 # ******************************************************
 # ******************************************************
 # data analysis - get the average data from each replicate (end)
@@ -1314,8 +5228,7 @@ def part_5a_analysis_individual_simulation_averages(job):
 # ******************************************************
 # ******************************************************
 
-@Project.pre(lambda *jobs: all(part_5a_analysis_individual_simulation_averages_completed(j)
-                               for j in jobs[0]._project))
+@Project.pre(part_5a_analysis_replica_group_completed)
 @Project.post(part_5b_analysis_replica_averages_completed)
 @Project.operation(directives=
      {
@@ -1323,7 +5236,7 @@ def part_5a_analysis_individual_simulation_averages(job):
          "ngpu": 0,
          "memory": memory_needed,
          "walltime": walltime_gomc_analysis_hr,
-     }, aggregator=aggregator.groupby(key=statepoint_without_replica, sort_by="production_temperature_K", sort_ascending=False)
+     }, aggregator=aggregator.groupby(key=statepoint_without_replica, sort_by="production_temperature_K", sort_ascending=False, select=production_analysis_job)
 )
 def part_5b_analysis_replica_averages(*jobs):
     # ***************************************************
@@ -1548,6 +5461,17 @@ def part_5b_analysis_replica_averages(*jobs):
         f"{Z_std_box_vap: <30} "
         f" \n"
     )
+
+    box_liq_data_txt_file.close()
+    box_vap_data_txt_file.close()
+
+    # add the replica group to the project analysis registry
+    analysis_registry = jobs[0].project.doc.setdefault(
+        "analysis_registry", {"individual_averages": {}, "replica_averages": []}
+    )
+    replica_averages_group_key_list = analysis_registry.setdefault("replica_averages", [])
+    if replica_group_key(jobs[0]) not in replica_averages_group_key_list:
+        replica_averages_group_key_list.append(replica_group_key(jobs[0]))
     # ************************************
     # write the analysis data files for the liquid and vapor boxes (end)
     # ************************************
@@ -1567,7 +5491,7 @@ def part_5b_analysis_replica_averages(*jobs):
 
 @Project.pre(
      lambda * jobs: all(
-         gomc_sim_completed_properly(job, gomc_production_control_file_name_str)
+         part_4b_job_production_run_completed_properly(job)
          for job in jobs
      )
 )
@@ -1580,7 +5504,7 @@ def part_5b_analysis_replica_averages(*jobs):
          "ngpu": 0,
          "memory": memory_needed,
          "walltime": walltime_gomc_analysis_hr,
-     }, aggregator=aggregator.groupby(key=statepoint_without_temperature, sort_by="production_temperature_K", sort_ascending=True)
+     }, aggregator=aggregator.groupby(key=statepoint_without_temperature, sort_by="production_temperature_K", sort_ascending=True, select=production_analysis_job)
 )
 def part_5c_analysis_critical_and_boiling__points_replicate_data(*jobs):
     # ***************************************************
@@ -1943,7 +5867,7 @@ def part_5c_analysis_critical_and_boiling__points_replicate_data(*jobs):
          "ngpu": 0,
          "memory": memory_needed,
          "walltime": walltime_gomc_analysis_hr,
-     }, aggregator=aggregator.groupby(key=statepoint_without_temperature, sort_by="production_temperature_K", sort_ascending=True)
+     }, aggregator=aggregator.groupby(key=statepoint_without_temperature, sort_by="production_temperature_K", sort_ascending=True, select=production_analysis_job)
 )
 
 def part_5d_analysis_critical_and_boiling_points_avg_std_data(*jobs):
@@ -2216,6 +6140,134 @@ def part_5d_analysis_critical_and_boiling_points_avg_std_data(*jobs):
 # ******************************************************
 
 
+# ******************************************************
+# ******************************************************
+# data analysis - electrostatics scheme benchmark Pareto table (start)
+# ******************************************************
+# ******************************************************
+def get_electrostatics_benchmark_jobs(jobs):
+    """Get the electrostatics benchmark jobs (see init_electrostatics_benchmark.py) of the jobs."""
+    return [job for job in jobs if "electrostatics_scheme" in job.sp]
+
+
+def part_6_electrostatics_benchmark_jobs_analyzed(*jobs):
+    """Check that all the electrostatics benchmark jobs have their averages and production run timing."""
+    benchmark_jobs = get_electrostatics_benchmark_jobs(jobs)
+    return len(benchmark_jobs) > 0 and all(
+        part_5a_analysis_individual_simulation_averages_completed(job) and "production_run_timing" in job.doc
+        for job in benchmark_jobs
+    )
+
+
+def part_6_electrostatics_benchmark_pareto_table_written(*jobs):
+    """Check that the electrostatics benchmark Pareto table is written."""
+    return os.path.isfile(os.path.join(project_directory_path, "analysis", output_electrostatics_benchmark_txt_file_name))
+
+
+def get_liquid_box_energy_per_molecule(job):
+    """Get the production liquid (higher density) box's average energy per molecule, after the equilibration."""
+    box_mean_list = []
+    for box_no in [0, 1]:
+        blk_data = load_blk_file(job.fn(f"Blk_{gomc_production_output_name_str}_BOX_{box_no}.dat"))
+        production_start_step = job.doc.get("equilibration_detection", {}).get(
+            f"production_start_step_box_{box_no}", 0
+        )
+        blk_data = blk_data[blk_data["STEP"] >= production_start_step]
+        box_mean_list.append([
+            np.nanmean(blk_data["TOT_DENS"]), np.nanmean(blk_data["TOT_EN"]) / np.nanmean(blk_data["TOT_MOL"])
+        ])
+
+    return max(box_mean_list)[1]
+
+
+@Project.pre(part_6_electrostatics_benchmark_jobs_analyzed)
+@Project.post(part_6_electrostatics_benchmark_pareto_table_written)
+@Project.operation(directives=
+     {
+         "np": 1,
+         "ngpu": 0,
+         "memory": memory_needed,
+         "walltime": walltime_gomc_analysis_hr,
+     }, aggregator=aggregator(all_jobs_if_any)
+)
+def part_6_electrostatics_benchmark_pareto_table(*jobs):
+    """Write the electrostatics scheme speed and deviations from EWALD for each temperature, with the Pareto front."""
+    benchmark_row_list = []
+    for job in get_electrostatics_benchmark_jobs(jobs):
+        data_box_liq = pd.read_csv(job.fn(output_replicate_txt_file_name_liq), sep='\s+', header=0, index_col=False)
+        data_box_vap = pd.read_csv(job.fn(output_replicate_txt_file_name_vap), sep='\s+', header=0, index_col=False)
+        benchmark_row_list.append({
+            "temp_K": job.sp.production_temperature_K,
+            "scheme": get_electrostatics_scheme(job),
+            "steps_per_s": job.doc.production_run_timing["steps_per_s"],
+            "E_per_mol_liq_K": get_liquid_box_energy_per_molecule(job),
+            "Rho_liq_kg_per_m_cubed": data_box_liq.loc[:, "Rho_kg_per_m_cubed"][0],
+            "Rho_vap_kg_per_m_cubed": data_box_vap.loc[:, "Rho_kg_per_m_cubed"][0],
+        })
+
+    # the replicas are averaged, and compared to the EWALD scheme at the same temperature
+    benchmark_data = pd.DataFrame(benchmark_row_list).groupby(["temp_K", "scheme"], as_index=False).mean()
+    output_row_list = []
+    for temp_K, temp_data in benchmark_data.groupby("temp_K"):
+        ewald_data = temp_data[temp_data["scheme"] == "EWALD"]
+        if len(ewald_data) == 0:
+            print(f"The EWALD benchmark job is missing at {temp_K} K, so the deviations can not be calculated.")
+            continue
+        ewald_data = ewald_data.iloc[0]
+
+        temp_row_list = []
+        for _, scheme_data in temp_data.iterrows():
+            relative_energy_deviation = abs(scheme_data["E_per_mol_liq_K"] / ewald_data["E_per_mol_liq_K"] - 1)
+            relative_rho_liq_deviation = abs(
+                scheme_data["Rho_liq_kg_per_m_cubed"] / ewald_data["Rho_liq_kg_per_m_cubed"] - 1
+            )
+            relative_rho_vap_deviation = abs(
+                scheme_data["Rho_vap_kg_per_m_cubed"] / ewald_data["Rho_vap_kg_per_m_cubed"] - 1
+            )
+            temp_row_list.append({
+                "temp_K": temp_K,
+                "scheme": scheme_data["scheme"],
+                "steps_per_s": scheme_data["steps_per_s"],
+                "speedup_vs_EWALD": scheme_data["steps_per_s"] / ewald_data["steps_per_s"],
+                "rel_E_dev": relative_energy_deviation,
+                "rel_Rho_liq_dev": relative_rho_liq_deviation,
+                "rel_Rho_vap_dev": relative_rho_vap_deviation,
+                "max_rel_dev": max(relative_energy_deviation, relative_rho_liq_deviation, relative_rho_vap_deviation),
+                "acceptable": relative_energy_deviation <= electrostatics_benchmark_max_relative_energy_deviation
+                and max(relative_rho_liq_deviation, relative_rho_vap_deviation)
+                <= electrostatics_benchmark_max_relative_density_deviation,
+            })
+
+        # Pareto optimal: no other scheme is at least as fast and as accurate, and better in one of them
+        for row in temp_row_list:
+            row["pareto_optimal"] = not any(
+                other_row["steps_per_s"] >= row["steps_per_s"] and other_row["max_rel_dev"] <= row["max_rel_dev"]
+                and (other_row["steps_per_s"] > row["steps_per_s"] or other_row["max_rel_dev"] < row["max_rel_dev"])
+                for other_row in temp_row_list
+            )
+        acceptable_row_list = [row for row in temp_row_list if row["acceptable"]]
+        cheapest_acceptable_scheme = max(acceptable_row_list, key=lambda row: row["steps_per_s"])["scheme"] \
+            if len(acceptable_row_list) > 0 else None
+        for row in temp_row_list:
+            row["cheapest_acceptable"] = row["scheme"] == cheapest_acceptable_scheme
+        output_row_list += sorted(temp_row_list, key=lambda row: -row["steps_per_s"])
+
+    output_column_title_list = [
+        "temp_K", "scheme", "steps_per_s", "speedup_vs_EWALD", "rel_E_dev", "rel_Rho_liq_dev", "rel_Rho_vap_dev",
+        "max_rel_dev", "acceptable", "pareto_optimal", "cheapest_acceptable",
+    ]
+    with open(f"analysis/{output_electrostatics_benchmark_txt_file_name}", "w") as benchmark_txt_file:
+        benchmark_txt_file.write("".join(f"{title: <30} " for title in output_column_title_list) + " \n")
+        for row in output_row_list:
+            benchmark_txt_file.write("".join(f"{str(row[title]): <30} " for title in output_column_title_list) + " \n")
+
+# ******************************************************
+# ******************************************************
+# data analysis - electrostatics scheme benchmark Pareto table (end)
+# ******************************************************
+# ******************************************************
+
+
 
 
 
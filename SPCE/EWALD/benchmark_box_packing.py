@@ -0,0 +1,91 @@
+"""Benchmark the lattice box packer against mb.fill_box (packmol)."""
+# Run from this project directory:
+# python benchmark_box_packing.py
+
+import os
+import time
+
+import mbuild as mb
+import numpy as np
+
+from GEMC import box_packing_overlap_nm, get_overlapping_molecules, lattice_pack_box_coordinates
+
+# ******************************************************
+# users typical variables (start)
+# ******************************************************
+# the number of molecules in each benchmark box, at the liquid density below
+benchmark_no_molecules_list = [1000, 10000, 100000]
+benchmark_liquid_density_molecules_per_nm_cubed = 970 / 3.1 ** 3
+
+# packmol is run for all the benchmark boxes, so it is compared with the lattice packer at 100k molecules.
+# packmol can take hours for the largest boxes, so it can be capped at a smaller number of molecules here,
+# but then the largest boxes are only timed with the lattice packer (None = no cap).
+packmol_max_no_molecules = None
+
+benchmark_output_txt_file_name = "analysis/box_packing_benchmark.txt"
+# ******************************************************
+# users typical variables (end)
+# ******************************************************
+
+
+molecule_A = mb.load('SPCE.mol2')
+molecule_A.name = 'WAT'
+molecule_coordinates = molecule_A.xyz
+rng = np.random.default_rng(0)
+
+benchmark_row_list = []
+for no_molecules in benchmark_no_molecules_list:
+    box_length_nm = (no_molecules / benchmark_liquid_density_molecules_per_nm_cubed) ** (1 / 3)
+    atom_molecule_index_array = np.repeat(np.arange(no_molecules), len(molecule_coordinates))
+
+    start_time_s = time.perf_counter()
+    lattice_coordinates = lattice_pack_box_coordinates(
+        molecule_coordinates, no_molecules, box_length_nm, box_packing_overlap_nm, rng
+    )
+    lattice_time_s = time.perf_counter() - start_time_s
+    lattice_no_overlaps = np.nan if lattice_coordinates is None else len(get_overlapping_molecules(
+        lattice_coordinates, atom_molecule_index_array, box_length_nm, box_packing_overlap_nm
+    ))
+
+    packmol_time_s = np.nan
+    packmol_no_overlaps = np.nan
+    if packmol_max_no_molecules is None or no_molecules <= packmol_max_no_molecules:
+        start_time_s = time.perf_counter()
+        packmol_box = mb.fill_box(compound=[molecule_A],
+                                  n_compounds=no_molecules,
+                                  box=[box_length_nm, box_length_nm, box_length_nm]
+                                  )
+        packmol_time_s = time.perf_counter() - start_time_s
+        packmol_no_overlaps = len(get_overlapping_molecules(
+            packmol_box.xyz, atom_molecule_index_array, box_length_nm, box_packing_overlap_nm
+        ))
+    else:
+        print(f"WARNING: packmol is not run for N = {no_molecules}, as it is more than the "
+              f"packmol_max_no_molecules = {packmol_max_no_molecules}, so there is no packmol comparison "
+              f"for this box.")
+
+    benchmark_row_list.append(
+        [no_molecules, box_length_nm, lattice_time_s, lattice_no_overlaps, packmol_time_s, packmol_no_overlaps]
+    )
+    print(f"N = {no_molecules}: lattice = {lattice_time_s:.3f} s, packmol = {packmol_time_s:.3f} s")
+
+
+os.makedirs(os.path.dirname(benchmark_output_txt_file_name), exist_ok=True)
+with open(benchmark_output_txt_file_name, "w") as benchmark_txt_file:
+    benchmark_txt_file.write(
+        f"# packmol_max_no_molecules = {packmol_max_no_molecules} "
+        f"(the packmol columns are nan for the boxes with more molecules)\n"
+    )
+    benchmark_txt_file.write(
+        f"{'No_mol': <30} "
+        f"{'L_nm': <30} "
+        f"{'lattice_time_s': <30} "
+        f"{'lattice_overlapping_mol': <30} "
+        f"{'packmol_time_s': <30} "
+        f"{'packmol_overlapping_mol': <30} "
+        f" \n"
+    )
+    for benchmark_row in benchmark_row_list:
+        benchmark_txt_file.write("".join(f"{value: <30} " for value in benchmark_row) + " \n")
+
+print(f"Completed: the box packing benchmark is written to {benchmark_output_txt_file_name}")
@@ -0,0 +1,53 @@
+"""Initialize signac statepoints for the electrostatics scheme benchmark."""
+
+import os
+import numpy as np
+import signac
+import unyt as u
+
+from GEMC import electrostatics_scheme_control_keywords_dict
+
+# *******************************************
+# the main user varying state points (start)
+# *******************************************
+
+project=signac.init_project()
+#project=signac.get_project()
+# the same SPC/E state points are run with each electrostatics scheme, for a fixed short number of steps
+production_temperatures = [300, 450, 575] * u.K
+
+electrostatics_schemes = list(electrostatics_scheme_control_keywords_dict.keys())
+
+replicas = [0]
+
+# the GOMC steps of both the equilibration and production runs of each benchmark job
+benchmark_gomc_steps = 1000000
+
+# *******************************************
+# the main user varying state points (end)
+# *******************************************
+
+
+print("os.getcwd() = " +str(os.getcwd()))
+
+pr_root = os.getcwd()
+pr = signac.get_project(pr_root)
+
+# filter the list of dictionaries
+total_statepoints = list()
+
+for prod_temp_i in production_temperatures:
+    for electrostatics_scheme_i in electrostatics_schemes:
+        for replica_i in replicas:
+            statepoint = {
+                "production_temperature_K": np.round(prod_temp_i.to_value("K"), ).item(),
+                "replica_number_int": replica_i,
+                "electrostatics_scheme": electrostatics_scheme_i,
+                "benchmark_gomc_steps": benchmark_gomc_steps,
+            }
+            total_statepoints.append(statepoint)
+
+for sp in total_statepoints:
+    pr.open_job(
+        statepoint=sp,
+    ).init()
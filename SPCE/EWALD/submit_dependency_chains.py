@@ -0,0 +1,251 @@
+"""Submit the whole workflow in one pass, as SLURM jobs chained with afterok dependencies."""
+# Run from this project directory, on the cluster login node:
+# python submit_dependency_chains.py
+# python submit_dependency_chains.py --pretend
+#
+# Each job's operations are submitted in workflow order, each SLURM job depending on the last one
+# (--dependency=afterok), starting at the job's first operation which is not completed.
+# The part_5b, part_5c and part_5d groupby operations are submitted once per aggregate, depending on
+# the last SLURM jobs of all their jobs, so the whole workflow progresses without running submit again.
+# Each SLURM job runs 'python GEMC.py run -o <operation> -j <id>', so the operation is only run if it
+# is still eligible when the SLURM job starts.  If a SLURM job fails, its dependent SLURM jobs are cancelled.
+# Note: the directives (np, ngpu, walltime, ...) are evaluated at submission, so with the GOMC launch
+# autotuning (part_2e) the chains stop after it, and this script is run again once it is completed,
+# to submit the GOMC runs with the autotuned gomc_ncpu and binary.
+# Note: this script is not run while any of the project's operations are queued or running (e.g., from a
+# previous run of this script, or 'python GEMC.py submit'), as their later operations would be submitted
+# without depending on them.  It is run again, once they are completed (or cancelled with scancel).
+# Note: it uses flow's (0.29) private submission functions, so signac-flow is pinned in envs/mosdef-gomc.yml.
+
+import argparse
+import subprocess
+
+from flow import IgnoreConditions
+from flow.scheduling.base import JobStatus
+
+from GEMC import (
+    Project,
+    autotune_electrostatics,
+    autotune_gomc_launch,
+    autotune_move_mix,
+    get_equilb_parent_job,
+    gomc_run_no_segments,
+    part_1a_initial_data_input_to_json,
+    part_4a_equilb_run_by_this_job,
+    production_convergence_max_no_extensions,
+    production_convergence_relative_tolerance_dict,
+    use_bulk_analysis,
+    use_bulk_build,
+    use_node_bundle,
+)
+
+# ******************************************************
+# users typical variables (start)
+# ******************************************************
+# the operations of each job, in workflow order, and the number of times each is submitted
+# (the GOMC runs are submitted once per segment, see gomc_run_no_segments, and the production run once
+# per convergence extension segment, which is not run if the production run is already converged)
+job_operation_chain_list = [
+    ("build_psf_pdb_ff_gomc_conf", 1),
+    ("part_2d_autotune_electrostatics", 1 if autotune_electrostatics else 0),
+    ("part_2e_autotune_gomc_launch", 1 if autotune_gomc_launch else 0),
+    ("part_2c_regenerate_gomc_control_files", 1 if autotune_electrostatics or autotune_gomc_launch else 0),
+    ("run_equilb_ensemble_gomc_command", gomc_run_no_segments),
+    ("branch_equilb_from_parent_job", 1),
+    ("part_4c_autotune_move_mix", 1 if autotune_move_mix else 0),
+    ("part_2c_regenerate_gomc_control_files", 1 if autotune_move_mix else 0),
+    ("run_production_run_gomc_command", gomc_run_no_segments + (
+        production_convergence_max_no_extensions if production_convergence_relative_tolerance_dict is not None else 0
+    )),
+    ("part_5a_analysis_individual_simulation_averages", 1),
+]
+
+# the groupby operations, in workflow order, which join the jobs' chains
+aggregate_operation_chain_list = [
+    "part_5b_analysis_replica_averages",
+    "part_5c_analysis_critical_and_boiling__points_replicate_data",
+    "part_5d_analysis_critical_and_boiling_points_avg_std_data",
+]
+
+# the operation each job's chain stops after, as the later operations' directives depend on it
+# (the GOMC launch autotuning sets the GOMC runs' np and ngpu), or None to chain the whole workflow
+chain_stop_after_operation_name_str = "part_2e_autotune_gomc_launch" if autotune_gomc_launch else None
+# ******************************************************
+# users typical variables (end)
+# ******************************************************
+
+
+# *************************************************
+# The python arguments (start)
+# *************************************************
+def _get_args():
+    arg_parser = argparse.ArgumentParser()
+
+    arg_parser.add_argument(
+        "--pretend",
+        help="Print the submission scripts and dependencies, without submitting them.",
+        action="store_true",
+    )
+    arg_parser.add_argument(
+        "--flags",
+        help="Additional flags passed to each sbatch command (e.g., --flags=--account=my_account).",
+        nargs="*",
+        default=[],
+        type=str,
+    )
+
+    return arg_parser.parse_args()
+# *************************************************
+# The python arguments (end)
+# *************************************************
+
+
+def get_submission_operations_dict(project, operation_name_str_list):
+    """Get the submission operations of each aggregate of the operations by name, and the scheduler ids of all
+    the project's operations which are queued or running.
+
+    The scheduler is queried once for all the operations, as flow only allows a query every few seconds.
+    """
+    submission_operations_dict = {operation_name_str: [] for operation_name_str in operation_name_str_list}
+    active_scheduler_id_list = []
+    default_directives = project._get_default_directives()
+    # flow's (0.29) scheduler ids (the SLURM job names) of the project's operations and aggregates
+    for scheduler_id, scheduler_status, _, aggregate, group in project._generate_selected_aggregate_groups_with_status(
+        scheduler_info=project._query_scheduler_status(),
+        selected_groups=list(project.groups.values()),
+    ):
+        if scheduler_status >= JobStatus.submitted:
+            active_scheduler_id_list.append(scheduler_id)
+        elif group.name in submission_operations_dict:
+            # the conditions are only checked when the SLURM job runs
+            submission_operations_dict[group.name].append(group._create_submission_job_operation(
+                entrypoint=project._entrypoint,
+                default_directives=default_directives,
+                jobs=aggregate,
+                ignore_conditions_on_execution=IgnoreConditions.NONE,
+            ))
+
+    return submission_operations_dict, active_scheduler_id_list
+
+
+def operation_used_by_job(operation_name_str, job):
+    """Check if the job uses the operation, as the equilb is either run by the job or branched from its parent."""
+    if operation_name_str == "run_equilb_ensemble_gomc_command":
+        return part_4a_equilb_run_by_this_job(job)
+    if operation_name_str == "branch_equilb_from_parent_job":
+        return not part_4a_equilb_run_by_this_job(job)
+
+    return True
+
+
+def submit_operation(project, operation, dependency_slurm_id_list, args, pretend_slurm_id_list):
+    """Submit the operation's script with sbatch, after its dependencies, and get its SLURM job id."""
+    script = project._generate_submit_script(
+        _id=operation.id,
+        operations=[operation],
+        template="script.sh",
+        show_template_help=False,
+        parallel=False,
+        force=False,
+    )
+    submit_command = ["sbatch", "--parsable"] + args.flags
+    if len(dependency_slurm_id_list) > 0:
+        submit_command += [
+            f"--dependency=afterok:{':'.join(sorted(set(dependency_slurm_id_list)))}",
+            "--kill-on-invalid-dep=yes",
+        ]
+
+    if args.pretend:
+        pretend_slurm_id_list.append(f"pretend_{len(pretend_slurm_id_list)}")
+        print(f"{' '.join(submit_command)}  # {pretend_slurm_id_list[-1]}: {operation}")
+        print(script)
+        return pretend_slurm_id_list[-1]
+
+    slurm_id = subprocess.run(
+        submit_command, input=script, capture_output=True, text=True, check=True
+    ).stdout.strip().split(";")[0]
+    print(f"Submitted SLURM job {slurm_id}: {operation}, after {dependency_slurm_id_list}")
+
+    return slurm_id
+
+
+if __name__ == "__main__":
+    args = _get_args()
+    project = Project()
+
+    # the bulk and node bundle operations replace the per-job operations, so the chained operations would not run
+    if use_bulk_build or use_bulk_analysis or use_node_bundle:
+        raise ValueError(
+            "The dependency chains only submit the per-job operations, so use_bulk_build, use_bulk_analysis "
+            "and use_node_bundle must be False."
+        )
+
+    # the directives of the later operations use the job documents, so they are written first
+    project.run(names=["initial_parameters"])
+
+    # the last SLURM job ids of each job's chain, and of each job's equilb (for the branched replicas)
+    job_last_slurm_id_list_dict = {job.id: [] for job in project}
+    job_equilb_slurm_id_list_dict = {job.id: [] for job in project}
+    job_chain_stopped_id_set = set()
+    pretend_slurm_id_list = []
+
+    submission_operations_dict, active_scheduler_id_list = get_submission_operations_dict(
+        project,
+        [operation_name_str for operation_name_str, no_submissions in job_operation_chain_list if no_submissions > 0]
+        + aggregate_operation_chain_list,
+    )
+    if len(active_scheduler_id_list) > 0:
+        raise ValueError(
+            f"{len(active_scheduler_id_list)} of the project's operations are queued or running, so their later "
+            f"operations can not be chained after them.  Run this script again once they are completed, "
+            f"or cancel them (scancel).  The queued or running operations: {active_scheduler_id_list}"
+        )
+
+    for operation_name_str, no_submissions in job_operation_chain_list:
+        for operation in submission_operations_dict[operation_name_str] if no_submissions > 0 else []:
+            job = operation._jobs[0]
+            if not operation_used_by_job(operation_name_str, job) or not part_1a_initial_data_input_to_json(job) \
+                    or job.id in job_chain_stopped_id_set:
+                continue
+
+            # the job's chain starts at its first operation which is not completed
+            if len(job_last_slurm_id_list_dict[job.id]) == 0 \
+                    and project.operations[operation_name_str]._complete((job,)):
+                continue
+
+            dependency_slurm_id_list = list(job_last_slurm_id_list_dict[job.id])
+            if operation_name_str == "branch_equilb_from_parent_job":
+                dependency_slurm_id_list += job_equilb_slurm_id_list_dict[get_equilb_parent_job(job).id]
+
+            for submission_no in range(no_submissions):
+                dependency_slurm_id_list = [
+                    submit_operation(project, operation, dependency_slurm_id_list, args, pretend_slurm_id_list)
+                ]
+            job_last_slurm_id_list_dict[job.id] = dependency_slurm_id_list
+            if operation_name_str == "run_equilb_ensemble_gomc_command":
+                job_equilb_slurm_id_list_dict[job.id] = dependency_slurm_id_list
+            if operation_name_str == chain_stop_after_operation_name_str:
+                job_chain_stopped_id_set.add(job.id)
+
+    for operation_name_str in aggregate_operation_chain_list:
+        for operation in submission_operations_dict[operation_name_str]:
+            if any(job.id in job_chain_stopped_id_set for job in operation._jobs):
+                continue
+
+            dependency_slurm_id_list = [
+                slurm_id for job in operation._jobs for slurm_id in job_last_slurm_id_list_dict[job.id]
+            ]
+            if len(dependency_slurm_id_list) == 0 and project.operations[operation_name_str]._complete(operation._jobs):
+                continue
+
+            slurm_id = submit_operation(project, operation, dependency_slurm_id_list, args, pretend_slurm_id_list)
+            for job in operation._jobs:
+                job_last_slurm_id_list_dict[job.id] = [slurm_id]
+
+    if len(job_chain_stopped_id_set) > 0:
+        print(
+            f"Completed: the workflow dependency chains are submitted, with {len(job_chain_stopped_id_set)} jobs' "
+            f"chains stopped after {chain_stop_after_operation_name_str}, run this script again once it is completed"
+        )
+    else:
+        print("Completed: the workflow dependency chains are submitted")
@@ -0,0 +1,5 @@
+"""Make the SPCE/EWALD workflow (GEMC.py) importable by the tests."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,78 @@
+"""Tests of the lattice box packer, for the molecule count, the overlaps and the box bounds."""
+import numpy as np
+import pytest
+
+pytest.importorskip("mbuild")
+pytest.importorskip("mosdef_gomc")
+
+import GEMC
+
+# a rigid SPC/E-like water (O, H, H), in nm
+water_coordinates = np.array([
+    [0.0, 0.0, 0.0],
+    [0.1, 0.0, 0.0],
+    [-0.0333, 0.0943, 0.0],
+])
+liquid_density_molecules_per_nm_cubed = 970 / 3.1 ** 3
+
+
+def get_min_intermolecular_distance(coordinates, atom_molecule_index_array, box_length):
+    """Get the minimum image distance between the closest atoms of two different molecules, by brute force."""
+    separations = coordinates[:, np.newaxis, :] - coordinates[np.newaxis, :, :]
+    separations -= box_length * np.round(separations / box_length)
+    distances = np.linalg.norm(separations, axis=2)
+    distances[atom_molecule_index_array[:, np.newaxis] == atom_molecule_index_array[np.newaxis, :]] = np.inf
+
+    return distances.min()
+
+
+@pytest.mark.parametrize("no_molecules", [50, 300])
+def test_lattice_packing_liquid_density(no_molecules):
+    box_length = (no_molecules / liquid_density_molecules_per_nm_cubed) ** (1 / 3)
+    coordinates = GEMC.lattice_pack_box_coordinates(
+        water_coordinates, no_molecules, box_length, GEMC.box_packing_overlap_nm, np.random.default_rng(0)
+    )
+    atom_molecule_index_array = np.repeat(np.arange(no_molecules), len(water_coordinates))
+
+    assert coordinates is not None
+    assert coordinates.shape == (no_molecules * len(water_coordinates), 3)
+    assert get_min_intermolecular_distance(
+        coordinates, atom_molecule_index_array, box_length
+    ) >= GEMC.box_packing_overlap_nm
+    assert len(GEMC.get_overlapping_molecules(
+        coordinates, atom_molecule_index_array, box_length, GEMC.box_packing_overlap_nm
+    )) == 0
+    assert np.all((coordinates > -GEMC.box_packing_overlap_nm) & (coordinates < box_length + GEMC.box_packing_overlap_nm))
+
+
+def test_lattice_packing_keeps_molecules_rigid():
+    no_molecules = 100
+    box_length = (no_molecules / liquid_density_molecules_per_nm_cubed) ** (1 / 3)
+    coordinates = GEMC.lattice_pack_box_coordinates(
+        water_coordinates, no_molecules, box_length, GEMC.box_packing_overlap_nm, np.random.default_rng(1)
+    )
+    template_distances = np.linalg.norm(water_coordinates[:, np.newaxis] - water_coordinates[np.newaxis], axis=2)
+    for molecule_coordinates in coordinates.reshape(no_molecules, len(water_coordinates), 3):
+        molecule_distances = np.linalg.norm(molecule_coordinates[:, np.newaxis] - molecule_coordinates[np.newaxis], axis=2)
+        assert np.allclose(molecule_distances, template_distances)
+
+
+def test_overlapping_molecules_found():
+    box_length = 2.0
+    coordinates = np.concatenate([water_coordinates, water_coordinates + [0.1, 0.0, 0.0],
+                                  water_coordinates + [1.0, 1.0, 1.0]])
+    atom_molecule_index_array = np.repeat(np.arange(3), len(water_coordinates))
+
+    assert list(GEMC.get_overlapping_molecules(
+        coordinates, atom_molecule_index_array, box_length, GEMC.box_packing_overlap_nm
+    )) == [1]
+
+
+def test_overlapping_molecules_found_across_the_periodic_boundary():
+    box_length = 2.0
+    coordinates = np.concatenate([water_coordinates + [0.02, 1.0, 1.0], water_coordinates + [1.95, 1.0, 1.0]])
+    atom_molecule_index_array = np.repeat(np.arange(2), len(water_coordinates))
+
+    assert list(GEMC.get_overlapping_molecules(
+        coordinates, atom_molecule_index_array, box_length, GEMC.box_packing_overlap_nm
+    )) == [1]
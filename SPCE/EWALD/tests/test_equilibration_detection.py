@@ -0,0 +1,103 @@
+"""Tests of the statistical inefficiency and the automatic equilibration detection (MSER and max_neff)."""
+import numpy as np
+import pytest
+
+pytest.importorskip("mbuild")
+pytest.importorskip("mosdef_gomc")
+
+import GEMC
+
+
+def get_ar1_series(no_samples, phi, seed=0):
+    """Get an AR(1) series, with the statistical inefficiency (1 + phi) / (1 - phi)."""
+    random_generator = np.random.default_rng(seed)
+    noise = random_generator.normal(size=no_samples)
+    data_series = np.empty(no_samples)
+    data_series[0] = noise[0]
+    for i in range(1, no_samples):
+        data_series[i] = phi * data_series[i - 1] + noise[i]
+
+    return data_series
+
+
+def get_transient_series(no_samples, no_transient_samples, seed=0):
+    """Get a white noise series, with a decaying offset over its first no_transient_samples."""
+    random_generator = np.random.default_rng(seed)
+    data_series = random_generator.normal(size=no_samples)
+    data_series[:no_transient_samples] += 20 * np.exp(-np.arange(no_transient_samples) / (no_transient_samples / 5))
+
+    return data_series
+
+
+def get_blk_data(step_array, column_dict):
+    """Get a Blk file record array, with the step column first."""
+    blk_data = np.zeros(len(step_array), dtype=[("#STEPS", np.float64)] + [(key, np.float64) for key in column_dict])
+    blk_data["#STEPS"] = step_array
+    for key, value in column_dict.items():
+        blk_data[key] = value
+
+    return blk_data
+
+
+def test_statistical_inefficiency_of_uncorrelated_data():
+    data_series = np.random.default_rng(1).normal(size=20000)
+    assert GEMC.get_statistical_inefficiency(data_series) == pytest.approx(1.0, abs=0.2)
+
+
+def test_statistical_inefficiency_of_ar1_data():
+    phi = 0.9
+    data_series = get_ar1_series(200000, phi)
+    assert GEMC.get_statistical_inefficiency(data_series) == pytest.approx((1 + phi) / (1 - phi), rel=0.15)
+
+
+def test_statistical_inefficiency_of_constant_and_short_data():
+    assert GEMC.get_statistical_inefficiency(np.ones(100)) == 1.0
+    assert GEMC.get_statistical_inefficiency([3.0]) == 1.0
+
+
+def test_mser_finds_the_end_of_the_transient():
+    data_series = get_transient_series(2000, 200)
+    start_index = GEMC.detect_equilibration_mser(data_series)
+    assert 50 <= start_index <= 300
+
+
+def test_mser_only_searches_the_first_half():
+    data_series = np.concatenate([np.zeros(100), np.full(100, 10.0)])
+    assert GEMC.detect_equilibration_mser(data_series) <= len(data_series) // 2
+
+
+def test_max_neff_finds_the_end_of_the_transient():
+    data_series = get_transient_series(2000, 200)
+    start_index = GEMC.detect_equilibration_max_neff(data_series)
+    assert 50 <= start_index <= 400
+
+
+def test_production_start_step_is_the_latest_property_start():
+    no_samples = 2000
+    step_array = 1000 * np.arange(1, no_samples + 1)
+    blk_data = get_blk_data(step_array, {
+        "TOT_EN": get_transient_series(no_samples, 200, seed=2),
+        "TOT_DENS": get_transient_series(no_samples, 600, seed=3),
+    })
+    start_step, property_start_step_dict = GEMC.detect_production_start_step(
+        blk_data, ["TOT_EN", "TOT_DENS", "TOT_MOL"], method="mser", min_no_samples=50
+    )
+    assert set(property_start_step_dict) == {"TOT_EN", "TOT_DENS"}
+    assert start_step == max(property_start_step_dict.values())
+    assert property_start_step_dict["TOT_DENS"] > property_start_step_dict["TOT_EN"]
+
+
+def test_production_start_step_is_not_picked_from_too_few_rows(capsys):
+    blk_data = get_blk_data(1000 * np.arange(1, 11), {"TOT_EN": get_transient_series(10, 5)})
+    start_step, property_start_step_dict = GEMC.detect_production_start_step(
+        blk_data, ["TOT_EN"], method="mser", min_no_samples=50
+    )
+    assert start_step == 0
+    assert property_start_step_dict == {}
+    assert "WARNING" in capsys.readouterr().out
+
+
+def test_unknown_equilibration_detection_method():
+    blk_data = get_blk_data(1000 * np.arange(1, 101), {"TOT_EN": np.zeros(100)})
+    with pytest.raises(ValueError):
+        GEMC.detect_production_start_step(blk_data, ["TOT_EN"], method="unknown")
@@ -1,6 +1,7 @@
 """GOMC's setup for signac, signac-flow, signac-dashboard for this study."""
 # project.py
 
+import io
 import os
 import subprocess
 
@@ -93,6 +94,17 @@ output_critical_data_avg_std_of_replicates_txt_file_name = "critical_points_avg_
 output_boiling_data_replicate_txt_file_name = "boiling_point.txt"
 output_boiling_data_avg_std_of_replicates_txt_file_name = "boiling_point_avg_replicates.txt"
 
+# Analysis (automatic equilibration detection):
+# The production start step for each box is picked from these Blk file columns in the
+# analysis of each replicate, using the "mser" or "max_neff" method, and is written to the job document.
+# Set to None to use all the production data (e.g., equilibration_detection_method = "mser").
+# The properties with fewer Blk file rows than equilibration_detection_min_no_samples are not used
+# (with a warning), as the start picked from a few noisy rows can drop up to half the production data.
+equilibration_detection_method = None
+equilibration_detection_blk_column_title_list = ["TOT_EN", "TOT_MOL", "TOT_DENS"]
+equilibration_detection_min_no_samples = 50
+
+
 
 walltime_mosdef_hr = 24
 walltime_gomc_equilbrium_hr = 200
@@ -351,33 +363,50 @@ def part_3b_output_gomc_production_run_started(job):
 # check if GOMC simulation are completed properly (start)
 # ******************************************************
 # ******************************************************
-# function for checking if GOMC simulations are completed properly
-def gomc_sim_completed_properly(job, control_filename_str):
-    """General check to see if the gomc simulation was completed properly."""
-    job_run_properly_bool = False
+# function for checking the GOMC simulation status from the end of the console file only.
+# The finished ("completed" or "failed") status is saved in the job document with the console
+# file size and modification time, so the console file is only read again if it changes.
+gomc_console_tail_bytes = 16384
+gomc_console_failed_str_list = ["ERROR", "Error:", "Fatal error"]
+
+def gomc_sim_console_status(job, control_filename_str):
+    """Get the gomc simulation status ("not_started", "started", "completed", or "failed") from the console file."""
     output_log_file = "out_{}.dat".format(control_filename_str)
-    if job.isfile(output_log_file):
-        # with open(f"workspace/{job.id}/{output_log_file}", "r") as fp:
-        #print(f"job.id = {job.id}")
-        with open(job.fn(output_log_file), "r") as fp:
-            out_gomc = fp.readlines()
-            for i, line in enumerate(out_gomc):
-                if "Completed" in line:
-                    job_run_properly_bool = True
-                #modified by Potoff on 2/22/2023  My way is simpler
-                #if "Move" in line:
-                #    split_move_line = line.split()
-                #    if (
-                #        split_move_line[0] == "Move"
-                #        and split_move_line[1] == "Type"
-                #        and split_move_line[2] == "Mol."
-                #        and split_move_line[3] == "Kind"
-                #    ):
-                #        job_run_properly_bool = True
+    try:
+        output_log_stat = os.stat(job.fn(output_log_file))
+    except FileNotFoundError:
+        return "not_started"
+
+    output_log_size_mtime = [output_log_stat.st_size, output_log_stat.st_mtime_ns]
+    console_status_dict = job.doc.get("gomc_console_status", {})
+    if control_filename_str in console_status_dict \
+            and console_status_dict[control_filename_str]["size_mtime"] == output_log_size_mtime:
+        return console_status_dict[control_filename_str]["status"]
+
+    with open(job.fn(output_log_file), "rb") as fp:
+        fp.seek(max(output_log_stat.st_size - gomc_console_tail_bytes, 0))
+        output_log_tail = fp.read().decode("utf-8", errors="replace")
+
+    if "Completed" in output_log_tail:
+        output_log_status = "completed"
+    elif any(failed_str in output_log_tail for failed_str in gomc_console_failed_str_list):
+        output_log_status = "failed"
     else:
-        job_run_properly_bool = False
+        output_log_status = "started"
+
+    # a running simulation changes the console file at every output, so only the finished status is saved
+    if output_log_status in ["completed", "failed"]:
+        job.doc.setdefault("gomc_console_status", {})[control_filename_str] = {
+            "size_mtime": output_log_size_mtime,
+            "status": output_log_status,
+        }
+
+    return output_log_status
 
-    return job_run_properly_bool
+# function for checking if GOMC simulations are completed properly
+def gomc_sim_completed_properly(job, control_filename_str):
+    """General check to see if the gomc simulation was completed properly."""
+    return gomc_sim_console_status(job, control_filename_str) == "completed"
 
 
 # check if equilb selected ensemble GOMC run completed by checking the end of the GOMC consol file
@@ -837,6 +866,199 @@ def run_production_run_gomc_command(job):
 # ******************************************************
 
 
+# ******************************************************
+# ******************************************************
+# GOMC Blk_*.dat file loader, with a parsed-data cache (start)
+# Note: the Blk file is parsed once into a NumPy record array, with the column names
+# from the header (STEP without the "#"), which is saved next to it as a binary .npz file.
+# The .npz file is keyed on the Blk file size and modification time, so the Blk file
+# is only parsed again if it changes.
+# ******************************************************
+# ******************************************************
+blk_file_parsed_cache_version = 1
+
+def get_blk_file_parsed_cache_path(blk_file_path):
+    """Get the parsed-data (.npz) cache file path for the GOMC Blk file."""
+    return f"{os.path.splitext(blk_file_path)[0]}_parsed.npz"
+
+
+def parse_blk_file(blk_file_path):
+    """Parse the GOMC Blk file into a NumPy record array, skipping a partly written last line."""
+    with open(blk_file_path, "r") as fp:
+        header_list = fp.readline().split()
+        data_text = fp.read()
+
+    header_list[0] = header_list[0].lstrip("#")
+    data_text = data_text[: data_text.rfind("\n") + 1]
+    if data_text.strip():
+        data_array = np.loadtxt(io.StringIO(data_text), ndmin=2)
+    else:
+        data_array = np.empty((0, len(header_list)))
+
+    blk_data = np.empty(
+        len(data_array),
+        dtype=[(column_i, np.int64 if i == 0 else np.float64) for i, column_i in enumerate(header_list)],
+    )
+    for i, column_i in enumerate(header_list):
+        blk_data[column_i] = data_array[:, i]
+
+    return blk_data.view(np.recarray)
+
+
+def load_blk_file(blk_file_path):
+    """Load the GOMC Blk file as a NumPy record array, from its parsed-data cache if it is current."""
+    blk_file_stat = os.stat(blk_file_path)
+    blk_file_size_mtime = np.array([blk_file_stat.st_size, blk_file_stat.st_mtime_ns], dtype=np.int64)
+    parsed_cache_path = get_blk_file_parsed_cache_path(blk_file_path)
+
+    try:
+        with np.load(parsed_cache_path) as parsed_cache:
+            if int(parsed_cache["version"]) == blk_file_parsed_cache_version \
+                    and np.array_equal(parsed_cache["blk_file_size_mtime"], blk_file_size_mtime):
+                return parsed_cache["blk_data"].view(np.recarray)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    blk_data = parse_blk_file(blk_file_path)
+
+    # write the cache to a temporary file first, so other processes never read a partly written cache
+    parsed_cache_tmp_path = f"{parsed_cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(parsed_cache_tmp_path, "wb") as fp:
+            np.savez(
+                fp,
+                version=blk_file_parsed_cache_version,
+                blk_file_size_mtime=blk_file_size_mtime,
+                blk_data=np.asarray(blk_data),
+            )
+        os.replace(parsed_cache_tmp_path, parsed_cache_path)
+    except OSError:
+        # the cache is optional, so the parsed data is still used if it can not be written
+        if os.path.isfile(parsed_cache_tmp_path):
+            os.remove(parsed_cache_tmp_path)
+
+    return blk_data
+
+# ******************************************************
+# ******************************************************
+# GOMC Blk_*.dat file loader, with a parsed-data cache (end)
+# ******************************************************
+# ******************************************************
+
+
+# ******************************************************
+# ******************************************************
+# automatic equilibration detection, to pick the production start step (start)
+# Note: the start of the production data is picked for each box and property from the
+# Blk file time series, and the latest start of the properties is used for that box.
+# "mser" is the Marginal Standard Error Rule (White, 1997), and "max_neff" picks the start that
+# maximizes the number of uncorrelated samples, (N - t0) / g(t0) (Chodera, 2016).
+# ******************************************************
+# ******************************************************
+def get_statistical_inefficiency(data_series):
+    """Get the statistical inefficiency (g) of the data series, from its FFT autocorrelation function."""
+    data_series = np.asarray(data_series, dtype=np.float64)
+    no_samples = len(data_series)
+    data_deviation = data_series - np.mean(data_series)
+    data_variance = np.dot(data_deviation, data_deviation) / no_samples
+    if no_samples < 2 or data_variance == 0:
+        return 1.0
+
+    fft_length = 2 ** int(np.ceil(np.log2(2 * no_samples)))
+    data_fft = np.fft.rfft(data_deviation, n=fft_length)
+    autocorrelation = np.fft.irfft(data_fft * np.conjugate(data_fft), n=fft_length)[1:no_samples]
+    autocorrelation /= data_variance * np.arange(no_samples - 1, 0, -1)
+
+    # sum the autocorrelation up to its first zero crossing
+    lag_times = np.arange(1, no_samples)
+    non_positive_index = np.flatnonzero(autocorrelation <= 0)
+    last_lag_index = non_positive_index[0] if len(non_positive_index) > 0 else no_samples - 1
+    statistical_inefficiency = 1.0 + 2.0 * np.sum(
+        (1.0 - lag_times[:last_lag_index] / no_samples) * autocorrelation[:last_lag_index]
+    )
+
+    return max(statistical_inefficiency, 1.0)
+
+
+def detect_equilibration_mser(data_series):
+    """Get the production start index of the data series with the Marginal Standard Error Rule (MSER)."""
+    data_series = np.asarray(data_series, dtype=np.float64)
+    no_samples = len(data_series)
+
+    # sums over the last n samples, for every n at once
+    reversed_series = data_series[::-1]
+    no_last_samples = np.arange(1, no_samples + 1)
+    sum_last_samples = np.cumsum(reversed_series)
+    sum_squared_last_samples = np.cumsum(reversed_series ** 2)
+    mser_last_samples = (sum_squared_last_samples - sum_last_samples ** 2 / no_last_samples) / no_last_samples ** 2
+
+    # the mser for each start index, only searching the first half of the data
+    mser_start_index = mser_last_samples[::-1][: no_samples // 2 + 1]
+
+    return int(np.argmin(mser_start_index))
+
+
+def detect_equilibration_max_neff(data_series, max_start_index_tries=50):
+    """Get the production start index of the data series which maximizes the number of uncorrelated samples."""
+    data_series = np.asarray(data_series, dtype=np.float64)
+    no_samples = len(data_series)
+    start_index_list = np.unique(
+        np.linspace(0, no_samples // 2, min(no_samples // 2 + 1, max_start_index_tries)).astype(int)
+    )
+    no_uncorrelated_samples_list = [
+        (no_samples - start_index_i) / get_statistical_inefficiency(data_series[start_index_i:])
+        for start_index_i in start_index_list
+    ]
+
+    return int(start_index_list[np.argmax(no_uncorrelated_samples_list)])
+
+
+def detect_production_start_step(blk_data, column_title_list, method="mser", min_no_samples=4):
+    """Get the production start step of the Blk data, and the start step for each property (column).
+
+    The properties not in the Blk file, or with non-finite values, or fewer than min_no_samples values, are not used.
+    """
+    detect_equilibration_function_dict = {
+        "mser": detect_equilibration_mser,
+        "max_neff": detect_equilibration_max_neff,
+    }
+    if method not in detect_equilibration_function_dict:
+        raise ValueError(
+            f"ERROR: The equilibration detection method must be one of "
+            f"{list(detect_equilibration_function_dict.keys())}, not '{method}'."
+        )
+
+    step_column_title = blk_data.dtype.names[0]
+    property_start_step_dict = {}
+    for column_title_i in column_title_list:
+        if column_title_i not in blk_data.dtype.names:
+            continue
+
+        data_series = blk_data[column_title_i]
+        if len(data_series) < min_no_samples:
+            print(
+                f"WARNING: The {column_title_i} Blk data has {len(data_series)} rows, fewer than {min_no_samples}, "
+                f"so it is not used to pick the production start step."
+            )
+            continue
+        if not np.all(np.isfinite(data_series)):
+            continue
+
+        start_index = detect_equilibration_function_dict[method](data_series)
+        property_start_step_dict[column_title_i] = int(blk_data[step_column_title][start_index])
+
+    if len(property_start_step_dict) == 0:
+        return 0, property_start_step_dict
+
+    return max(property_start_step_dict.values()), property_start_step_dict
+
+# ******************************************************
+# ******************************************************
+# automatic equilibration detection, to pick the production start step (end)
+# ******************************************************
+# ******************************************************
+
+
 # ******************************************************
 # ******************************************************
 # data analysis - get the average data from each replicate (start)
@@ -866,6 +1088,7 @@ def part_5a_analysis_individual_simulation_averages(job):
         os.remove(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_liq}')
    
     # this is set to basically use all values.  However, allows the ability to set if needed
+    # Note: the step_start is raised by the automatic equilibration detection, if used.
     step_start = 0 * 10 ** 6
     step_finish = 1 * 10 ** 12
 
@@ -897,57 +1120,34 @@ def part_5a_analysis_individual_simulation_averages(job):
     #blk_file_reading_column_box_Z_title = 'COMPRESSIBILITY'  # column title title for compressiblity (Z)
 
     
-    # Programmed data
-    step_start_string = str(int(step_start))
-    step_finish_string = str(int(step_finish))
+    step_no_title_mod = blk_file_reading_column_no_step_title[1:]
 
     # *************************
     # drawing in data from single file and extracting specific rows for the liquid box (start)
     # *************************
-    data_box_0 = pd.read_csv(reading_file_box_0, sep='\s+', header=0, na_values='NaN', index_col=False)
+    data_box_0 = load_blk_file(reading_file_box_0)
+    data_box_0 = data_box_0[
+        (data_box_0[step_no_title_mod] >= step_start) & (data_box_0[step_no_title_mod] <= step_finish)
+    ]
+    step_start_box_0 = step_start
+    property_start_step_box_0_dict = {}
+    if equilibration_detection_method is not None:
+        step_start_box_0, property_start_step_box_0_dict = detect_production_start_step(
+            data_box_0,
+            equilibration_detection_blk_column_title_list,
+            method=equilibration_detection_method,
+            min_no_samples=equilibration_detection_min_no_samples,
+        )
+        step_start_box_0 = max(step_start, step_start_box_0)
+        data_box_0 = data_box_0[data_box_0[step_no_title_mod] >= step_start_box_0]
 
-    data_box_0 = pd.DataFrame(data_box_0)
-    step_no_title_mod = blk_file_reading_column_no_step_title[1:]
-    header_list = list(data_box_0.columns)
-    header_list[0] = step_no_title_mod
-    data_box_0.columns = header_list
-
-    data_box_0 = data_box_0.query(step_start_string + ' <= ' + step_no_title_mod + ' <= ' + step_finish_string)
-
-    iter_no_box_0 = data_box_0.loc[:, step_no_title_mod]
-    iter_no_box_0 = list(iter_no_box_0)
-    iter_no_box_0 = np.transpose(iter_no_box_0)
-
-    #pressure_box_0 = data_box_0.loc[:, blk_file_reading_column_no_pressure_title]
-    #pressure_box_0 = list(pressure_box_0)
-    #pressure_box_0 = np.transpose(pressure_box_0)
-    #pressure_box_0_mean = np.nanmean(pressure_box_0)
-
-    total_molecules_box_0 = data_box_0.loc[:, blk_file_reading_column_total_molecules_title]
-    total_molecules_box_0 = list(total_molecules_box_0)
-    total_molecules_box_0 = np.transpose(total_molecules_box_0)
-    total_molecules_box_0_mean = np.nanmean(total_molecules_box_0)
-
-    Rho_box_0 = data_box_0.loc[:, blk_file_reading_column_Rho_title]
-    Rho_box_0 = list(Rho_box_0)
-    Rho_box_0 = np.transpose(Rho_box_0)
-    Rho_box_0_mean = np.nanmean(Rho_box_0)
-
-    volume_box_0 = data_box_0.loc[:, blk_file_reading_column_box_volume_title]
-    volume_box_0 = list(volume_box_0)
-    volume_box_0 = np.transpose(volume_box_0)
-    volume_box_0_mean = np.nanmean(volume_box_0)
+    #pressure_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_no_pressure_title])
+    total_molecules_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_total_molecules_title])
+    Rho_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_Rho_title])
+    volume_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_box_volume_title])
     length_if_cube_box_0_mean = (volume_box_0_mean) ** (1 / 3)
-
-    #Hv_box_0 = data_box_0.loc[:, blk_file_reading_column_box_Hv_title]
-    #Hv_box_0 = list(Hv_box_0)
-    #Hv_box_0 = np.transpose(Hv_box_0)
-    #Hv_box_0_mean = np.nanmean(Hv_box_0)
-
-    #Z_box_0 = data_box_0.loc[:, blk_file_reading_column_box_Z_title]
-    #Z_box_0 = list(Z_box_0)
-    #Z_box_0 = np.transpose(Z_box_0)
-    #Z_box_0_mean = np.nanmean(Z_box_0)
+    #Hv_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_box_Hv_title])
+    #Z_box_0_mean = np.nanmean(data_box_0[blk_file_reading_column_box_Z_title])
 
     
     # *************************
@@ -982,6 +1182,14 @@ def part_5a_analysis_individual_simulation_averages(job):
 
     box_liq_replicate_data_txt_file.close()
 
+    # write the production start step used, so the equilibration steps can be set from it
+    job.doc.equilibration_detection = {
+        "method": equilibration_detection_method,
+        "production_start_step_box_0": int(step_start_box_0),
+        "property_start_step_box_0": property_start_step_box_0_dict,
+        "no_production_samples_box_0": len(data_box_0),
+    }
+
     # ***********************
     # calc the avg data from the liq and vap boxes (end)
     # ***********************
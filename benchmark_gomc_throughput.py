@@ -0,0 +1,463 @@
+"""Benchmark the GOMC throughput of each model workflow, and flag the regressions against a SQLite results database."""
+# Run from this repository directory, after the workflows' GOMC control files are written
+# (i.e., the build_psf_pdb_ff_gomc_conf operation), for example:
+# python benchmark_gomc_throughput.py
+# python benchmark_gomc_throughput.py -m SPCE/EWALD OPC/GEMC -e GEMC NVT -cpu_or_gpu GPU -p 4
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# ******************************************************
+# users typical variables (start)
+# ******************************************************
+# Enter the GOMC binary path here, as in the workflows (the bin folder).
+gomc_binary_path = "~/GOMC/bin"
+
+# the fixed, short and reproducible benchmark runs
+benchmark_gomc_steps = 10000
+benchmark_random_seed = 0
+benchmark_ensemble_list = ["NVT", "NPT", "GEMC"]
+
+# the results database, and the benchmark run directories
+benchmark_database_file_name = "gomc_benchmark_results.sqlite"
+benchmark_run_directory_name = "gomc_benchmark_runs"
+
+# a run is a regression, if its steps/s is this relative amount below the median of the previous
+# runs with the same model directory, ensemble, binary file, +p value, steps and host
+regression_relative_tolerance = 0.10
+regression_no_previous_runs = 5
+# ******************************************************
+# users typical variables (end)
+# ******************************************************
+
+
+# the control file keywords, with the input file as their last value
+gomc_input_file_keyword_list = [
+    "Parameters", "Coordinates", "Structure", "binCoordinates", "extendedSystem", "binVelocities"
+]
+
+# the control file output keywords, which are turned off in the benchmark runs
+gomc_output_freq_keyword_list = [
+    "RestartFreq", "CheckpointFreq", "DCDFreq", "CoordinatesFreq", "HistogramFreq", "BlockAverageFreq",
+]
+
+
+# *************************************************
+# The python arguments (start)
+# *************************************************
+def _get_args():
+    arg_parser = argparse.ArgumentParser()
+
+    arg_parser.add_argument(
+        "-m",
+        "--model_directories",
+        help="The model workflow directories to benchmark (default = all the directories with a signac "
+        "workspace of GOMC control files, e.g., SPCE/EWALD OPC/GEMC).",
+        nargs="*",
+        type=str,
+    )
+    arg_parser.add_argument(
+        "-e",
+        "--ensembles",
+        help=f"The ensembles to benchmark (default = {' '.join(benchmark_ensemble_list)}). "
+        "The NVT runs are from the NPT control files with the volume moves off, "
+        "if the workflow has no NVT control files.",
+        nargs="*",
+        default=benchmark_ensemble_list,
+        type=str,
+    )
+    arg_parser.add_argument(
+        "-cpu_or_gpu",
+        "--cpu_or_gpu",
+        help="The GOMC binary (GOMC_CPU_<ensemble> or GOMC_GPU_<ensemble>) to benchmark (default = CPU).",
+        default="CPU",
+        type=str,
+    )
+    arg_parser.add_argument(
+        "-p",
+        "--gomc_ncpu",
+        help="The GOMC +p value (default = 4).",
+        default=4,
+        type=int,
+    )
+    arg_parser.add_argument(
+        "-steps",
+        "--gomc_steps",
+        help=f"The GOMC steps of each benchmark run (default = {benchmark_gomc_steps}).",
+        default=benchmark_gomc_steps,
+        type=int,
+    )
+    arg_parser.add_argument(
+        "-db",
+        "--database",
+        help=f"The SQLite results database file (default = {benchmark_database_file_name}).",
+        default=benchmark_database_file_name,
+        type=str,
+    )
+
+    parser_arguments = arg_parser.parse_args()
+
+    if parser_arguments.cpu_or_gpu not in ["CPU", "GPU"]:
+        print(f"ERROR: The GOMC binary must be CPU or GPU, not <{parser_arguments.cpu_or_gpu}>!")
+        sys.exit(1)
+    for ensemble in parser_arguments.ensembles:
+        if ensemble not in benchmark_ensemble_list:
+            print(f"ERROR: The ensemble <{ensemble}> is not one of {benchmark_ensemble_list}!")
+            sys.exit(1)
+
+    return parser_arguments
+
+# *************************************************
+# The python arguments (end)
+# *************************************************
+
+
+# *************************************************
+# finding and writing the benchmark control files (start)
+# *************************************************
+def find_model_directories(repository_directory):
+    """Find the model workflow directories, which have a signac workspace."""
+    model_directory_list = []
+    for root, directory_list, _ in os.walk(repository_directory):
+        if "workspace" in directory_list:
+            model_directory_list.append(os.path.relpath(root, repository_directory))
+        directory_list[:] = [
+            directory for directory in directory_list
+            if directory not in ["workspace", ".git", benchmark_run_directory_name]
+        ]
+
+    return sorted(model_directory_list)
+
+
+def read_gomc_control_file(control_file):
+    """Read the GOMC control file lines, and the first value(s) of each keyword."""
+    with open(control_file, "r") as fp:
+        conf_line_list = fp.read().splitlines()
+
+    keyword_values_dict = {}
+    for line in conf_line_list:
+        line_split = line.split()
+        if len(line_split) > 0 and not line_split[0].startswith("#"):
+            keyword_values_dict.setdefault(line_split[0], line_split[1:])
+
+    return conf_line_list, keyword_values_dict
+
+
+def get_gomc_control_file_ensemble(keyword_values_dict):
+    """Get the ensemble of the GOMC control file, from its GEMC and Pressure keywords."""
+    if "GEMC" in keyword_values_dict:
+        return "GEMC"
+    if "Pressure" in keyword_values_dict:
+        return "NPT"
+    if "ChemPot" in keyword_values_dict or "Fugacity" in keyword_values_dict:
+        return "GCMC"
+
+    return "NVT"
+
+
+def gomc_control_file_input_files_exist(control_file, conf_line_list):
+    """Check that all the input files of the GOMC control file exist."""
+    for line in conf_line_list:
+        line_split = line.split()
+        if len(line_split) >= 2 and line_split[0] in gomc_input_file_keyword_list:
+            if not os.path.isfile(os.path.join(os.path.dirname(control_file), line_split[-1])):
+                return False
+
+    return True
+
+
+def find_benchmark_control_file(model_directory, ensemble):
+    """Find the model directory's control file for the ensemble, and if it is an NPT file for an NVT run.
+
+    The first job's (by job id) control file, which has all its input files, is used,
+    starting from the initial (not restart) files if possible.
+    """
+    ensemble_control_file_list = []
+    npt_control_file_list = []
+    workspace_directory = os.path.join(model_directory, "workspace")
+    for job_id in sorted(os.listdir(workspace_directory)):
+        job_directory = os.path.join(workspace_directory, job_id)
+        if not os.path.isdir(job_directory):
+            continue
+        for file_name in sorted(os.listdir(job_directory)):
+            if not file_name.endswith(".conf"):
+                continue
+            control_file = os.path.join(job_directory, file_name)
+            conf_line_list, keyword_values_dict = read_gomc_control_file(control_file)
+            if not gomc_control_file_input_files_exist(control_file, conf_line_list):
+                continue
+
+            restart_bool = keyword_values_dict.get("Restart", ["False"])[0] == "True"
+            control_file_ensemble = get_gomc_control_file_ensemble(keyword_values_dict)
+            if control_file_ensemble == ensemble:
+                ensemble_control_file_list.append((restart_bool, control_file))
+            elif control_file_ensemble == "NPT" and ensemble == "NVT":
+                npt_control_file_list.append((restart_bool, control_file))
+
+    if len(ensemble_control_file_list) > 0:
+        return sorted(ensemble_control_file_list)[0][1], False
+    if len(npt_control_file_list) > 0:
+        return sorted(npt_control_file_list)[0][1], True
+
+    return None, False
+
+
+def write_benchmark_control_file(control_file, from_npt_bool, gomc_steps, run_directory):
+    """Write the benchmark control file in the run directory, with fixed steps and seed, and the outputs off.
+
+    The input files are read from the control file's directory.
+    If the control file is an NPT file for an NVT run, the pressure is removed and the volume moves are
+    put in the displacement moves.
+    """
+    conf_line_list, keyword_values_dict = read_gomc_control_file(control_file)
+    volume_freq = float(keyword_values_dict.get("VolFreq", ["0"])[0]) if from_npt_bool else 0
+
+    benchmark_conf_line_list = []
+    for line in conf_line_list:
+        line_split = line.split()
+        keyword = line_split[0] if len(line_split) > 0 else ""
+        if keyword == "RunSteps":
+            benchmark_conf_line_list.append(f"{keyword: <25} {gomc_steps}")
+        elif keyword == "PRNG":
+            benchmark_conf_line_list.append(f"{keyword: <25} INTSEED")
+        elif keyword == "Random_Seed":
+            benchmark_conf_line_list.append(f"{keyword: <25} {benchmark_random_seed}")
+        elif keyword == "OutputName":
+            benchmark_conf_line_list.append(f"{keyword: <25} benchmark")
+        elif keyword == "ConsoleFreq":
+            benchmark_conf_line_list.append(f"{keyword: <25} True {gomc_steps}")
+        elif keyword in gomc_output_freq_keyword_list and len(line_split) >= 3:
+            benchmark_conf_line_list.append(f"{keyword: <25} False {line_split[2]}")
+        elif keyword in gomc_input_file_keyword_list and len(line_split) >= 2:
+            input_file = os.path.abspath(os.path.join(os.path.dirname(control_file), line_split[-1]))
+            benchmark_conf_line_list.append(" ".join(line_split[:-1] + [input_file]))
+        elif from_npt_bool and keyword == "Pressure":
+            continue
+        elif from_npt_bool and keyword == "VolFreq":
+            benchmark_conf_line_list.append(f"{keyword: <25} 0.0")
+        elif from_npt_bool and keyword == "DisFreq":
+            benchmark_conf_line_list.append(f"{keyword: <25} {round(float(line_split[1]) + volume_freq, 6)}")
+        else:
+            benchmark_conf_line_list.append(line)
+
+    if "Random_Seed" not in keyword_values_dict:
+        benchmark_conf_line_list.append(f"{'Random_Seed': <25} {benchmark_random_seed}")
+
+    with open(os.path.join(run_directory, "benchmark.conf"), "w") as fp:
+        fp.write("\n".join(benchmark_conf_line_list) + "\n")
+
+# *************************************************
+# finding and writing the benchmark control files (end)
+# *************************************************
+
+
+# *************************************************
+# running the benchmarks, and the results database (start)
+# *************************************************
+def get_file_sha256(file_path):
+    """Get the sha256 hash of the file."""
+    with open(file_path, "rb") as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+def get_host_information():
+    """Get the host name, CPU model, GPU model (if any), and the repository's git commit."""
+    cpu_model = ""
+    if os.path.isfile("/proc/cpuinfo"):
+        with open("/proc/cpuinfo", "r") as fp:
+            cpu_model = next((line.split(":", 1)[1].strip() for line in fp if line.startswith("model name")), "")
+
+    gpu_model = ""
+    try:
+        nvidia_smi_output = subprocess.run(["nvidia-smi", "-L"], capture_output=True, text=True)
+        if nvidia_smi_output.returncode == 0 and len(nvidia_smi_output.stdout.strip()) > 0:
+            gpu_model = nvidia_smi_output.stdout.strip().splitlines()[0]
+    except FileNotFoundError:
+        pass
+
+    git_output = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True)
+    git_commit = git_output.stdout.strip() if git_output.returncode == 0 else ""
+
+    return {"host": socket.gethostname(), "cpu_model": cpu_model, "gpu_model": gpu_model, "git_commit": git_commit}
+
+
+def get_gomc_console_move_times(console_file):
+    """Get the CPU time (s) of each move type, from the "<move>: <time> sec." lines at the end of the console file."""
+    move_time_s_dict = {}
+    with open(console_file, "r", errors="replace") as fp:
+        for line in fp:
+            time_match = re.match(r"^\s*([A-Za-z][A-Za-z_\- ]*):\s+([0-9.eE+\-]+)\s*sec", line)
+            if time_match is not None:
+                move_time_s_dict[time_match.group(1).strip()] = float(time_match.group(2))
+
+    return move_time_s_dict
+
+
+def run_benchmark(gomc_binary_file, gomc_ncpu, run_directory):
+    """Run the benchmark control file in the run directory, and get the wall time (s) and if it completed."""
+    run_command = "{} +p{} benchmark.conf > out_benchmark.dat".format(str(gomc_binary_file), str(gomc_ncpu))
+    print(f"Running {run_directory}: {run_command}")
+
+    start_time_s = time.perf_counter()
+    subprocess.run(run_command, shell=True, cwd=run_directory)
+    wall_time_s = time.perf_counter() - start_time_s
+
+    with open(os.path.join(run_directory, "out_benchmark.dat"), "r", errors="replace") as fp:
+        completed_bool = "Completed" in fp.read()
+
+    return wall_time_s, completed_bool
+
+
+def open_results_database(database_file):
+    """Open the SQLite results database, and create its table if it is new."""
+    connection = sqlite3.connect(database_file)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS gomc_benchmark_runs ("
+        "run_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "timestamp TEXT, git_commit TEXT, host TEXT, cpu_model TEXT, gpu_model TEXT, "
+        "model_directory TEXT, ensemble TEXT, control_file TEXT, "
+        "gomc_binary_file TEXT, gomc_binary_sha256 TEXT, gomc_ncpu INTEGER, gomc_steps INTEGER, "
+        "wall_time_s REAL, steps_per_s REAL, move_time_s_json TEXT, completed INTEGER)"
+    )
+
+    return connection
+
+
+def get_previous_steps_per_s(connection, benchmark_run_dict):
+    """Get the steps/s and binary hashes of the latest previous completed runs, which are comparable to this run."""
+    previous_run_list = connection.execute(
+        "SELECT steps_per_s, gomc_binary_sha256 FROM gomc_benchmark_runs "
+        "WHERE model_directory = ? AND ensemble = ? AND gomc_binary_file = ? AND gomc_ncpu = ? "
+        "AND gomc_steps = ? AND host = ? AND completed = 1 "
+        "ORDER BY run_id DESC LIMIT ?",
+        (
+            benchmark_run_dict["model_directory"], benchmark_run_dict["ensemble"],
+            benchmark_run_dict["gomc_binary_file"], benchmark_run_dict["gomc_ncpu"],
+            benchmark_run_dict["gomc_steps"], benchmark_run_dict["host"], regression_no_previous_runs,
+        ),
+    ).fetchall()
+
+    return [previous_run[0] for previous_run in previous_run_list], \
+        [previous_run[1] for previous_run in previous_run_list]
+
+
+def add_benchmark_run(connection, benchmark_run_dict):
+    """Add the benchmark run to the results database."""
+    column_title_list = list(benchmark_run_dict.keys())
+    connection.execute(
+        f"INSERT INTO gomc_benchmark_runs ({', '.join(column_title_list)}) "
+        f"VALUES ({', '.join('?' for _ in column_title_list)})",
+        [benchmark_run_dict[column_title] for column_title in column_title_list],
+    )
+    connection.commit()
+
+# *************************************************
+# running the benchmarks, and the results database (end)
+# *************************************************
+
+
+if __name__ == "__main__":
+    parser_arguments = _get_args()
+    repository_directory = os.path.dirname(os.path.abspath(__file__))
+    model_directory_list = parser_arguments.model_directories \
+        if parser_arguments.model_directories else find_model_directories(repository_directory)
+    host_information_dict = get_host_information()
+    connection = open_results_database(parser_arguments.database)
+
+    output_row_list = []
+    regression_bool = False
+    for model_directory in model_directory_list:
+        for ensemble in parser_arguments.ensembles:
+            control_file, from_npt_bool = find_benchmark_control_file(
+                os.path.join(repository_directory, model_directory), ensemble
+            )
+            if control_file is None:
+                print(f"INFO: {model_directory} has no {ensemble} control file with all its input files, skipping it.")
+                continue
+
+            gomc_binary_file = os.path.join(
+                os.path.expanduser(gomc_binary_path), f"GOMC_{parser_arguments.cpu_or_gpu}_{ensemble}"
+            )
+            if not os.path.isfile(gomc_binary_file):
+                print(f"ERROR: The GOMC binary <{gomc_binary_file}> does not exist!")
+                sys.exit(1)
+
+            run_directory = os.path.join(
+                repository_directory, benchmark_run_directory_name, model_directory.replace(os.sep, "_"), ensemble
+            )
+            os.makedirs(run_directory, exist_ok=True)
+            write_benchmark_control_file(control_file, from_npt_bool, parser_arguments.gomc_steps, run_directory)
+            wall_time_s, completed_bool = run_benchmark(gomc_binary_file, parser_arguments.gomc_ncpu, run_directory)
+
+            benchmark_run_dict = {
+                "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                **host_information_dict,
+                "model_directory": model_directory,
+                "ensemble": ensemble,
+                "control_file": os.path.relpath(control_file, repository_directory),
+                "gomc_binary_file": os.path.basename(gomc_binary_file),
+                "gomc_binary_sha256": get_file_sha256(gomc_binary_file),
+                "gomc_ncpu": parser_arguments.gomc_ncpu,
+                "gomc_steps": parser_arguments.gomc_steps,
+                "wall_time_s": wall_time_s,
+                "steps_per_s": parser_arguments.gomc_steps / wall_time_s if completed_bool else 0.0,
+                "move_time_s_json": json.dumps(
+                    get_gomc_console_move_times(os.path.join(run_directory, "out_benchmark.dat"))
+                ),
+                "completed": int(completed_bool),
+            }
+
+            # compare to the previous runs, before this run is added
+            previous_steps_per_s_list, previous_binary_sha256_list = get_previous_steps_per_s(
+                connection, benchmark_run_dict
+            )
+            previous_median_steps_per_s = np.median(previous_steps_per_s_list) \
+                if len(previous_steps_per_s_list) > 0 else np.nan
+            relative_change = benchmark_run_dict["steps_per_s"] / previous_median_steps_per_s - 1 \
+                if len(previous_steps_per_s_list) > 0 else np.nan
+            run_regression_bool = not completed_bool or relative_change < -regression_relative_tolerance
+            regression_bool = regression_bool or run_regression_bool
+            add_benchmark_run(connection, benchmark_run_dict)
+
+            output_row_list.append([
+                model_directory,
+                ensemble + (" (from NPT)" if from_npt_bool else ""),
+                benchmark_run_dict["gomc_binary_file"],
+                benchmark_run_dict["gomc_ncpu"],
+                round(benchmark_run_dict["steps_per_s"], 2),
+                round(previous_median_steps_per_s, 2),
+                round(relative_change, 4),
+                len(previous_steps_per_s_list) > 0
+                and benchmark_run_dict["gomc_binary_sha256"] != previous_binary_sha256_list[0],
+                "REGRESSION" if run_regression_bool else "ok",
+            ])
+
+    connection.close()
+
+    print(
+        f"{'model_directory': <30} "
+        f"{'ensemble': <30} "
+        f"{'binary': <30} "
+        f"{'p': <30} "
+        f"{'steps_per_s': <30} "
+        f"{'previous_median_steps_per_s': <30} "
+        f"{'relative_change': <30} "
+        f"{'binary_changed': <30} "
+        f"{'status': <30} "
+    )
+    for output_row in output_row_list:
+        print("".join(f"{str(value): <30} " for value in output_row))
+
+    print(f"Completed: the GOMC benchmark results are added to {parser_arguments.database}")
+    sys.exit(1 if regression_bool else 0)
@@ -1,7 +1,34 @@
 {% extends "slurm.sh" %}
 
+{% block preamble %}
+{% if job_array|default(false) %}
+{# one SLURM job array, with one task (and the resources of one operation) per operation #}
+#!/bin/bash
+#SBATCH --job-name="{{ id }}"
+{% set memory_requested = operations | calc_memory(false) %}
+{% if memory_requested %}
+#SBATCH --mem={{ memory_requested|format_memory }}
+{% endif %}
+{% if partition %}
+#SBATCH --partition={{ partition }}
+{% endif %}
+{% set walltime = operations | calc_walltime(true) %}
+{% if walltime %}
+#SBATCH -t {{ walltime|format_timedelta }}
+{% endif %}
+{% if job_output %}
+#SBATCH --output={{ job_output }}
+#SBATCH --error={{ job_output }}
+{% endif %}
+#SBATCH --array=0-{{ operations|length - 1 }}{% if job_array_max_running %}%{{ job_array_max_running }}{% endif %}
+
+{% else %}
+{{- super () -}}
+{% endif %}
+{% endblock preamble %}
+
 {% block header %}
-{% set gpus = operations|map(attribute='directives.ngpu')|sum %}
+{% set gpus = operations|map(attribute='directives.ngpu')|max if job_array|default(false) else operations|map(attribute='directives.ngpu')|sum %}
     {{- super () -}}
 
 {% if gpus %}
@@ -28,7 +55,24 @@ nvidia-smi
 {% endblock header %}
 
 {% block body %}
+{% if job_array|default(false) %}
+
+# the job array manifest, with the operation of each array index (the line number - 1)
+job_array_manifest_file="job_array_manifests/{{ id|replace('/', '_') }}.txt"
+mkdir -p job_array_manifests
+cat > "${job_array_manifest_file}.${SLURM_ARRAY_TASK_ID}" << 'JOB_ARRAY_MANIFEST'
+{% for operation in operations %}
+{{ operation.cmd }}
+{% endfor %}
+JOB_ARRAY_MANIFEST
+mv -f "${job_array_manifest_file}.${SLURM_ARRAY_TASK_ID}" "${job_array_manifest_file}"
+
+job_array_operation_cmd=$(sed -n "$((SLURM_ARRAY_TASK_ID + 1))p" "${job_array_manifest_file}")
+echo "Array index ${SLURM_ARRAY_TASK_ID}: ${job_array_operation_cmd}"
+eval "${job_array_operation_cmd}"
+{% else %}
     {{- super () -}}
+{% endif %}
 
 
 {% endblock body %}